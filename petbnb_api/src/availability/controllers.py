@@ -0,0 +1,304 @@
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, case, exists, func, and_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from booking.models import Booking, BookingPetProfile, BookingStatusEnum
+from core.database import utcnow
+from petHost.models import PetHost
+from .models import HostDayOccupancy
+
+# Longest stay a single booking may reserve (keeps the per-day writes bounded)
+MAX_STAY_DAYS = int(os.environ.get("MAX_STAY_DAYS", 90))
+
+# Bookings in these states hold capacity
+ACTIVE_BOOKING_STATUSES = (
+    BookingStatusEnum.waiting.value,
+    BookingStatusEnum.confirmed.value,
+    BookingStatusEnum.ongoing.value,
+)
+
+
+# -------------------- Helpers --------------------
+
+def stay_days(checkin: datetime, checkout: datetime) -> List[date]:
+    """
+    Calendar days a stay occupies: every day whose [00:00, 24:00) overlaps
+    [checkin, checkout). Dates are taken in the timezone the client sent,
+    i.e. the host's local calendar.
+    """
+    if checkout <= checkin:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": True, "message": "checkout_datetime must be after checkin_datetime"},
+        )
+    first = checkin.date()
+    last = (checkout - timedelta(microseconds=1)).date()
+    n = (last - first).days + 1
+    if n > MAX_STAY_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": True, "message": f"Stays are limited to {MAX_STAY_DAYS} days"},
+        )
+    return [first + timedelta(days=i) for i in range(n)]
+
+
+def host_capacity(host: PetHost) -> int:
+    # hosting_capacity counts pets; the column defaults to 1
+    return host.hosting_capacity if host.hosting_capacity is not None else 1
+
+
+class StayWindow(NamedTuple):
+    first_day: date
+    last_day: date
+    pets: int
+
+
+def stay_window(
+    available_from: Optional[datetime],
+    available_to: Optional[datetime],
+    pets: Optional[int] = None,
+) -> Optional[StayWindow]:
+    # Search parameters -> the day range a matching host must have free
+    if available_from is None and available_to is None:
+        return None
+    if available_from is None or available_to is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": True, "message": "available_from and available_to must be given together"},
+        )
+    days = stay_days(available_from, available_to)
+    return StayWindow(days[0], days[-1], pets or 1)
+
+
+# -------------------- Reservations --------------------
+
+def reserve_capacity(db: Session, host: PetHost, checkin: datetime, checkout: datetime, pets: int) -> List[date]:
+    """
+    Add `pets` to the host's occupancy for every day of the stay, inside the
+    caller's transaction. The increment is a single conditional UPDATE
+    (pets_booked + n <= capacity) and concurrent writers serialize on the
+    write lock, so each one checks the condition against committed counts
+    and a host can never be overbooked. Raises 409 (after rolling back)
+    when any day is full.
+    """
+    days = stay_days(checkin, checkout)
+    capacity = host_capacity(host)
+    if pets > capacity:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error": True, "message": f"Host accepts at most {capacity} pets at a time"},
+        )
+
+    if not try_reserve_days(db, host.id, capacity, days, pets):
+        db.rollback()
+        full = [
+            d.isoformat() for (d,) in db.query(HostDayOccupancy.day).filter(
+                HostDayOccupancy.pet_host_id == host.id,
+                HostDayOccupancy.day.between(days[0], days[-1]),
+                HostDayOccupancy.pets_booked + pets > capacity,
+            ).order_by(HostDayOccupancy.day)
+        ]
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "error": True,
+                "message": "Host does not have capacity for the selected dates",
+                "unavailable_dates": full,
+            },
+        )
+    return days
+
+
+def try_reserve_days(db: Session, host_id: int, capacity: int, days: List[date], pets: int) -> bool:
+    """
+    Add `pets` to every day in `days` or to none of them, without ending
+    the caller's transaction. The conditional UPDATE returns the days it
+    bumped; when a full day stopped it short, those days are decremented
+    again in place, so bulk callers can carry on with the next booking.
+    """
+    db.execute(
+        sqlite_insert(HostDayOccupancy)
+        .values([{"pet_host_id": host_id, "day": d, "pets_booked": 0} for d in days])
+        .on_conflict_do_nothing()
+    )
+    bumped = db.execute(
+        update(HostDayOccupancy)
+        .where(
+            HostDayOccupancy.pet_host_id == host_id,
+            HostDayOccupancy.day.between(days[0], days[-1]),
+            HostDayOccupancy.pets_booked + pets <= capacity,
+        )
+        .values(pets_booked=HostDayOccupancy.pets_booked + pets, updated_at=utcnow())
+        .returning(HostDayOccupancy.day)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    if len(bumped) == len(days):
+        return True
+    if bumped:
+        db.execute(
+            update(HostDayOccupancy)
+            .where(HostDayOccupancy.pet_host_id == host_id, HostDayOccupancy.day.in_(bumped))
+            .values(pets_booked=HostDayOccupancy.pets_booked - pets)
+            .execution_options(synchronize_session=False)
+        )
+    return False
+
+
+def release_capacity(
+    db: Session,
+    host_id: int,
+    checkin: datetime,
+    checkout: datetime,
+    pets: int,
+    from_day: Optional[date] = None,
+) -> None:
+    """
+    Give back a booking's pets for the days of its stay (from `from_day`
+    on, for bookings that end early), inside the caller's transaction.
+    """
+    days = stay_days(checkin, checkout)
+    first = max(days[0], from_day) if from_day else days[0]
+    if first > days[-1]:
+        return
+    remaining = HostDayOccupancy.pets_booked - pets
+    db.execute(
+        update(HostDayOccupancy)
+        .where(
+            HostDayOccupancy.pet_host_id == host_id,
+            HostDayOccupancy.day.between(first, days[-1]),
+        )
+        .values(pets_booked=case((remaining > 0, remaining), else_=0), updated_at=utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def release_capacity_many(
+    db: Session,
+    stays: Iterable[Tuple[int, datetime, datetime, int]],
+    from_day: Optional[date] = None,
+) -> None:
+    # Batched release_capacity for (host_id, checkin, checkout, pets) stays:
+    # one executemany UPDATE with per-(host, day) totals
+    totals: Counter = Counter()
+    for host_id, checkin, checkout, pets in stays:
+        for d in stay_days(checkin, checkout):
+            if from_day is None or d >= from_day:
+                totals[(host_id, d)] += pets
+    if not totals:
+        return
+    table = HostDayOccupancy.__table__
+    remaining = table.c.pets_booked - bindparam("pets")
+    # Core statement on the session's connection: a plain executemany, not an ORM bulk update
+    db.connection().execute(
+        table.update()
+        .where(table.c.pet_host_id == bindparam("host_id"), table.c.day == bindparam("d"))
+        .values(pets_booked=case((remaining > 0, remaining), else_=0), updated_at=utcnow()),
+        [{"host_id": h, "d": d, "pets": n} for (h, d), n in totals.items()],
+    )
+
+
+# -------------------- Search --------------------
+
+def _capacity_of_host():
+    return func.coalesce(PetHost.hosting_capacity, 1)
+
+
+def has_capacity(window: StayWindow):
+    """
+    SQL condition on PetHost: the host can take `pets` more pets on every
+    day of the window. A NOT EXISTS probe on the (host, day) primary key,
+    so no booking is ever read.
+    """
+    return and_(
+        _capacity_of_host() >= window.pets,
+        ~exists().where(
+            HostDayOccupancy.pet_host_id == PetHost.id,
+            HostDayOccupancy.day.between(window.first_day, window.last_day),
+            HostDayOccupancy.pets_booked + window.pets > _capacity_of_host(),
+        ),
+    )
+
+
+def unavailable_host_ids(db: Session, window: StayWindow) -> Set[int]:
+    # Hosts that cannot take the window; a day-range scan of ix_host_day_occupancy_day
+    full = (
+        db.query(HostDayOccupancy.pet_host_id)
+        .join(PetHost, PetHost.id == HostDayOccupancy.pet_host_id)
+        .filter(HostDayOccupancy.day.between(window.first_day, window.last_day))
+        .filter(HostDayOccupancy.pets_booked + window.pets > _capacity_of_host())
+        .distinct()
+    )
+    too_small = db.query(PetHost.id).filter(_capacity_of_host() < window.pets)
+    return {host_id for (host_id,) in full} | {host_id for (host_id,) in too_small}
+
+
+def occupancy_calendar(db: Session, host: PetHost, start: date, end: date) -> List[Dict]:
+    # Per-day booked / remaining capacity for [start, end]
+    booked = dict(
+        db.query(HostDayOccupancy.day, HostDayOccupancy.pets_booked).filter(
+            HostDayOccupancy.pet_host_id == host.id,
+            HostDayOccupancy.day.between(start, end),
+        )
+    )
+    capacity = host_capacity(host)
+    calendar = []
+    for i in range((end - start).days + 1):
+        d = start + timedelta(days=i)
+        n = booked.get(d, 0)
+        calendar.append({"date": d, "booked": n, "capacity": capacity, "remaining": max(capacity - n, 0)})
+    return calendar
+
+
+# -------------------- Rebuild --------------------
+
+def rebuild_occupancy(db: Session, host_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute occupancy from active bookings (all hosts, or just `host_ids`).
+    Walks bookings through the (host, checkin, checkout) index. Returns the
+    number of day rows written.
+    """
+    pets = (
+        db.query(BookingPetProfile.booking_id, func.count().label("pets"))
+        .group_by(BookingPetProfile.booking_id)
+        .subquery()
+    )
+    q = (
+        db.query(Booking.booked_pet_host_id, Booking.checkin_datetime, Booking.checkout_datetime, pets.c.pets)
+        .outerjoin(pets, pets.c.booking_id == Booking.id)
+        .filter(Booking.booking_status.in_(ACTIVE_BOOKING_STATUSES))
+        .filter(Booking.checkin_datetime.isnot(None), Booking.checkout_datetime.isnot(None))
+        .order_by(Booking.booked_pet_host_id, Booking.checkin_datetime)
+    )
+    occupancy = db.query(HostDayOccupancy)
+    if host_ids is not None:
+        host_ids = list(host_ids)
+        q = q.filter(Booking.booked_pet_host_id.in_(host_ids))
+        occupancy = occupancy.filter(HostDayOccupancy.pet_host_id.in_(host_ids))
+
+    counts: Counter = Counter()
+    for host_id, checkin, checkout, n in q.yield_per(1000):
+        if checkout <= checkin:
+            continue
+        for d in stay_days(checkin, min(checkout, checkin + timedelta(days=MAX_STAY_DAYS))):
+            counts[(host_id, d)] += max(n or 0, 1)
+
+    occupancy.delete(synchronize_session=False)
+    if counts:
+        db.execute(
+            sqlite_insert(HostDayOccupancy),
+            [{"pet_host_id": h, "day": d, "pets_booked": n} for (h, d), n in counts.items()],
+        )
+    db.commit()
+    return len(counts)
+
+
+def backfill_occupancy(db: Session) -> None:
+    # First start after the occupancy table was added: derive it from bookings
+    if db.query(HostDayOccupancy.pet_host_id).first() is None:
+        rebuild_occupancy(db)
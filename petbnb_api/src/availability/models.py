@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, Date, DateTime, ForeignKey, Index, func
+from core.database import Base, utcnow
+
+
+class HostDayOccupancy(Base):
+    """
+    Pets booked with a host on one calendar day. One row per (host, day)
+    that has ever been booked; reservations bump pets_booked with a
+    conditional UPDATE so capacity can never be exceeded.
+    """
+    __tablename__ = "host_day_occupancy"
+    __table_args__ = (
+        # date-range search: every (host, load) for the days of a window
+        Index("ix_host_day_occupancy_day", "day", "pets_booked", "pet_host_id"),
+    )
+
+    pet_host_id = Column(Integer, ForeignKey("pet_hosts.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    pets_booked = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=utcnow)
@@ -0,0 +1,37 @@
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from core.database import get_db
+from core.init import PetHost
+from .controllers import occupancy_calendar
+
+router = APIRouter(prefix="/availability", tags=["Availability"])
+
+MAX_CALENDAR_DAYS = 366
+
+
+@router.get("/host/{host_id}", summary="Per-day booked and remaining capacity for a host")
+def host_availability(
+    host_id: int,
+    start: Optional[date] = Query(None, description="First day (default: today)"),
+    end: Optional[date] = Query(None, description="Last day, inclusive (default: start + 30 days)"),
+    db: Session = Depends(get_db),
+):
+    host = db.query(PetHost).filter(PetHost.id == host_id).first()
+    if not host:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="PetHost not found")
+    start = start or date.today()
+    end = end or start + timedelta(days=30)
+    if end < start or (end - start).days >= MAX_CALENDAR_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": True, "message": f"end must be on or after start and at most {MAX_CALENDAR_DAYS} days later"},
+        )
+    return {
+        "host_id": host.id,
+        "capacity": host.hosting_capacity,
+        "days": occupancy_calendar(db, host, start, end),
+    }
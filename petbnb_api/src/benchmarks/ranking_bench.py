@@ -0,0 +1,60 @@
+"""
+Micro-benchmark for the vectorised host ranking engine.
+
+Run from src/:  python -m benchmarks.ranking_bench [--hosts 100000] [--runs 50]
+
+Loads synthetic feature columns straight into a HostRankingStore (no
+database) and times scoring + sorting the whole candidate set.
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from core.init import *  # noqa: F401,F403  (registers every mapper)
+from petHost.ranking import RANKING_PROFILES, HostRankingStore
+
+
+def synthetic_columns(n: int, seed: int = 7) -> dict:
+    rng = np.random.default_rng(seed)
+    return {
+        "host_id": np.arange(1, n + 1, dtype=np.int64),
+        "rating_unit": rng.integers(0, 6, n) / 5.0,
+        "log_reviews": np.log1p(rng.integers(0, 500, n)),
+        "is_superhost": (rng.random(n) < 0.1).astype(np.float64),
+        "is_verified": (rng.random(n) < 0.6).astype(np.float64),
+        "log_hosted": np.log1p(rng.integers(0, 300, n)),
+        "price_from": np.where(rng.random(n) < 0.05, np.nan, rng.uniform(200, 3000, n)),
+        "latitude": rng.uniform(8.0, 30.0, n),
+        "longitude": rng.uniform(70.0, 88.0, n),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--top", type=int, default=100, help="results kept per query (0 = full sort)")
+    args = parser.parse_args()
+    args.top = args.top or None
+
+    store = HostRankingStore()
+    store.load_columns(synthetic_columns(args.hosts))
+    candidates = np.arange(1, args.hosts + 1, dtype=np.int64)
+    origin = (18.52, 73.85)
+
+    print(f"{args.hosts} candidates, {args.runs} runs, top={args.top or 'all'}")
+    for profile in RANKING_PROFILES:
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            store.score(candidates, profile=profile, origin=origin, top=args.top)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"  {profile:<10} median {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
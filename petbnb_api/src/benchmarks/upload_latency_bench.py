@@ -0,0 +1,218 @@
+"""
+Latency of unrelated GETs while large image uploads are in flight.
+
+Run from src/:  uv run --group dev python -m benchmarks.upload_latency_bench [--uploaders 4] [--files 4] [--mb 8]
+
+Starts the app in one uvicorn worker on a throwaway database and media root
+(temp directory), then a prober sends GET --path back to back and reports
+its latencies for a quiet baseline and again while --uploaders processes
+keep posting multi-file JPEG uploads to /image-galleries/upload/multi.
+Clients run in their own processes so building the upload bodies doesn't
+skew the probe.
+
+With --mode both (the default) the server runs twice: "inline" patches
+core.uploads.save_upload to copy on the event loop, as the endpoints did
+before the upload I/O pool, and "pool" runs the code as shipped. Ingest
+and variant rendering are stubbed out unless --ingest is given, so the
+numbers isolate the copy path; with them on, a small machine is bound by
+image decoding in the process pool whichever copy path is used.
+--disk-mbps makes each copy take as long as it would on a volume of that
+speed; on a local SSD the copy mostly lands in the page cache and costs
+little next to Starlette's multipart parsing, which is on the event loop
+in both variants.
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import shutil
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+import httpx
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def _report(label: str, timings: List[float]) -> None:
+    print(
+        f"  {label:<16} n={len(timings):<6} median {statistics.median(timings):7.2f} ms"
+        f"   p99 {_percentile(timings, 0.99):7.2f} ms   max {max(timings):7.2f} ms"
+    )
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _probe(base_url: str, path: str, seconds: float) -> List[float]:
+    timings = []
+    deadline = time.monotonic() + seconds
+    with httpx.Client(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            client.get(path).raise_for_status()
+            timings.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.005)
+    return timings
+
+
+def _jpeg(mb: int) -> bytes:
+    # noise barely compresses, so the pixel count sets the file size
+    from PIL import Image
+
+    side = int((mb * 1024 * 1024 / 2.5) ** 0.5)
+    out = io.BytesIO()
+    Image.effect_noise((side, side), 100).convert("RGB").save(out, "JPEG", quality=98)
+    return out.getvalue()
+
+
+def _upload(base_url: str, host_id: int, files: int, mb: int, seconds: float, pause: float, written) -> None:
+    payload = _jpeg(mb)
+    deadline = time.monotonic() + seconds
+    with httpx.Client(base_url=base_url, timeout=None) as client:
+        while time.monotonic() < deadline:
+            client.post(
+                "/image-galleries/upload/multi",
+                data={"pet_host_id": str(host_id)},
+                files=[("files", (f"bench-{i}.jpg", payload, "image/jpeg")) for i in range(files)],
+            ).raise_for_status()
+            with written.get_lock():
+                written.value += files * mb
+            time.sleep(pause)
+
+
+def _seed_host(src: str) -> int:
+    sys.path.insert(0, src)
+    from core.database import SessionLocal, sync_schema
+    from core.init import PetHost
+
+    sync_schema()
+    with SessionLocal() as db:
+        host = PetHost(user_id="bench", first_name="Bench", last_name="Host")
+        db.add(host)
+        db.commit()
+        return host.id
+
+
+def _serve(port: int, inline: bool, ingest: bool, disk_mbps: float) -> None:
+    # Runs in a spawned process: apply the variant's patches, then serve the app
+    import uvicorn
+
+    import main
+    from core import uploads
+    from core.ingest import IngestedImage
+    from imageGallery import urls as gallery
+
+    if disk_mbps:
+        copy_upload = uploads.copy_upload
+
+        def throttled_copy(file, path):
+            # a volume slower than the page cache: the copy blocks its thread for size / rate
+            copy_upload(file, path)
+            time.sleep(path.stat().st_size / (disk_mbps * 1024 * 1024))
+            return path
+
+        uploads.copy_upload = throttled_copy  # both save_upload variants look it up per call
+    if inline:
+        async def save_upload(file, path):
+            return uploads.copy_upload(file, path)
+
+        uploads.save_upload = gallery.save_upload = save_upload  # save_uploads looks it up per call
+    if not ingest:
+        async def ingest_images(raws):
+            return [IngestedImage(raw, raw.stat().st_size, raw.stat().st_size, 0, 0) for raw in raws]
+
+        gallery.ingest_images = ingest_images
+        gallery.request_variants = lambda *args: False
+    uvicorn.run(main.app, port=port, log_level="warning")
+
+
+def _run(host_id: int, args, inline: bool) -> None:
+    path = args.path.format(host_id=host_id)
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = multiprocessing.get_context("spawn").Process(target=_serve, args=(port, inline, args.ingest, args.disk_mbps))
+    server.start()
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(base_url + "/healthz").raise_for_status()
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        httpx.get(base_url + path).raise_for_status()  # warm up
+
+        quiet = _probe(base_url, path, args.seconds)
+
+        written = multiprocessing.Value("i", 0)
+        uploaders = [
+            multiprocessing.Process(target=_upload, args=(base_url, host_id, args.files, args.mb, args.seconds, args.pause, written))
+            for _ in range(args.uploaders)
+        ]
+        for p in uploaders:
+            p.start()
+        time.sleep(0.5)  # let the first bodies reach the server
+        loaded = _probe(base_url, path, args.seconds)
+        for p in uploaders:
+            p.join()
+    finally:
+        server.terminate()
+        server.join()
+
+    print(f"{'inline' if inline else 'pool'}: GET {path}; {args.uploaders} uploaders x {args.files} files x {args.mb} MB"
+          f"{'' if args.ingest else ', ingest stubbed'}{f', disk {args.disk_mbps:g} MB/s' if args.disk_mbps else ''}")
+    _report("quiet", quiet)
+    _report("during uploads", loaded)
+    print(f"  uploaded {written.value} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploaders", type=int, default=4, help="concurrent upload clients")
+    parser.add_argument("--files", type=int, default=4, help="files per upload request")
+    parser.add_argument("--mb", type=int, default=8, help="size of each file")
+    parser.add_argument("--seconds", type=float, default=10.0, help="length of each phase")
+    parser.add_argument(
+        "--pause", type=float, default=1.0,
+        help="seconds each uploader waits between requests; 0 saturates a small machine's CPU",
+    )
+    parser.add_argument("--path", default="/image-galleries/by-host/{host_id}?limit=20", help="GET being probed")
+    parser.add_argument(
+        "--mode", choices=("both", "inline", "pool"), default="both",
+        help="inline: copy on the event loop (before); pool: upload I/O pool (after)",
+    )
+    parser.add_argument("--ingest", action="store_true", help="keep image ingest and variant rendering")
+    parser.add_argument(
+        "--disk-mbps", type=float, default=0,
+        help="model a volume writing this many MB/s (network disk); 0 writes to the page cache as is",
+    )
+    args = parser.parse_args()
+
+    # the app keeps sqlite.db and its media next to the working directory;
+    # both runs share it (the engine pins the database path on import)
+    src = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="petbnb-upload-bench-")
+    os.chdir(workdir)
+    os.makedirs("pet_uploads", exist_ok=True)
+    os.environ.update(MEDIA_ROOT=os.path.join(workdir, "media"), SCHEDULER_ENABLED="0")
+    try:
+        host_id = _seed_host(src)
+        for inline in {"both": (True, False), "inline": (True,), "pool": (False,)}[args.mode]:
+            _run(host_id, args, inline)
+    finally:
+        os.chdir(src)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+import csv
+import io
+import json
+import os
+from collections import defaultdict
+from typing import IO, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from availability.controllers import ACTIVE_BOOKING_STATUSES, host_capacity, stay_days, try_reserve_days
+from core.database import SessionLocal
+from petHost.models import PetHost
+from petProfile.models import PetProfile
+from .duplicates import active_fingerprints, booking_fingerprint
+from .models import Booking, BookingPetProfile, BookingService
+from .schemas import BookingCreateSchema
+
+# -------------------- Bulk import / export --------------------
+# Partner migrations and finance dumps. Both directions work in bounded
+# batches, so memory stays flat whatever the file size: imports commit
+# every IMPORT_CHUNK_LINES lines, exports read EXPORT_BATCH_SIZE bookings
+# per short query.
+
+IMPORT_CHUNK_LINES = int(os.environ.get("BOOKING_IMPORT_CHUNK_LINES", 500))
+EXPORT_BATCH_SIZE = int(os.environ.get("BOOKING_EXPORT_BATCH_SIZE", 1000))
+MAX_REPORTED_ERRORS = 1000
+
+CSV_COLUMNS = (
+    "id",
+    "booking_uuid",
+    "user_id",
+    "booked_pet_host_id",
+    "checkin_datetime",
+    "checkout_datetime",
+    "booking_status",
+    "payment_status",
+    "cancelled_by",
+    "is_canceled",
+    "created_at",
+    "updated_at",
+    "booked_for_service",       # JSON list of {service_name, service_amt, amt_basis}
+    "booked_for_pet_profiles",  # JSON list of pet profile ids
+)
+CSV_JSON_COLUMNS = ("booked_for_service", "booked_for_pet_profiles")
+
+
+class LineError(Exception):
+    pass
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def fail(self, line: int, message: Any, booking_uuid: Optional[str] = None) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "booking_uuid": booking_uuid, "message": message})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "error": self.failed > 0,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+# -------------------- Import --------------------
+
+def ndjson_records(stream: IO[bytes]) -> Iterator[Tuple[int, Any]]:
+    # (line number, decoded object or LineError); blank lines are skipped
+    for number, raw in enumerate(stream, start=1):
+        if not raw.strip():
+            continue
+        try:
+            yield number, json.loads(raw)
+        except ValueError as exc:
+            yield number, LineError(f"Invalid JSON: {exc}")
+
+
+def csv_records(stream: IO[bytes]) -> Iterator[Tuple[int, Any]]:
+    # Same shape as ndjson_records; empty cells fall back to schema defaults
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8", newline=""))
+    for row in reader:
+        number = reader.line_num
+        record: Dict[str, Any] = {}
+        try:
+            for name, value in row.items():
+                if name is None or value is None or value == "":
+                    continue
+                record[name] = json.loads(value) if name in CSV_JSON_COLUMNS else value
+        except ValueError as exc:
+            yield number, LineError(f"Invalid JSON in CSV cell: {exc}")
+            continue
+        yield number, record
+
+
+def _chunks(records: Iterator[Tuple[int, Any]], size: int) -> Iterator[List[Tuple[int, Any]]]:
+    chunk: List[Tuple[int, Any]] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _detail_message(exc: HTTPException) -> Any:
+    detail = exc.detail
+    return detail.get("message", detail) if isinstance(detail, dict) else detail
+
+
+def import_chunk(db: Session, lines: Sequence[Tuple[int, Any]], report: ImportReport) -> None:
+    """
+    Validate and insert one chunk in one transaction. Hosts, pet owners,
+    existing booking_uuids and active duplicates for the whole chunk are
+    read with four IN queries; active bookings reserve host capacity line by
+    line, so a line that does not fit fails alone. Bookings and their children go in as
+    three bulk INSERTs.
+    """
+    parsed: List[Tuple[int, BookingCreateSchema]] = []
+    for number, record in lines:
+        if isinstance(record, LineError):
+            report.fail(number, str(record))
+            continue
+        try:
+            parsed.append((number, BookingCreateSchema.model_validate(record)))
+        except ValidationError as exc:
+            uuid = record.get("booking_uuid") if isinstance(record, dict) else None
+            report.fail(number, exc.errors(include_url=False, include_context=False), uuid)
+    if not parsed:
+        return
+
+    host_ids = {p.booked_pet_host_id for _, p in parsed}
+    hosts = {h.id: h for h in db.query(PetHost.id, PetHost.hosting_capacity).filter(PetHost.id.in_(host_ids))}
+    pet_ids = {pet_id for _, p in parsed for pet_id in p.booked_for_pet_profiles}
+    owners = dict(db.query(PetProfile.id, PetProfile.owner).filter(PetProfile.id.in_(pet_ids))) if pet_ids else {}
+    seen = {
+        uuid for (uuid,) in db.query(Booking.booking_uuid)
+        .filter(Booking.booking_uuid.in_({p.booking_uuid for _, p in parsed}))
+    }
+
+    fingerprints = {
+        p.booking_uuid: booking_fingerprint(
+            p.user_id, p.booked_pet_host_id, p.checkin_datetime, p.checkout_datetime, p.booked_for_pet_profiles,
+        )
+        for _, p in parsed
+    }
+    active = active_fingerprints(db, fingerprints.values())
+
+    accepted: List[Tuple[int, BookingCreateSchema, List[int]]] = []
+    for number, p in parsed:
+        try:
+            if p.booking_uuid in seen:
+                raise LineError(f"Booking {p.booking_uuid} already exists")
+            host = hosts.get(p.booked_pet_host_id)
+            if host is None:
+                raise LineError(f"Pet Host {p.booked_pet_host_id} not found")
+            pets = list(dict.fromkeys(p.booked_for_pet_profiles))
+            missing = [pet_id for pet_id in pets if owners.get(pet_id) != p.user_id]
+            if missing:
+                raise LineError(f"Pet Profile {', '.join(str(pet_id) for pet_id in missing)} not found")
+            days = stay_days(p.checkin_datetime, p.checkout_datetime)
+            is_active = p.booking_status.value in ACTIVE_BOOKING_STATUSES
+            fingerprint = fingerprints[p.booking_uuid]
+            if is_active and fingerprint in active:
+                raise LineError(f"Duplicate of booking {active[fingerprint]} (same user, host, dates and pets)")
+            if is_active:
+                capacity = host_capacity(host)
+                if not try_reserve_days(db, host.id, capacity, days, max(len(pets), 1)):
+                    raise LineError("Host does not have capacity for the selected dates")
+        except LineError as exc:
+            report.fail(number, str(exc), p.booking_uuid)
+            continue
+        except HTTPException as exc:
+            report.fail(number, _detail_message(exc), p.booking_uuid)
+            continue
+        seen.add(p.booking_uuid)
+        if is_active:
+            active[fingerprint] = p.booking_uuid  # a later line in this file duplicating it fails too
+        accepted.append((number, p, pets))
+
+    if not accepted:
+        db.rollback()
+        return
+    try:
+        ids = db.execute(
+            insert(Booking).returning(Booking.id, sort_by_parameter_order=True),
+            [
+                {
+                    "booking_uuid": p.booking_uuid,
+                    "user_id": p.user_id,
+                    "booked_pet_host_id": p.booked_pet_host_id,
+                    "checkin_datetime": p.checkin_datetime,
+                    "checkout_datetime": p.checkout_datetime,
+                    "booking_status": p.booking_status.value,
+                    "payment_status": p.payment_status.value,
+                    "cancelled_by": p.cancelled_by.value if p.cancelled_by else None,
+                    "is_canceled": p.is_canceled,
+                    "fingerprint": fingerprints[p.booking_uuid],
+                }
+                for _, p, _ in accepted
+            ],
+        ).scalars().all()
+        services = [
+            {"booking_id": booking_id, "service_name": s.service_name, "service_amt": s.service_amt, "amt_basis": s.amt_basis}
+            for booking_id, (_, p, _) in zip(ids, accepted)
+            for s in p.booked_for_service
+        ]
+        if services:
+            db.execute(insert(BookingService), services)
+        pets = [
+            {"booking_id": booking_id, "pet_profile_id": pet_id}
+            for booking_id, (_, _, pet_ids) in zip(ids, accepted)
+            for pet_id in pet_ids
+        ]
+        if pets:
+            db.execute(insert(BookingPetProfile), pets)
+        db.commit()
+    except SQLAlchemyError as exc:
+        # e.g. a booking_uuid created concurrently: the whole chunk is retried by resubmitting its lines
+        db.rollback()
+        for number, p, _ in accepted:
+            report.fail(number, f"Chunk rolled back: {exc.__class__.__name__}", p.booking_uuid)
+        return
+    report.imported += len(accepted)
+
+
+def import_bookings(stream: IO[bytes], fmt: str) -> Dict[str, Any]:
+    records = csv_records(stream) if fmt == "csv" else ndjson_records(stream)
+    report = ImportReport()
+    with SessionLocal() as db:
+        for chunk in _chunks(records, IMPORT_CHUNK_LINES):
+            import_chunk(db, chunk, report)
+    return report.as_dict()
+
+
+# -------------------- Export --------------------
+
+def _export_row(booking: Booking, services: List[BookingService], pets: List[BookingPetProfile]) -> Dict[str, Any]:
+    return {
+        "id": booking.id,
+        "booking_uuid": booking.booking_uuid,
+        "user_id": booking.user_id,
+        "booked_pet_host_id": booking.booked_pet_host_id,
+        "checkin_datetime": booking.checkin_datetime.isoformat(),
+        "checkout_datetime": booking.checkout_datetime.isoformat(),
+        "booking_status": booking.booking_status,
+        "payment_status": booking.payment_status,
+        "cancelled_by": booking.cancelled_by,
+        "is_canceled": booking.is_canceled,
+        "created_at": booking.created_at.isoformat() if booking.created_at else None,
+        "updated_at": booking.updated_at.isoformat() if booking.updated_at else None,
+        "booked_for_service": [
+            {"service_name": s.service_name, "service_amt": s.service_amt, "amt_basis": s.amt_basis}
+            for s in services
+        ],
+        "booked_for_pet_profiles": [p.pet_profile_id for p in pets],
+    }
+
+
+def export_batches(
+    user_id: Optional[str] = None,
+    host_id: Optional[int] = None,
+    statuses: Optional[Sequence[str]] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Bookings in id order, EXPORT_BATCH_SIZE at a time. Each batch is its own
+    keyset query (id > last id) plus two IN queries for the children,
+    rather than one cursor held open for the whole dump: on SQLite an open
+    read keeps writers from committing, so bookings keep flowing while a
+    large export runs.
+    """
+    last_id = 0
+    with SessionLocal() as db:
+        while True:
+            q = db.query(Booking).filter(Booking.id > last_id)
+            if user_id is not None:
+                q = q.filter(Booking.user_id == user_id)
+            if host_id is not None:
+                q = q.filter(Booking.booked_pet_host_id == host_id)
+            if statuses:
+                q = q.filter(Booking.booking_status.in_(list(statuses)))
+            bookings = q.order_by(Booking.id).limit(EXPORT_BATCH_SIZE).all()
+            if not bookings:
+                return
+            ids = [b.id for b in bookings]
+            services: Dict[int, List[BookingService]] = defaultdict(list)
+            for service in db.query(BookingService).filter(BookingService.booking_id.in_(ids)).order_by(BookingService.id):
+                services[service.booking_id].append(service)
+            pets: Dict[int, List[BookingPetProfile]] = defaultdict(list)
+            for pet in db.query(BookingPetProfile).filter(BookingPetProfile.booking_id.in_(ids)).order_by(BookingPetProfile.id):
+                pets[pet.booking_id].append(pet)
+            rows = [_export_row(b, services[b.id], pets[b.id]) for b in bookings]
+            # end the read transaction and drop the batch before handing it out
+            db.rollback()
+            db.expunge_all()
+            yield rows
+            last_id = ids[-1]
+
+
+def export_ndjson(**filters) -> Iterator[bytes]:
+    for rows in export_batches(**filters):
+        yield "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows).encode()
+
+
+def export_csv(**filters) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    for rows in export_batches(**filters):
+        for row in rows:
+            writer.writerow({
+                **row,
+                **{name: json.dumps(row[name], separators=(",", ":")) for name in CSV_JSON_COLUMNS},
+            })
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
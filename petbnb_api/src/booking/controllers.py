@@ -0,0 +1,278 @@
+import uuid
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Query, Session, lazyload, selectinload
+
+from availability.controllers import ACTIVE_BOOKING_STATUSES, reserve_capacity
+from core.database import utcnow
+from core.outbox import enqueue_events
+from core.pagination import decode_cursor, encode_cursor
+from petHost.models import PetHost
+from petProfile.models import PetProfile
+from .duplicates import booking_fingerprint, raise_if_duplicate
+from .events import booking_created_event, payment_changed_event
+from .idempotency import booking_created_body, complete_key
+from .lifecycle import BookingTransition, finish_transitions
+from .models import Booking, BookingPetProfile, BookingService, BookingStatusEnum, CancelledByEnum
+from .schemas import BookingCreateSchema
+
+# Status moves a booking may make; completed and cancelled are final
+BOOKING_TRANSITIONS = {
+    BookingStatusEnum.waiting.value: {BookingStatusEnum.confirmed.value, BookingStatusEnum.cancelled.value},
+    BookingStatusEnum.confirmed.value: {
+        BookingStatusEnum.ongoing.value,
+        BookingStatusEnum.completed.value,
+        BookingStatusEnum.cancelled.value,
+    },
+    BookingStatusEnum.ongoing.value: {BookingStatusEnum.completed.value, BookingStatusEnum.cancelled.value},
+    BookingStatusEnum.completed.value: set(),
+    BookingStatusEnum.cancelled.value: set(),
+}
+
+
+# -------------------- Create --------------------
+
+class CreatedBooking(NamedTuple):
+    id: int
+    booking_uuid: str
+
+
+def insert_booking(
+    db: Session,
+    payload: BookingCreateSchema,
+    idempotency_key: Optional[str] = None,
+) -> CreatedBooking:
+    """
+    Validate and write a booking, its services and its pets in one
+    transaction (one commit): capacity reservation, duplicate check, booking
+    row, bulk child inserts, the booking.created outbox event and the idempotency record's
+    stored response either all land or none do. Returns the keys captured
+    before the commit, so nothing is reloaded afterwards.
+    """
+    # host without its eager-loaded profile collections; only capacity is needed
+    host = (
+        db.query(PetHost)
+        .options(lazyload("*"))
+        .filter(PetHost.id == payload.booked_pet_host_id)
+        .first()
+    )
+    if not host:
+        raise HTTPException(status_code=404, detail="Pet Host not found")
+
+    # every pet must belong to the booking user: one IN query
+    pet_ids = list(dict.fromkeys(payload.booked_for_pet_profiles))
+    if pet_ids:
+        owned = {
+            pet_id for (pet_id,) in db.query(PetProfile.id).filter(
+                PetProfile.id.in_(pet_ids),
+                PetProfile.owner == payload.user_id,
+            )
+        }
+        missing = [pet_id for pet_id in pet_ids if pet_id not in owned]
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Pet Profile {', '.join(str(pet_id) for pet_id in missing)} not found",
+            )
+
+    # only active bookings hold capacity (as in bulk import and rebuild_occupancy);
+    # a booking created already cancelled/completed never gets a transition to release it
+    is_active = payload.booking_status.value in ACTIVE_BOOKING_STATUSES
+    if is_active:
+        reserve_capacity(
+            db, host,
+            payload.checkin_datetime, payload.checkout_datetime,
+            pets=max(len(pet_ids), 1),
+        )
+
+    # after the reservation's write, so a concurrent double-tap is serialised behind it
+    fingerprint = booking_fingerprint(
+        payload.user_id, host.id, payload.checkin_datetime, payload.checkout_datetime, pet_ids,
+    )
+    if is_active:
+        raise_if_duplicate(db, fingerprint)
+
+    booking = Booking(
+        booking_uuid=payload.booking_uuid or str(uuid.uuid4()),
+        user_id=payload.user_id,
+        booked_pet_host_id=host.id,
+        checkin_datetime=payload.checkin_datetime,
+        checkout_datetime=payload.checkout_datetime,
+        booking_status=payload.booking_status.value,
+        payment_status=payload.payment_status.value,
+        cancelled_by=payload.cancelled_by.value if payload.cancelled_by else None,
+        is_canceled=payload.is_canceled,
+        fingerprint=fingerprint,
+    )
+    db.add(booking)
+    try:
+        db.flush()  # assigns booking.id
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error": True, "message": f"Booking {booking.booking_uuid} already exists"},
+        )
+
+    if payload.booked_for_service:
+        db.execute(
+            insert(BookingService),
+            [
+                {
+                    "booking_id": booking.id,
+                    "service_name": service.service_name,
+                    "service_amt": service.service_amt,
+                    "amt_basis": service.amt_basis,
+                }
+                for service in payload.booked_for_service
+            ],
+        )
+    if pet_ids:
+        db.execute(
+            insert(BookingPetProfile),
+            [{"booking_id": booking.id, "pet_profile_id": pet_id} for pet_id in pet_ids],
+        )
+    # notifications and index updates go out through the outbox after commit
+    enqueue_events(db, [booking_created_event(booking, pet_ids)])
+    created = CreatedBooking(booking.id, booking.booking_uuid)
+    if idempotency_key is not None:
+        complete_key(db, idempotency_key, created.id, status.HTTP_200_OK, booking_created_body(*created))
+    db.commit()
+    return created
+
+
+# -------------------- Status --------------------
+
+def change_booking_status(
+    db: Session,
+    booking: Booking,
+    new_status: str,
+    cancelled_by: Optional[str] = None,
+) -> Booking:
+    """
+    Move a booking to new_status and run the transition side effects
+    (capacity release, hooks) in the same transaction. The UPDATE is guarded
+    by the old status, so two racing requests, or a request racing the
+    lifecycle scheduler, cannot both apply it.
+    """
+    current = booking.booking_status
+    if new_status == current:
+        return booking
+    if new_status not in BOOKING_TRANSITIONS.get(current, set()):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error": True, "message": f"Cannot move a {current} booking to {new_status}"},
+        )
+
+    values = {"booking_status": new_status, "updated_at": utcnow()}
+    if new_status == BookingStatusEnum.cancelled.value:
+        values["is_canceled"] = True
+        values["cancelled_by"] = cancelled_by or CancelledByEnum.other.value
+    result = db.execute(
+        update(Booking)
+        .where(Booking.id == booking.id, Booking.booking_status == current)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error": True, "message": "Booking status was changed by another request"},
+        )
+
+    # capacity release and transition hooks, in this transaction
+    finish_transitions(db, [
+        BookingTransition(booking.id, booking.booked_pet_host_id, current, new_status,
+                          booking.checkin_datetime, booking.checkout_datetime)
+    ])
+    db.commit()
+    db.refresh(booking)
+    return booking
+
+
+def change_payment_status(db: Session, booking: Booking, new_status: str) -> Booking:
+    # Guarded like change_booking_status; the booking.payment_changed event commits with it
+    current = booking.payment_status
+    if new_status == current:
+        return booking
+    result = db.execute(
+        update(Booking)
+        .where(Booking.id == booking.id, Booking.payment_status == current)
+        .values(payment_status=new_status, updated_at=utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error": True, "message": "Payment status was changed by another request"},
+        )
+    enqueue_events(db, [payment_changed_event(booking, current, new_status)])
+    db.commit()
+    db.refresh(booking)
+    return booking
+
+
+# -------------------- History --------------------
+
+def booking_history_page(
+    q: Query,
+    statuses: Optional[Sequence[str]] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    newest_first: bool = True,
+) -> Tuple[List[Booking], Optional[str]]:
+    """
+    One page of a user's or host's bookings, keyset-paginated on
+    (checkin_datetime, id). q is already narrowed to one user or host, so
+    each page is a range scan of ix_bookings_user_checkin_id /
+    ix_bookings_host_checkin_id that starts right after the previous page,
+    however long the history. Services and pets come in two batched
+    selectin queries.
+    """
+    if statuses:
+        # `status || ''` keeps SQLite off ix_bookings_status_checkin, which it
+        # prefers for a single status and which spans every user and host
+        q = q.filter(Booking.booking_status.concat("").in_(list(statuses)))
+    after = decode_cursor(cursor, 2)
+    if after is not None:
+        try:
+            last_checkin, last_id = datetime.fromisoformat(after[0]), int(after[1])
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"error": True, "message": "Invalid cursor"},
+            )
+        if newest_first:
+            q = q.filter(or_(
+                Booking.checkin_datetime < last_checkin,
+                and_(Booking.checkin_datetime == last_checkin, Booking.id < last_id),
+            ))
+        else:
+            q = q.filter(or_(
+                Booking.checkin_datetime > last_checkin,
+                and_(Booking.checkin_datetime == last_checkin, Booking.id > last_id),
+            ))
+
+    order = (
+        (Booking.checkin_datetime.desc(), Booking.id.desc()) if newest_first
+        else (Booking.checkin_datetime.asc(), Booking.id.asc())
+    )
+    rows = (
+        q.options(selectinload(Booking.services), selectinload(Booking.pets))
+        .order_by(*order)
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last.checkin_datetime.isoformat(), last.id])
+    return rows, next_cursor
@@ -0,0 +1,229 @@
+import hashlib
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session, aliased
+
+from availability.controllers import ACTIVE_BOOKING_STATUSES
+from core.database import SessionLocal, utcnow
+from core.scheduler import register_job
+from .lifecycle import BookingTransition, finish_transitions
+from .models import Booking, BookingPetProfile, BookingStatusEnum, CancelledByEnum, PaymentStatusEnum
+
+# -------------------- Duplicate bookings --------------------
+# A double-tapped "Book" sends two requests with different booking_uuids, so
+# idempotency keys don't catch it. Every booking stores a fingerprint of
+# what makes two bookings the same stay (user, host, check-in and check-out
+# day, pet set); creating an active booking whose fingerprint matches an
+# active one is refused with one lookup on ix_bookings_fingerprint. Rows
+# written before fingerprints existed are filled in and checked by the
+# booking_duplicate_scan job.
+
+DUPLICATE_SCAN_INTERVAL_SECONDS = float(os.environ.get("BOOKING_DUPLICATE_SCAN_INTERVAL_SECONDS", 3600))
+DUPLICATE_SCAN_BATCH_SIZE = int(os.environ.get("BOOKING_DUPLICATE_SCAN_BATCH_SIZE", 500))
+# "flag" only records duplicate_of; "cancel" also cancels duplicates that are still waiting and unpaid
+DUPLICATE_SCAN_ACTION = os.environ.get("BOOKING_DUPLICATE_SCAN_ACTION", "flag")
+
+
+def booking_fingerprint(
+    user_id: str,
+    host_id: int,
+    checkin: datetime,
+    checkout: datetime,
+    pet_ids: Iterable[int],
+) -> str:
+    # day granularity: 10:00 vs 10:30 check-in on the same day is still the same stay
+    key = "|".join((
+        user_id,
+        str(host_id),
+        checkin.date().isoformat(),
+        checkout.date().isoformat(),
+        ",".join(str(pet_id) for pet_id in sorted(set(pet_ids))),
+    ))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def active_with_fingerprint(fingerprints: Iterable[str]):
+    # concat("") keeps the planner on ix_bookings_fingerprint rather than the status indexes
+    return (
+        Booking.fingerprint.in_(list(fingerprints)),
+        Booking.booking_status.concat("").in_(ACTIVE_BOOKING_STATUSES),
+    )
+
+
+def find_duplicate(db: Session, fingerprint: str) -> Optional[int]:
+    return (
+        db.query(Booking.id)
+        .filter(*active_with_fingerprint([fingerprint]))
+        .order_by(Booking.id)
+        .limit(1)
+        .scalar()
+    )
+
+
+def active_fingerprints(db: Session, fingerprints: Iterable[str]) -> Dict[str, int]:
+    # fingerprint -> oldest active booking id, for a batch of fingerprints in one IN query
+    fingerprints = set(fingerprints)
+    if not fingerprints:
+        return {}
+    found: Dict[str, int] = {}
+    for booking_id, fingerprint in (
+        db.query(Booking.id, Booking.fingerprint).filter(*active_with_fingerprint(fingerprints)).order_by(Booking.id)
+    ):
+        found.setdefault(fingerprint, booking_id)
+    return found
+
+
+def raise_if_duplicate(db: Session, fingerprint: str) -> None:
+    duplicate_of = find_duplicate(db, fingerprint)
+    if duplicate_of is not None:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "error": True,
+                "message": f"Duplicate of booking {duplicate_of} (same user, host, dates and pets)",
+                "duplicate_of": duplicate_of,
+            },
+        )
+
+
+# -------------------- Historical scan --------------------
+
+def _cancel_duplicates(db: Session, booking_ids: List[int]) -> int:
+    # guarded like change_booking_status: only rows still waiting and unpaid move
+    if not booking_ids:
+        return 0
+    rows = db.execute(
+        update(Booking)
+        .where(
+            Booking.id.in_(booking_ids),
+            Booking.booking_status == BookingStatusEnum.waiting.value,
+            Booking.payment_status == PaymentStatusEnum.unpaid.value,
+        )
+        .values(
+            booking_status=BookingStatusEnum.cancelled.value,
+            is_canceled=True,
+            cancelled_by=CancelledByEnum.duplicate_booking.value,
+            updated_at=utcnow(),
+        )
+        .returning(Booking.id, Booking.booked_pet_host_id, Booking.checkin_datetime, Booking.checkout_datetime)
+        .execution_options(synchronize_session=False)
+    ).all()
+    finish_transitions(db, [
+        BookingTransition(r.id, r.booked_pet_host_id, BookingStatusEnum.waiting.value,
+                          BookingStatusEnum.cancelled.value, r.checkin_datetime, r.checkout_datetime)
+        for r in rows
+    ])
+    return len(rows)
+
+
+def scan_duplicate_batch(db: Session, batch_size: int, action: str = DUPLICATE_SCAN_ACTION) -> Dict[str, int]:
+    """
+    Fingerprint the next batch_size bookings that have none (oldest first,
+    so a group's oldest booking is always fingerprinted before the rest)
+    and flag every active booking sharing a fingerprint with an older
+    active one. One transaction per batch.
+    """
+    rows = (
+        db.query(Booking.id, Booking.user_id, Booking.booked_pet_host_id, Booking.checkin_datetime, Booking.checkout_datetime)
+        .filter(Booking.fingerprint.is_(None))
+        .order_by(Booking.id)
+        .limit(batch_size)
+        .all()
+    )
+    if not rows:
+        db.rollback()
+        return {"fingerprinted": 0, "flagged": 0, "cancelled": 0}
+
+    pets: Dict[int, List[int]] = defaultdict(list)
+    for booking_id, pet_id in db.query(BookingPetProfile.booking_id, BookingPetProfile.pet_profile_id).filter(
+        BookingPetProfile.booking_id.in_([r.id for r in rows])
+    ):
+        pets[booking_id].append(pet_id)
+    fingerprints = [
+        {
+            "b_id": r.id,
+            "fp": booking_fingerprint(r.user_id, r.booked_pet_host_id, r.checkin_datetime, r.checkout_datetime, pets[r.id]),
+        }
+        for r in rows
+    ]
+    table = Booking.__table__
+    db.connection().execute(
+        table.update().where(table.c.id == bindparam("b_id")).values(fingerprint=bindparam("fp")),
+        fingerprints,
+    )
+
+    # each group's oldest active booking is kept; the others point at it
+    groups: Dict[str, List[Any]] = defaultdict(list)
+    for booking in (
+        db.query(Booking.id, Booking.fingerprint, Booking.booking_status, Booking.payment_status, Booking.duplicate_of)
+        .filter(*active_with_fingerprint({f["fp"] for f in fingerprints}))
+        .order_by(Booking.id)
+    ):
+        groups[booking.fingerprint].append(booking)
+    flagged = [
+        {"b_id": dup.id, "keeper": keeper.id}
+        for keeper, *dups in groups.values()
+        for dup in dups
+        if dup.duplicate_of != keeper.id
+    ]
+    if flagged:
+        db.connection().execute(
+            table.update().where(table.c.id == bindparam("b_id")).values(duplicate_of=bindparam("keeper")),
+            flagged,
+        )
+    cancelled = _cancel_duplicates(db, [f["b_id"] for f in flagged]) if action == "cancel" else 0
+    db.commit()
+    return {"fingerprinted": len(rows), "flagged": len(flagged), "cancelled": cancelled}
+
+
+def cancel_flagged_batch(db: Session, batch_size: int) -> Tuple[int, int]:
+    """
+    Cancel up to batch_size bookings an earlier scan flagged (duplicate_of
+    set) that are still waiting and unpaid, as long as the booking they
+    duplicate is still active. Returns (selected, cancelled).
+    """
+    keeper = aliased(Booking)
+    booking_ids = [
+        booking_id for (booking_id,) in (
+            db.query(Booking.id)
+            .join(keeper, keeper.id == Booking.duplicate_of)
+            .filter(
+                Booking.booking_status == BookingStatusEnum.waiting.value,
+                Booking.payment_status == PaymentStatusEnum.unpaid.value,
+                keeper.booking_status.in_(ACTIVE_BOOKING_STATUSES),
+            )
+            .order_by(Booking.id)
+            .limit(batch_size)
+        )
+    ]
+    cancelled = _cancel_duplicates(db, booking_ids)
+    db.commit()
+    return len(booking_ids), cancelled
+
+
+def run_duplicate_scan(batch_size: int = DUPLICATE_SCAN_BATCH_SIZE, action: str = DUPLICATE_SCAN_ACTION) -> Dict[str, int]:
+    # One scheduler tick: a no-op index probe once every booking has a fingerprint
+    totals = {"fingerprinted": 0, "flagged": 0, "cancelled": 0}
+    with SessionLocal() as db:
+        while True:
+            counts = scan_duplicate_batch(db, batch_size, action)
+            for name, n in counts.items():
+                totals[name] += n
+            if counts["fingerprinted"] < batch_size:
+                break
+        # rows flagged by earlier "flag" runs are never fingerprinted again
+        while action == "cancel":
+            selected, cancelled = cancel_flagged_batch(db, batch_size)
+            totals["cancelled"] += cancelled
+            if selected < batch_size or not cancelled:
+                break
+    return totals
+
+
+register_job("booking_duplicate_scan", DUPLICATE_SCAN_INTERVAL_SECONDS, run_duplicate_scan)
@@ -0,0 +1,69 @@
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from core.outbox import NewEvent, enqueue_events
+from .lifecycle import BookingTransition, on_booking_transition
+from .models import Booking, BookingStatusEnum
+
+# -------------------- Booking events --------------------
+# Written to the outbox inside the booking's own transaction; notifications,
+# webhooks and index updates happen in the outbox dispatcher afterwards.
+
+BOOKING_CREATED = "booking.created"
+BOOKING_STATUS_CHANGED = "booking.status_changed"
+BOOKING_CANCELLED = "booking.cancelled"
+BOOKING_PAYMENT_CHANGED = "booking.payment_changed"
+BOOKING_EVENT_TYPES = (BOOKING_CREATED, BOOKING_STATUS_CHANGED, BOOKING_CANCELLED, BOOKING_PAYMENT_CHANGED)
+
+
+def booking_created_event(booking: Booking, pet_ids: List[int]) -> NewEvent:
+    return NewEvent(BOOKING_CREATED, "booking", booking.id, {
+        "booking_id": booking.id,
+        "booking_uuid": booking.booking_uuid,
+        "user_id": booking.user_id,
+        "host_id": booking.booked_pet_host_id,
+        "checkin_datetime": booking.checkin_datetime,
+        "checkout_datetime": booking.checkout_datetime,
+        "booking_status": booking.booking_status,
+        "payment_status": booking.payment_status,
+        "pet_profile_ids": pet_ids,
+    })
+
+
+def payment_changed_event(booking: Booking, from_status: str, to_status: str) -> NewEvent:
+    return NewEvent(BOOKING_PAYMENT_CHANGED, "booking", booking.id, {
+        "booking_id": booking.id,
+        "user_id": booking.user_id,
+        "host_id": booking.booked_pet_host_id,
+        "booking_status": booking.booking_status,
+        "from_payment_status": from_status,
+        "to_payment_status": to_status,
+    })
+
+
+@on_booking_transition
+def _enqueue_transition_events(db: Session, transitions: List[BookingTransition]) -> None:
+    # owner and cancellation reason for the whole batch in one IN query
+    details = {
+        row.id: row for row in db.query(Booking.id, Booking.user_id, Booking.cancelled_by, Booking.payment_status)
+        .filter(Booking.id.in_([t.booking_id for t in transitions]))
+    }
+    events = []
+    for t in transitions:
+        row = details.get(t.booking_id)
+        cancelled = t.to_status == BookingStatusEnum.cancelled.value
+        payload = {
+            "booking_id": t.booking_id,
+            "user_id": row.user_id if row else None,
+            "host_id": t.host_id,
+            "from_status": t.from_status,
+            "to_status": t.to_status,
+            "checkin_datetime": t.checkin,
+            "checkout_datetime": t.checkout,
+            "payment_status": row.payment_status if row else None,
+        }
+        if cancelled:
+            payload["cancelled_by"] = row.cancelled_by if row else None
+        events.append(NewEvent(BOOKING_CANCELLED if cancelled else BOOKING_STATUS_CHANGED, "booking", t.booking_id, payload))
+    enqueue_events(db, events)
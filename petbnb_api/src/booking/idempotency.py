@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from core.database import utcnow
+from .models import Booking, BookingIdempotencyKey
+from .schemas import BookingCreateSchema
+
+# -------------------- Idempotent booking creation --------------------
+# A retried POST /booking/ is answered from booking_idempotency_keys (one
+# primary-key lookup) with the stored response. Duplicates that arrive while
+# the first request is still running are coalesced: inside one process they
+# wait for it on an Event; across workers the key row is the claim.
+
+# An in_progress claim older than this is assumed to belong to a dead worker
+IDEMPOTENCY_LEASE_SECONDS = int(os.environ.get("IDEMPOTENCY_LEASE_SECONDS", 60))
+# How long an in-process duplicate waits for the first request to finish
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", 30))
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+StoredResponse = Tuple[int, Dict[str, Any]]
+
+
+def request_fingerprint(payload: BookingCreateSchema) -> str:
+    return hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+
+
+def booking_created_body(booking_id: int, booking_uuid: str) -> Dict[str, Any]:
+    return {
+        "error": False,
+        "message": "Booking created successfully",
+        "booking_id": booking_id,
+        "booking_uuid": booking_uuid,
+    }
+
+
+def replay(stored: StoredResponse) -> JSONResponse:
+    status_code, body = stored
+    return JSONResponse(status_code=status_code, content=body, headers={"Idempotent-Replayed": "true"})
+
+
+class InFlightRequests:
+    """Process-local registry of keys being worked on; duplicates wait for the leader."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events: Dict[str, threading.Event] = {}
+
+    @contextmanager
+    def lead(self, key: str) -> Iterator[bool]:
+        # yields True for the first caller; later callers block until it is done, then get False
+        with self._lock:
+            event = self._events.get(key)
+            leader = event is None
+            if leader:
+                event = self._events[key] = threading.Event()
+        if not leader:
+            event.wait(IDEMPOTENCY_WAIT_SECONDS)
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            with self._lock:
+                self._events.pop(key, None)
+            event.set()
+
+
+inflight_bookings = InFlightRequests()
+
+
+# -------------------- Key store --------------------
+
+def _load(db: Session, key: str) -> Optional[BookingIdempotencyKey]:
+    # populate_existing: never answer from a stale identity-map copy
+    return (
+        db.query(BookingIdempotencyKey)
+        .populate_existing()
+        .filter(BookingIdempotencyKey.key == key)
+        .first()
+    )
+
+
+def _stored_response(record: BookingIdempotencyKey, fingerprint: str) -> Optional[StoredResponse]:
+    if record.request_fingerprint != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"error": True, "message": "Idempotency key was already used with a different request"},
+        )
+    if record.status == COMPLETED:
+        return record.response_status, json.loads(record.response_body)
+    return None
+
+
+def lookup_response(
+    db: Session, key: str, fingerprint: str, booking_uuid: str, booking_fp: str,
+) -> Optional[StoredResponse]:
+    """
+    Stored response for a key that has already completed, if any.
+    `booking_fp` is the payload's booking fingerprint (booking.duplicates),
+    checked when only the booking_uuid matches.
+    """
+    record = _load(db, key)
+    if record is not None:
+        return _stored_response(record, fingerprint)
+    # bookings written before keys were recorded (or under another key): only
+    # the same stay (user, host, dates, pets) is a retry; anything else would
+    # hand out someone else's booking
+    existing = (
+        db.query(Booking.id, Booking.fingerprint)
+        .filter(Booking.booking_uuid == booking_uuid)
+        .first()
+    )
+    if existing is None:
+        return None
+    if existing.fingerprint != booking_fp:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error": True, "message": "booking_uuid already used"},
+        )
+    return status.HTTP_200_OK, booking_created_body(existing.id, booking_uuid)
+
+
+def claim_key(db: Session, key: str, fingerprint: str) -> Optional[StoredResponse]:
+    """
+    Insert the in_progress claim for `key` (committed). Returns the stored
+    response instead if another worker completed it meanwhile; raises 409
+    while another worker is still holding a live claim.
+    """
+    db.add(BookingIdempotencyKey(key=key, request_fingerprint=fingerprint, status=IN_PROGRESS))
+    try:
+        db.commit()
+        return None
+    except IntegrityError:
+        db.rollback()
+
+    record = _load(db, key)
+    if record is None:  # the other claim was released; try once more
+        return claim_key(db, key, fingerprint)
+    stored = _stored_response(record, fingerprint)
+    if stored is not None:
+        return stored
+    # take over a claim whose worker died mid-request
+    stale = utcnow() - timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)
+    taken = db.execute(
+        update(BookingIdempotencyKey)
+        .where(
+            BookingIdempotencyKey.key == key,
+            BookingIdempotencyKey.status == IN_PROGRESS,
+            BookingIdempotencyKey.updated_at < stale,
+        )
+        .values(updated_at=utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if taken.rowcount == 1:
+        return None
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={"error": True, "message": "A request with this idempotency key is still being processed"},
+        headers={"Retry-After": "1"},
+    )
+
+
+def complete_key(db: Session, key: str, booking_id: int, status_code: int, body: Dict[str, Any]) -> None:
+    # Runs inside the booking transaction, so the booking and its stored response commit together
+    db.execute(
+        update(BookingIdempotencyKey)
+        .where(BookingIdempotencyKey.key == key)
+        .values(
+            status=COMPLETED,
+            booking_id=booking_id,
+            response_status=status_code,
+            response_body=json.dumps(body),
+            updated_at=utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def release_key(db: Session, key: str) -> None:
+    # The request failed: drop the claim so a retry runs it again
+    db.rollback()
+    db.execute(
+        delete(BookingIdempotencyKey).where(
+            BookingIdempotencyKey.key == key,
+            BookingIdempotencyKey.status == IN_PROGRESS,
+        )
+    )
+    db.commit()
+
+
+def purge_idempotency_keys(db: Session, older_than: timedelta) -> int:
+    result = db.execute(
+        delete(BookingIdempotencyKey).where(BookingIdempotencyKey.created_at < utcnow() - older_than)
+    )
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,191 @@
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from availability.controllers import ACTIVE_BOOKING_STATUSES, release_capacity_many
+from core.database import SessionLocal, utcnow
+from core.scheduler import register_job
+from .idempotency import purge_idempotency_keys
+from .models import (
+    Booking, BookingPetProfile, BookingStatusEnum, CancelledByEnum, PaymentStatusEnum,
+)
+
+# Booking datetimes are stored as the host's wall-clock time (SQLite keeps no
+# offset), so "now" for due checks is taken in the same zone.
+BOOKING_TIMEZONE = ZoneInfo(os.environ.get("BOOKING_TIMEZONE", "Asia/Kolkata"))
+LIFECYCLE_INTERVAL_SECONDS = float(os.environ.get("BOOKING_LIFECYCLE_INTERVAL_SECONDS", 60))
+LIFECYCLE_BATCH_SIZE = int(os.environ.get("BOOKING_LIFECYCLE_BATCH_SIZE", 500))
+IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.environ.get("IDEMPOTENCY_KEY_TTL_HOURS", 48)))
+
+
+def booking_now() -> datetime:
+    return datetime.now(BOOKING_TIMEZONE).replace(tzinfo=None)
+
+
+# -------------------- Transition hooks --------------------
+
+class BookingTransition(NamedTuple):
+    booking_id: int
+    host_id: int
+    from_status: str
+    to_status: str
+    checkin: datetime
+    checkout: datetime
+
+
+TransitionHook = Callable[[Session, List[BookingTransition]], None]
+_transition_hooks: List[TransitionHook] = []
+
+
+def on_booking_transition(hook: TransitionHook) -> TransitionHook:
+    """
+    Register a hook called with every batch of status changes, inside the
+    transaction that applies them (before commit). Raising rolls the batch
+    back, so hooks can keep derived tables exactly in step.
+    """
+    _transition_hooks.append(hook)
+    return hook
+
+
+def pets_per_booking(db: Session, booking_ids: List[int]) -> Dict[int, int]:
+    # Same count create_booking reserved capacity for (at least one)
+    counts = dict(
+        db.query(BookingPetProfile.booking_id, func.count(func.distinct(BookingPetProfile.pet_profile_id)))
+        .filter(BookingPetProfile.booking_id.in_(booking_ids))
+        .group_by(BookingPetProfile.booking_id)
+    )
+    return {booking_id: max(counts.get(booking_id, 0), 1) for booking_id in booking_ids}
+
+
+def finish_transitions(db: Session, transitions: List[BookingTransition]) -> None:
+    """
+    Side effects of status changes that were just applied: capacity goes
+    back to the host when a booking stops holding it (completed stays from
+    today on), then the registered hooks run. Caller commits.
+    """
+    if not transitions:
+        return
+    released = [
+        t for t in transitions
+        if t.from_status in ACTIVE_BOOKING_STATUSES and t.to_status not in ACTIVE_BOOKING_STATUSES
+    ]
+    if released:
+        pets = pets_per_booking(db, [t.booking_id for t in released])
+        today = booking_now().date()
+        for completed in (False, True):
+            stays = [
+                (t.host_id, t.checkin, t.checkout, pets[t.booking_id])
+                for t in released
+                if (t.to_status == BookingStatusEnum.completed.value) == completed
+            ]
+            release_capacity_many(db, stays, from_day=today if completed else None)
+    for hook in list(_transition_hooks):
+        hook(db, transitions)
+
+
+# -------------------- Time-driven transitions --------------------
+
+class TransitionRule(NamedTuple):
+    name: str
+    from_status: str
+    to_status: str
+    due: Callable[[datetime], list]   # now -> WHERE criteria (besides the status)
+    values: Callable[[], dict]        # extra columns to set
+
+
+TRANSITION_RULES = (
+    # unpaid requests the host never confirmed lapse at check-in
+    TransitionRule(
+        "expire_unpaid",
+        BookingStatusEnum.waiting.value,
+        BookingStatusEnum.cancelled.value,
+        lambda now: [
+            Booking.checkin_datetime <= now,
+            Booking.payment_status.in_([PaymentStatusEnum.unpaid.value, PaymentStatusEnum.pending.value]),
+        ],
+        lambda: {
+            "payment_status": PaymentStatusEnum.expired.value,
+            "is_canceled": True,
+            "cancelled_by": CancelledByEnum.system_auto.value,
+        },
+    ),
+    TransitionRule(
+        "start",
+        BookingStatusEnum.confirmed.value,
+        BookingStatusEnum.ongoing.value,
+        lambda now: [Booking.checkin_datetime <= now, Booking.checkout_datetime > now],
+        dict,
+    ),
+    TransitionRule(
+        "finish",
+        BookingStatusEnum.ongoing.value,
+        BookingStatusEnum.completed.value,
+        lambda now: [Booking.checkout_datetime <= now],
+        dict,
+    ),
+    # confirmed stays whose whole window passed between two ticks
+    TransitionRule(
+        "finish_confirmed",
+        BookingStatusEnum.confirmed.value,
+        BookingStatusEnum.completed.value,
+        lambda now: [Booking.checkout_datetime <= now],
+        dict,
+    ),
+)
+
+
+def apply_transition_batch(db: Session, rule: TransitionRule, now: datetime, batch_size: int) -> int:
+    """
+    Move up to batch_size due bookings with one set-based UPDATE (found via
+    ix_bookings_status_checkin / _checkout). The UPDATE re-checks the old
+    status, so rows another worker or request already moved are skipped.
+    """
+    due = (
+        select(Booking.id)
+        .where(Booking.booking_status == rule.from_status, *rule.due(now))
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        update(Booking)
+        .where(Booking.id.in_(due), Booking.booking_status == rule.from_status)
+        .values(booking_status=rule.to_status, updated_at=utcnow(), **rule.values())
+        .returning(Booking.id, Booking.booked_pet_host_id, Booking.checkin_datetime, Booking.checkout_datetime)
+        .execution_options(synchronize_session=False)
+    ).all()
+    finish_transitions(db, [
+        BookingTransition(r.id, r.booked_pet_host_id, rule.from_status, rule.to_status,
+                          r.checkin_datetime, r.checkout_datetime)
+        for r in rows
+    ])
+    db.commit()
+    return len(rows)
+
+
+def run_booking_lifecycle(batch_size: int = LIFECYCLE_BATCH_SIZE) -> Dict[str, int]:
+    # One scheduler tick: drain every rule in batches, one commit per batch
+    moved: Dict[str, int] = {}
+    now = booking_now()
+    with SessionLocal() as db:
+        for rule in TRANSITION_RULES:
+            total = 0
+            while True:
+                n = apply_transition_batch(db, rule, now, batch_size)
+                total += n
+                if n < batch_size:
+                    break
+            moved[rule.name] = total
+    return moved
+
+
+def purge_expired_idempotency_keys() -> int:
+    with SessionLocal() as db:
+        return purge_idempotency_keys(db, IDEMPOTENCY_KEY_TTL)
+
+
+register_job("booking_lifecycle", LIFECYCLE_INTERVAL_SECONDS, run_booking_lifecycle)
+register_job("idempotency_purge", 3600, purge_expired_idempotency_keys)
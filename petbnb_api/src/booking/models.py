@@ -3,9 +3,9 @@ from typing import List, Optional
 
 from pydantic import BaseModel
 import enum
-from core.database import Base
+from core.database import Base, utcnow
 from sqlalchemy import (
-    Column, String, Integer, Float, Boolean, DateTime, ForeignKey, func
+    Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Index, Text, func
 )
 from sqlalchemy.orm import relationship
 
@@ -49,6 +49,18 @@ class PaymentStatusEnum(str, enum.Enum):
 # =========================
 class Booking(Base):
     __tablename__ = "bookings"
+    __table_args__ = (
+        # overlap lookups: bookings of one host that intersect a date range
+        Index("ix_bookings_host_checkin_checkout", "booked_pet_host_id", "checkin_datetime", "checkout_datetime"),
+        # lifecycle scheduler: due transitions per status
+        Index("ix_bookings_status_checkin", "booking_status", "checkin_datetime"),
+        Index("ix_bookings_status_checkout", "booking_status", "checkout_datetime"),
+        # booking history pages: keyset on (checkin_datetime, id) per user / host
+        Index("ix_bookings_user_checkin_id", "user_id", "checkin_datetime", "id"),
+        Index("ix_bookings_host_checkin_id", "booked_pet_host_id", "checkin_datetime", "id"),
+        # duplicate detection: active bookings with the same fingerprint
+        Index("ix_bookings_fingerprint", "fingerprint"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     booking_uuid = Column(String, unique=True, nullable=False)
@@ -64,8 +76,12 @@ class Booking(Base):
     cancelled_by = Column(String, nullable=True)
     is_canceled = Column(Boolean, default=False)
 
+    # sha256 of (user, host, check-in day, check-out day, pet set); see booking.duplicates
+    fingerprint = Column(String, nullable=True)
+    duplicate_of = Column(Integer, ForeignKey("bookings.id"), nullable=True)  # set by the duplicate scan
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=utcnow)
 
     # Relationships
     booked_pet_host = relationship("PetHost", back_populates="bookings")
@@ -83,7 +99,7 @@ class BookingService(Base):
     amt_basis = Column(String, nullable=False)  # e.g. per night, per hour
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=utcnow)
 
     booking = relationship("Booking", back_populates="services")
 
@@ -96,12 +112,27 @@ class BookingPetProfile(Base):
     pet_profile_id = Column(Integer, ForeignKey("pet_profiles.id"), nullable=False)  # <— added
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=utcnow)
 
     booking = relationship("Booking", back_populates="pets")
     pet_profile = relationship("PetProfile")
 
 
+class BookingIdempotencyKey(Base):
+    # One row per POST /booking/ idempotency key (Idempotency-Key header or booking_uuid)
+    __tablename__ = "booking_idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    request_fingerprint = Column(String, nullable=False)  # sha256 of the request body
+    status = Column(String, nullable=False, default="in_progress")  # in_progress | completed
+    booking_id = Column(Integer, ForeignKey("bookings.id"), nullable=True)
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)  # JSON replayed to retries
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=utcnow)
+
+
 # =========================
 # PYDANTIC SCHEMAS
 # =========================
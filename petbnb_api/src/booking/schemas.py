@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel
 from typing import List, Optional
 import enum
@@ -55,6 +56,8 @@ class BookingCreateSchema(BaseModel):
     booked_pet_host_id: int
     booked_for_service: List[ServiceBookingSchema]
     booked_for_pet_profiles: List[int]
+    checkin_datetime: datetime
+    checkout_datetime: datetime
     booking_status: BookingStatusEnum = BookingStatusEnum.waiting
     payment_status: PaymentStatusEnum = PaymentStatusEnum.unpaid
     cancelled_by: Optional[CancelledByEnum] = None
@@ -62,3 +65,18 @@ class BookingCreateSchema(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+# ======================
+# STATUS UPDATE SCHEMA
+# ======================
+class BookingStatusUpdateSchema(BaseModel):
+    booking_status: BookingStatusEnum
+    cancelled_by: Optional[CancelledByEnum] = None
+
+
+# ======================
+# PAYMENT UPDATE SCHEMA
+# ======================
+class BookingPaymentUpdateSchema(BaseModel):
+    payment_status: PaymentStatusEnum
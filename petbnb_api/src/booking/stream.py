@@ -0,0 +1,218 @@
+import asyncio
+import json
+import os
+import threading
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from fastapi import Request
+from sqlalchemy import func
+
+from core.database import SessionLocal
+from core.outbox import Event, OutboxEvent, wake_on_enqueue
+from core.scheduler import register_job
+from .events import BOOKING_EVENT_TYPES
+
+# -------------------- Live booking events (SSE) --------------------
+# Every worker tails the outbox table by id (booking_event_tail, not
+# leased, so it runs in each worker) and fans committed booking events out
+# to its open streams of the booking's owner and host. Live events
+# therefore never wait for the dispatcher, which runs in one worker only,
+# or for a slow or failing webhook. Event ids are outbox ids, so a
+# reconnecting client sends Last-Event-ID and gets what it missed replayed
+# from the outbox table before it goes live again.
+
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", 15))
+SSE_QUEUE_SIZE = int(os.environ.get("SSE_QUEUE_SIZE", 256))
+SSE_REPLAY_LIMIT = int(os.environ.get("SSE_REPLAY_LIMIT", 1000))
+SSE_TAIL_POLL_SECONDS = float(os.environ.get("SSE_TAIL_POLL_SECONDS", 1))
+SSE_TAIL_BATCH_SIZE = int(os.environ.get("SSE_TAIL_BATCH_SIZE", 500))
+SSE_RETRY_MS = 3000
+
+Topic = Tuple[str, str]  # ("user", user_id) | ("host", host_id)
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, event: Event) -> None:
+        # runs on the subscriber's loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # a stalled client is cut off once it has drained its queue and
+            # resumes from Last-Event-ID, which replays what was dropped
+            self.overflowed = True
+
+
+class BookingEventBroker:
+    """
+    In-process pub/sub keyed by topic. publish() is called from the outbox
+    tail thread and hands events to each subscriber's event loop, so a slow
+    stream never holds up delivery to the others.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[Topic, Set[_Subscriber]] = {}
+
+    def subscribe(self, topic: Topic) -> _Subscriber:
+        subscriber = _Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, topic: Topic, subscriber: _Subscriber) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def publish(self, topics: List[Topic], event: Event) -> None:
+        with self._lock:
+            targets = {s for topic in topics for s in self._subscribers.get(topic, ())}
+        for subscriber in targets:
+            if not subscriber.loop.is_closed():
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"topics": len(self._subscribers), "streams": sum(len(s) for s in self._subscribers.values())}
+
+
+booking_events = BookingEventBroker()
+
+
+def topics_for(event: Event) -> List[Topic]:
+    topics = []
+    if event.payload.get("user_id") is not None:
+        topics.append(("user", str(event.payload["user_id"])))
+    if event.payload.get("host_id") is not None:
+        topics.append(("host", str(event.payload["host_id"])))
+    return topics
+
+
+def _as_event(row: OutboxEvent) -> Event:
+    return Event(row.id, row.event_type, row.aggregate_type, row.aggregate_id, json.loads(row.payload), row.created_at)
+
+
+# -------------------- Outbox tail --------------------
+# Outbox rows are read by id whatever their delivery status: an event is
+# live as soon as its transaction commits. SQLite serializes writers, so
+# ids become visible in commit order and the cursor never passes a row
+# that commits later.
+
+_tail_cursor: Optional[int] = None
+
+
+def tail_booking_events(batch_size: int = SSE_TAIL_BATCH_SIZE) -> int:
+    # One tick in this worker: publish booking events committed since the last tick
+    global _tail_cursor
+    with SessionLocal() as db:
+        if _tail_cursor is None or not booking_events.stats()["streams"]:
+            # nobody listening here: just move the cursor to the head
+            _tail_cursor = db.query(func.coalesce(func.max(OutboxEvent.id), 0)).scalar()
+            return 0
+        published = 0
+        while True:
+            rows = (
+                db.query(OutboxEvent)
+                .filter(OutboxEvent.id > _tail_cursor)
+                .order_by(OutboxEvent.id)
+                .limit(batch_size)
+                .all()
+            )
+            for row in rows:
+                if row.event_type in BOOKING_EVENT_TYPES:
+                    event = _as_event(row)
+                    booking_events.publish(topics_for(event), event)
+                    published += 1
+            if rows:
+                _tail_cursor = rows[-1].id
+            if len(rows) < batch_size:
+                return published
+
+
+register_job("booking_event_tail", SSE_TAIL_POLL_SECONDS, tail_booking_events, leased=False)
+wake_on_enqueue("booking_event_tail")
+
+
+# -------------------- Stream --------------------
+
+def replay_events(topic: Topic, after_id: int, limit: int = SSE_REPLAY_LIMIT) -> List[Event]:
+    """
+    Booking events for `topic` with id > after_id, oldest first, whether or
+    not the dispatcher has delivered them yet. A primary-key range scan
+    from the client's last id; only events newer than its disconnect are
+    read.
+    """
+    kind, key = topic
+    field = func.json_extract(OutboxEvent.payload, f"$.{kind}_id")
+    with SessionLocal() as db:
+        rows = (
+            db.query(OutboxEvent)
+            .filter(
+                OutboxEvent.id > after_id,
+                OutboxEvent.event_type.in_(BOOKING_EVENT_TYPES),
+                field == (int(key) if kind == "host" else key),
+            )
+            .order_by(OutboxEvent.id)
+            .limit(limit)
+            .all()
+        )
+        return [_as_event(r) for r in rows]
+
+
+def format_sse(event: Event) -> str:
+    data = json.dumps({"id": event.id, "type": event.event_type, **event.payload}, separators=(",", ":"), default=str)
+    return f"id: {event.id}\nevent: {event.event_type}\ndata: {data}\n\n"
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+async def booking_event_stream(request: Request, topic: Topic, last_event_id: Optional[int]) -> AsyncIterator[str]:
+    """
+    SSE body for one topic: a retry hint, the replay after last_event_id,
+    then live events with a comment heartbeat whenever the stream is idle.
+    Subscribing before the replay query means nothing falls in between.
+    Live events at or below the highest id already sent (or the client's
+    resume id) are dropped: they were replayed, or this worker's tail is
+    behind the one that served the previous connection.
+    """
+    subscriber = booking_events.subscribe(topic)
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        sent_up_to = last_event_id or 0
+        while last_event_id is not None:
+            replayed = await asyncio.to_thread(replay_events, topic, last_event_id)
+            for event in replayed:
+                sent_up_to = max(sent_up_to, event.id)
+                yield format_sse(event)
+            last_event_id = replayed[-1].id if len(replayed) == SSE_REPLAY_LIMIT else None
+        while True:
+            if subscriber.overflowed and subscriber.queue.empty():
+                return
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": heartbeat\n\n"
+                continue
+            if event.id <= sent_up_to:
+                continue
+            sent_up_to = event.id
+            yield format_sse(event)
+    finally:
+        booking_events.unsubscribe(topic, subscriber)
@@ -1,68 +1,253 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import tempfile
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, selectinload
 from core.database import get_db
-from core.init import Booking, BookingService, BookingPetProfile
-from .schemas import BookingCreateSchema
-from core.init import PetHost, PetProfile  # Assuming these exist
-import uuid
+from core.http import conditional_get, resource_version
+from core.init import Booking, BookingService, BookingPetProfile, PetHost
+from .schemas import BookingCreateSchema, BookingPaymentUpdateSchema, BookingStatusEnum, BookingStatusUpdateSchema
+from .bulk import export_csv, export_ndjson, import_bookings
+from .duplicates import active_with_fingerprint, booking_fingerprint, run_duplicate_scan
+from .controllers import booking_history_page, change_booking_status, change_payment_status, insert_booking
+from .stream import booking_event_stream, parse_last_event_id
+from .idempotency import (
+    booking_created_body, claim_key, inflight_bookings, lookup_response,
+    release_key, replay, request_fingerprint,
+)
 
 router = APIRouter(prefix="/booking", tags=["Booking"])
 
+# request bodies above this size are spooled to disk while an import runs
+IMPORT_SPOOL_BYTES = 4 * 1024 * 1024
+
 
 @router.post("/", response_model=dict)
-def create_booking(payload: BookingCreateSchema, db: Session = Depends(get_db)):
-    # ✅ Check if Pet Host exists
-    host = db.query(PetHost).filter(PetHost.id == payload.booked_pet_host_id).first()
-    if not host:
-        raise HTTPException(status_code=404, detail="Pet Host not found")
+def create_booking(
+    payload: BookingCreateSchema,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=255, description="Defaults to booking_uuid"),
+):
+    key = idempotency_key or payload.booking_uuid
+    fingerprint = request_fingerprint(payload)
+    booking_fp = booking_fingerprint(
+        payload.user_id, payload.booked_pet_host_id,
+        payload.checkin_datetime, payload.checkout_datetime, payload.booked_for_pet_profiles,
+    )
 
-    # ✅ Validate Pet Profiles
-    for pet_id in payload.booked_for_pet_profiles:
-        pet = (db.query(PetProfile)
-               .filter(PetProfile.id == pet_id)
-               .filter(PetProfile.user_id == payload.user_id)
-               .first())
-        if not pet:
-            raise HTTPException(status_code=404, detail=f"Pet Profile {pet_id} not found")
-
-    # ✅ Create main Booking record
-    new_booking = Booking(
-        booking_uuid=payload.booking_uuid or str(uuid.uuid4()),
-        user_id=payload.user_id,
-        booked_pet_host_id=payload.booked_pet_host_id,
-        booking_status=payload.booking_status.value,
-        payment_status=payload.payment_status.value,
-        cancelled_by=payload.cancelled_by.value if payload.cancelled_by else None,
-        is_canceled=payload.is_canceled,
+    # ✅ Retries are answered from the stored response before any other work
+    stored = lookup_response(db, key, fingerprint, payload.booking_uuid, booking_fp)
+    if stored:
+        return replay(stored)
+
+    with inflight_bookings.lead(key) as leader:
+        if not leader:
+            # a duplicate arrived while the first request was running in this process
+            stored = lookup_response(db, key, fingerprint, payload.booking_uuid, booking_fp)
+            if stored:
+                return replay(stored)
+        stored = claim_key(db, key, fingerprint)
+        if stored:
+            return replay(stored)
+        try:
+            # Host, pet ownership and capacity checks plus all inserts, in one transaction
+            new_booking = insert_booking(db, payload, idempotency_key=key)
+        except Exception:
+            release_key(db, key)
+            raise
+
+    return booking_created_body(new_booking.id, new_booking.booking_uuid)
+
+
+@router.get("/by-user/{user_id}", summary="A user's bookings (My trips), keyset-paginated")
+def bookings_by_user(
+    user_id: str,
+    booking_status: Optional[List[BookingStatusEnum]] = Query(None, description="Repeat to match any of several"),
+    order: Literal["newest", "oldest"] = Query("newest", description="By check-in"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db),
+):
+    bookings, next_cursor = booking_history_page(
+        db.query(Booking).filter(Booking.user_id == user_id),
+        statuses=[s.value for s in booking_status or []],
+        limit=limit,
+        cursor=cursor,
+        newest_first=order == "newest",
     )
+    return {"data": bookings, "next_cursor": next_cursor, "limit": limit}
 
-    db.add(new_booking)
-    db.commit()
-    db.refresh(new_booking)
-
-    # ✅ Create Booking Services
-    for service in payload.booked_for_service:
-        db_service = BookingService(
-            booking_id=new_booking.id,
-            service_name=service.service_name,
-            service_amt=service.service_amt,
-            amt_basis=service.amt_basis,
-        )
-        db.add(db_service)
 
-    # ✅ Create Booking Pet Profiles
-    for pet_id in payload.booked_for_pet_profiles:
-        db_pet = BookingPetProfile(
-            booking_id=new_booking.id,
-            pet_profile_id=pet_id
+@router.get("/by-host/{host_id}", summary="A host's bookings (Host inbox), keyset-paginated")
+def bookings_by_host(
+    host_id: int,
+    booking_status: Optional[List[BookingStatusEnum]] = Query(None, description="Repeat to match any of several"),
+    order: Literal["newest", "oldest"] = Query("newest", description="By check-in"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db),
+):
+    if not db.query(PetHost.id).filter(PetHost.id == host_id).first():
+        raise HTTPException(status_code=404, detail="Pet Host not found")
+    bookings, next_cursor = booking_history_page(
+        db.query(Booking).filter(Booking.booked_pet_host_id == host_id),
+        statuses=[s.value for s in booking_status or []],
+        limit=limit,
+        cursor=cursor,
+        newest_first=order == "newest",
+    )
+    return {"data": bookings, "next_cursor": next_cursor, "limit": limit}
+
+
+@router.post("/import", summary="Bulk-import bookings from an NDJSON or CSV body")
+async def import_booking_file(
+    request: Request,
+    format: Optional[Literal["ndjson", "csv"]] = Query(None, description="Defaults from Content-Type (text/csv -> csv)"),
+):
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    # Spool the body (memory, then disk) and import it off the event loop,
+    # one committed chunk at a time; the report lists failed lines
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        return await run_in_threadpool(import_bookings, spool, fmt)
+
+
+@router.get("/export", summary="Stream bookings with their services and pets as NDJSON or CSV")
+def export_booking_file(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    user_id: Optional[str] = Query(None),
+    host_id: Optional[int] = Query(None),
+    booking_status: Optional[List[BookingStatusEnum]] = Query(None, description="Repeat to match any of several"),
+):
+    filters = {
+        "user_id": user_id,
+        "host_id": host_id,
+        "statuses": [s.value for s in booking_status or []],
+    }
+    if format == "csv":
+        return StreamingResponse(
+            export_csv(**filters),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="bookings.csv"'},
         )
-        db.add(db_pet)
+    return StreamingResponse(export_ndjson(**filters), media_type="application/x-ndjson")
+
+
+def _event_stream_response(request: Request, topic, last_event_id: Optional[str]) -> StreamingResponse:
+    # EventSource resends Last-Event-ID itself; the query parameter covers the first connect
+    resume_from = parse_last_event_id(request.headers.get("last-event-id") or last_event_id)
+    return StreamingResponse(
+        booking_event_stream(request, topic, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/events/user/{user_id}", summary="Live booking events for an owner (Server-Sent Events)")
+async def user_booking_events(
+    user_id: str,
+    request: Request,
+    last_event_id: Optional[str] = Query(None, description="Resume after this event id"),
+):
+    return _event_stream_response(request, ("user", user_id), last_event_id)
 
-    db.commit()
 
+@router.get("/events/host/{host_id}", summary="Live booking events for a host (Server-Sent Events)")
+async def host_booking_events(
+    host_id: int,
+    request: Request,
+    last_event_id: Optional[str] = Query(None, description="Resume after this event id"),
+):
+    return _event_stream_response(request, ("host", str(host_id)), last_event_id)
+
+
+@router.post("/duplicates/scan", summary="Fingerprint older bookings and flag (or cancel) duplicates")
+def scan_duplicate_bookings(action: Literal["flag", "cancel"] = Query("flag")):
+    counts = run_duplicate_scan(action=action)
+    return {"error": False, "message": "Duplicate scan finished", **counts}
+
+
+@router.get("/{booking_id}")
+def get_booking(booking_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    version = resource_version(
+        db, "booking",
+        (Booking, Booking.id == booking_id),
+        (BookingService, BookingService.booking_id == booking_id),
+        (BookingPetProfile, BookingPetProfile.booking_id == booking_id),
+    )
+    conditional_get(request, response, version)
+    booking = (
+        db.query(Booking)
+        .options(selectinload(Booking.services), selectinload(Booking.pets))
+        .filter(Booking.id == booking_id)
+        .first()
+    )
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    return booking
+
+
+@router.patch("/{booking_id}/status")
+def update_booking_status(booking_id: int, payload: BookingStatusUpdateSchema, db: Session = Depends(get_db)):
+    booking = db.query(Booking).filter(Booking.id == booking_id).first()
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    booking = change_booking_status(
+        db, booking,
+        payload.booking_status.value,
+        cancelled_by=payload.cancelled_by.value if payload.cancelled_by else None,
+    )
     return {
         "error": False,
-        "message": "Booking created successfully",
-        "booking_id": new_booking.id,
-        "booking_uuid": new_booking.booking_uuid
+        "message": "Booking status updated",
+        "booking_id": booking.id,
+        "booking_status": booking.booking_status,
+    }
+
+
+@router.patch("/{booking_id}/payment")
+def update_booking_payment(booking_id: int, payload: BookingPaymentUpdateSchema, db: Session = Depends(get_db)):
+    booking = db.query(Booking).filter(Booking.id == booking_id).first()
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    booking = change_payment_status(db, booking, payload.payment_status.value)
+    return {
+        "error": False,
+        "message": "Payment status updated",
+        "booking_id": booking.id,
+        "payment_status": booking.payment_status,
+    }
+
+
+@router.get("/{booking_id}/duplicates", summary="Active bookings with the same user, host, dates and pets")
+def get_booking_duplicates(booking_id: int, db: Session = Depends(get_db)):
+    booking = db.query(Booking.id, Booking.fingerprint, Booking.duplicate_of).filter(Booking.id == booking_id).first()
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    duplicates = []
+    if booking.fingerprint is not None:
+        duplicates = (
+            db.query(Booking)
+            .filter(*active_with_fingerprint([booking.fingerprint]), Booking.id != booking_id)
+            .order_by(Booking.id)
+            .all()
+        )
+    return {
+        "booking_id": booking.id,
+        "fingerprint": booking.fingerprint,
+        "duplicate_of": booking.duplicate_of,
+        "duplicates": [
+            {
+                "id": d.id,
+                "booking_uuid": d.booking_uuid,
+                "booking_status": d.booking_status,
+                "payment_status": d.payment_status,
+                "duplicate_of": d.duplicate_of,
+                "created_at": d.created_at,
+            }
+            for d in duplicates
+        ],
     }
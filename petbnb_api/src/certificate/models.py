@@ -1,13 +1,16 @@
 # database.py
 from sqlalchemy import (
     Column, Integer, String,
-    DateTime, func, ForeignKey
+    DateTime, func, ForeignKey, Index
 )
 from sqlalchemy.orm import relationship
-from core.database import Base
+from core.database import Base, utcnow
 
 class Certification(Base):
     __tablename__ = "certifications"
+    __table_args__ = (
+        Index("ix_certifications_host_id", "pet_host_id", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     pet_host_id = Column(Integer, ForeignKey("pet_hosts.id"), nullable=False)
@@ -15,7 +18,7 @@ class Certification(Base):
     certificate_url = Column(String)
     certificate_description = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=utcnow)
 
     pet_host = relationship("PetHost", back_populates="certifications")
 
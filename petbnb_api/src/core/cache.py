@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+
+class ByteLRUCache:
+    """
+    Thread-safe LRU cache of serialized payloads (bytes), bounded by entry
+    count, total size in bytes and a per-entry TTL.
+
+    Every key carries a generation number that invalidate() bumps. A loader
+    that started before an invalidation cannot store its (possibly stale)
+    result afterwards.
+
+    An entry may also carry a tag, e.g. the ETag computed from the database
+    for the response it holds. A read that passes a tag only hits an entry
+    stored with the same tag. Invalidation is process-local, so when several
+    workers write, the tag is what keeps one worker from serving a body that
+    another worker has since changed.
+    """
+
+    def __init__(self, name: str, max_bytes: int, max_entries: int, ttl_seconds: float):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple[bytes, float, Optional[str]]]" = OrderedDict()
+        self._generations: Dict[Hashable, int] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    # ---------- reads ----------
+    def get(self, key: Hashable, tag: Optional[str] = None) -> Optional[bytes]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, expires_at, stored_tag = entry
+                if expires_at <= now:
+                    self._drop(key)
+                    self.expirations += 1
+                elif tag is None or stored_tag == tag:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                # else: written for another version; the caller reloads and replaces it
+            self.misses += 1
+            return None
+
+    def get_or_load(
+        self, key: Hashable, loader: Callable[[], Optional[bytes]], tag: Optional[str] = None,
+    ) -> Optional[bytes]:
+        # Read-through: on a miss call loader() (outside the lock) and cache its result
+        payload = self.get(key, tag)
+        if payload is not None:
+            return payload
+        generation = self.generation(key)
+        payload = loader()
+        if payload is not None:
+            self.set(key, payload, generation=generation, tag=tag)
+        return payload
+
+    # ---------- writes ----------
+    def generation(self, key: Hashable) -> int:
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def set(
+        self, key: Hashable, payload: bytes, generation: Optional[int] = None, tag: Optional[str] = None,
+    ) -> bool:
+        size = len(payload)
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if generation is not None and self._generations.get(key, 0) != generation:
+                return False  # invalidated while the payload was being built
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (payload, time.monotonic() + self.ttl_seconds, tag)
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, keys: Iterable[Hashable]) -> None:
+        with self._lock:
+            for key in keys:
+                self._generations[key] = self._generations.get(key, 0) + 1
+                if key in self._entries:
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._generations[key] = self._generations.get(key, 0) + 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, key: Hashable) -> None:
+        payload, _, _ = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    # ---------- introspection ----------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+# -------------------- Registry --------------------
+
+_caches: Dict[str, ByteLRUCache] = {}
+
+
+def register_cache(cache: ByteLRUCache) -> ByteLRUCache:
+    _caches[cache.name] = cache
+    return cache
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -1,4 +1,7 @@
-from sqlalchemy import create_engine
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.schema import CreateColumn, CreateIndex
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 DATABASE_URL = "sqlite:///sqlite.db"
@@ -7,9 +10,36 @@ engine = create_engine(DATABASE_URL, future=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+def utcnow() -> datetime:
+    # Python-side timestamp for updated_at: func.now() on SQLite only has
+    # whole-second precision, too coarse to version rows edited in a burst.
+    return datetime.now(timezone.utc)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def sync_schema():
+    # create_all() skips tables that already exist, so columns and indexes
+    # added to a model later never reach an existing sqlite.db. Add the
+    # missing ones (additive changes only; anything else needs Alembic).
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        existing = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            present = {c["name"] for c in existing.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in present:
+                    ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                    conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN {ddl}')
+    # IF NOT EXISTS rather than checkfirst: reflection doesn't report
+    # expression indexes such as lower(service_name)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
@@ -0,0 +1,265 @@
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import or_
+
+from core.database import SessionLocal, utcnow
+from core.scheduler import register_job
+from core.uploads import upload_io
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Image derivatives --------------------
+# Uploaded photos are kept as sent, but clients are served resized
+# variants: thumb for lists, card for tiles, full for the detail view.
+# Resizing is CPU-bound, so it runs in a process pool after the upload
+# response has gone out. The variant URLs land on the row
+# (thumb_url / card_url / full_url) when they are ready. The
+# image_derivatives job picks up rows that never got variants, e.g. photos
+# uploaded before this existed or work lost in a restart.
+
+IMAGE_VARIANTS: Dict[str, int] = {"thumb": 320, "card": 960, "full": 2048}  # longest edge, px
+IMAGE_VARIANT_FORMAT = os.environ.get("IMAGE_VARIANT_FORMAT", "webp").lower()  # webp | jpeg
+IMAGE_VARIANT_QUALITY = int(os.environ.get("IMAGE_VARIANT_QUALITY", 80))
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+IMAGE_DERIVATIVE_BATCH_SIZE = int(os.environ.get("IMAGE_DERIVATIVE_BATCH_SIZE", 100))
+# a pending row older than this is assumed lost and rendered again
+IMAGE_DERIVATIVE_RETRY_AFTER = timedelta(minutes=int(os.environ.get("IMAGE_DERIVATIVE_RETRY_MINUTES", 10)))
+DERIVED_DIR = "derived"
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"  # not a decodable image; the original is served
+
+VARIANT_SIZES = ("thumb", "card", "full", "original")
+
+
+# -------------------- Rendering (worker processes) --------------------
+
+_heif_registered = False
+
+
+def register_heif_opener() -> None:
+    # Teach Pillow HEIC/HEIF (iPhone photos); once per worker process
+    global _heif_registered
+    if not _heif_registered:
+        from pillow_heif import register_heif_opener as register
+
+        register()
+        _heif_registered = True
+
+
+def render_variants(source: str, dest_dir: str, stem: str, fmt: str, quality: int) -> Dict[str, str]:
+    """
+    Runs in a worker process: decode `source` once, then write each
+    variant as <stem>.<variant>.<ext> in dest_dir, never upscaling. Returns
+    variant -> file name.
+    """
+    from PIL import Image, ImageOps
+
+    register_heif_opener()
+    ext = "jpg" if fmt == "jpeg" else fmt
+    os.makedirs(dest_dir, exist_ok=True)
+    written: Dict[str, str] = {}
+    with Image.open(source) as opened:
+        image = ImageOps.exif_transpose(opened)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha and fmt == "webp" else "RGB")
+        # largest first, each step resized from the previous one
+        for name, edge in sorted(IMAGE_VARIANTS.items(), key=lambda item: -item[1]):
+            image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            file_name = f"{stem}.{name}.{ext}"
+            partial = os.path.join(dest_dir, f".{file_name}.{uuid.uuid4().hex}.part")
+            image.save(partial, format=fmt.upper(), quality=quality, method=4) if fmt == "webp" else \
+                image.save(partial, format="JPEG", quality=quality, optimize=True, progressive=True)
+            os.replace(partial, os.path.join(dest_dir, file_name))
+            written[name] = file_name
+    return written
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def derivative_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver: workers don't inherit the app's threads, sockets or DB connections
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+        return _pool
+
+
+def discard_broken_pool(pool: ProcessPoolExecutor) -> None:
+    # A worker that died (OOM on a huge decode, a codec crash) breaks the
+    # executor for good; drop it so the next call starts a fresh one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def submit_image_work(func: Callable, *args) -> Future:
+    """derivative_pool().submit, replacing the pool once if it is broken."""
+    pool = derivative_pool()
+    try:
+        return pool.submit(func, *args)
+    except BrokenProcessPool:
+        discard_broken_pool(pool)
+        return derivative_pool().submit(func, *args)
+
+
+def shutdown_derivative_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        # waits for the renders already running; without the wait the
+        # process exits before the workers are told to stop and they linger
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# -------------------- Sources --------------------
+
+class VariantSource(NamedTuple):
+    model: type
+    url_column: str                          # attribute holding the original's URL
+    to_path: Callable[[str], Optional[Path]]  # original URL -> file on disk
+
+
+_sources: Dict[str, VariantSource] = {}
+_in_flight: Set[Tuple[str, int]] = set()
+_in_flight_lock = threading.Lock()
+
+
+def register_variant_source(model: type, url_column: str, to_path: Callable[[str], Optional[Path]]) -> None:
+    _sources[model.__name__] = VariantSource(model, url_column, to_path)
+
+
+def variant_url(original_url: str, file_name: str) -> str:
+    # variants live in derived/ next to the original, so their URLs follow from its URL
+    return f"{original_url.rsplit('/', 1)[0]}/{DERIVED_DIR}/{file_name}"
+
+
+def variant_paths(original: Path) -> List[Path]:
+    ext = "jpg" if IMAGE_VARIANT_FORMAT == "jpeg" else IMAGE_VARIANT_FORMAT
+    return [original.parent / DERIVED_DIR / f"{original.stem}.{name}.{ext}" for name in IMAGE_VARIANTS]
+
+
+def pick_variant(row, size: str = "thumb") -> Optional[str]:
+    # URL to serve for `size`, falling back to the original until variants exist
+    original = getattr(row, _sources[row.__class__.__name__].url_column)
+    if size == "original":
+        return original
+    return getattr(row, f"{size}_url", None) or original
+
+
+# -------------------- Scheduling --------------------
+
+def request_variants(model: type, row_id: int, original_url: str, original: Path) -> bool:
+    """
+    Queue variant rendering for one row; returns immediately. The result is
+    recorded on the row from the upload I/O pool when the worker finishes.
+    """
+    key = (model.__name__, row_id)
+    with _in_flight_lock:
+        if key in _in_flight:
+            return False
+        _in_flight.add(key)
+    try:
+        future = submit_image_work(
+            render_variants, str(original), str(original.parent / DERIVED_DIR), original.stem,
+            IMAGE_VARIANT_FORMAT, IMAGE_VARIANT_QUALITY,
+        )
+    except Exception:
+        with _in_flight_lock:
+            _in_flight.discard(key)
+        logger.exception("could not queue image variants for %s #%s", *key)
+        return False
+    def on_done(f: Future) -> None:
+        try:
+            upload_io.submit(_record_variants, model, row_id, original_url, original, f)
+        except RuntimeError:
+            # interpreter shutting down; the row stays pending for the job
+            with _in_flight_lock:
+                _in_flight.discard(key)
+
+    future.add_done_callback(on_done)
+    return True
+
+
+def _record_variants(model: type, row_id: int, original_url: str, original: Path, future: Future) -> None:
+    key = (model.__name__, row_id)
+    try:
+        try:
+            written = future.result()
+        except (OSError, ValueError, SyntaxError) as exc:
+            # PIL's decode errors (UnidentifiedImageError, truncated files, ...)
+            logger.warning("no variants for %s #%s: %s", *key, exc)
+            written, status = {}, FAILED
+        except Exception:
+            # a worker died (the next submit replaces the broken pool) or
+            # cancelled on shutdown: stays pending for the job
+            logger.exception("image variants for %s #%s failed", *key)
+            return
+        else:
+            status = READY
+        with SessionLocal() as db:
+            row = db.get(model, row_id)
+            if row is None or getattr(row, _sources[model.__name__].url_column) != original_url:
+                # deleted or replaced while rendering
+                for name in written.values():
+                    (original.parent / DERIVED_DIR / name).unlink(missing_ok=True)
+                return
+            for name in IMAGE_VARIANTS:
+                setattr(row, f"{name}_url", variant_url(original_url, written[name]) if name in written else None)
+            row.variants_status = status
+            db.commit()  # ORM flush, so core.signals sees the host / pet change
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(key)
+
+
+def render_missing_variants(batch_size: int = IMAGE_DERIVATIVE_BATCH_SIZE) -> int:
+    # One scheduler tick: queue rows that never got variants (or lost them in a restart)
+    queued = 0
+    stale = utcnow() - IMAGE_DERIVATIVE_RETRY_AFTER
+    with SessionLocal() as db:
+        for source in list(_sources.values()):
+            model = source.model
+            rows = (
+                db.query(model.id, getattr(model, source.url_column))
+                .filter(or_(
+                    model.variants_status.is_(None),
+                    (model.variants_status == PENDING) & (model.updated_at < stale),
+                ))
+                .order_by(model.id)
+                .limit(batch_size)
+                .all()
+            )
+            for row_id, url in rows:
+                path = source.to_path(url) if url else None
+                if path is None or not path.exists():
+                    db.query(model).filter(model.id == row_id).update(
+                        {"variants_status": FAILED, "updated_at": utcnow()}, synchronize_session=False,
+                    )
+                    continue
+                if request_variants(model, row_id, url, path):
+                    db.query(model).filter(model.id == row_id).update(
+                        {"variants_status": PENDING, "updated_at": utcnow()}, synchronize_session=False,
+                    )
+                    queued += 1
+            db.commit()
+    return queued
+
+
+register_job("image_derivatives", 300, render_missing_variants)
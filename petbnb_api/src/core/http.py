@@ -0,0 +1,106 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Iterable, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.orm import Session
+
+# -------------------- Conditional GET --------------------
+# Validators are derived from the rows behind a response: row count, max(id)
+# and max(updated_at) per table. count and max(id) catch deletes and inserts,
+# updated_at catches edits. Computing them is one small aggregate query, so
+# a matching If-None-Match is answered with 304 before the object graph is
+# loaded or serialized.
+
+VersionSource = Tuple[Any, Any]  # (mapped class, WHERE criterion)
+
+
+class ResourceVersion(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime]
+    exists: bool  # the first source matched at least one row
+
+
+def _as_utc(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, str):  # aggregates over SQLite DATETIME come back as text
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def resource_version(db: Session, key: str, *sources: VersionSource, vary: Iterable = ()) -> ResourceVersion:
+    """
+    Version of the response built from `sources`. `key` names the
+    representation and `vary` holds anything else that shapes the body
+    (paging, view, ...), so different representations never share an ETag.
+    """
+    parts = [
+        select(
+            literal(i).label("source"),
+            func.count().label("rows"),
+            func.max(model.id).label("max_id"),
+            func.max(model.updated_at).label("max_updated_at"),
+        ).select_from(model).where(criterion)
+        for i, (model, criterion) in enumerate(sources)
+    ]
+    rows = sorted(db.execute(union_all(*parts) if len(parts) > 1 else parts[0]).all())
+
+    stamps = [_as_utc(r.max_updated_at) for r in rows]
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(repr((key, tuple(vary))).encode())
+    for r, stamp in zip(rows, stamps):
+        digest.update(repr((r.rows, r.max_id, stamp.isoformat() if stamp else None)).encode())
+
+    known = [s for s in stamps if s is not None]
+    return ResourceVersion(
+        etag=f'W/"{digest.hexdigest()}"',
+        last_modified=max(known) if known else None,
+        exists=bool(rows and rows[0].rows),
+    )
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, version: ResourceVersion) -> bool:
+    # RFC 9110: If-None-Match (weak comparison) wins over If-Modified-Since
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return version.exists
+        wanted = _opaque(version.etag)
+        return any(_opaque(tag) == wanted for tag in if_none_match.split(","))
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and version.last_modified is not None:
+        try:
+            since = _as_utc(parsedate_to_datetime(if_modified_since))
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have whole-second precision
+        return version.last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def validator_headers(version: ResourceVersion) -> dict:
+    headers = {"ETag": version.etag, "Cache-Control": "no-cache"}
+    if version.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(version.last_modified, usegmt=True)
+    return headers
+
+
+def raise_if_not_modified(request: Request, version: ResourceVersion) -> None:
+    if is_not_modified(request, version):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(version))
+
+
+def conditional_get(request: Request, response: Response, version: ResourceVersion) -> None:
+    """Raise 304 if the client's copy is current, else stamp validators on `response`."""
+    raise_if_not_modified(request, version)
+    response.headers.update(validator_headers(version))
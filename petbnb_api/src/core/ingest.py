@@ -0,0 +1,167 @@
+import asyncio
+import io
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import List, NamedTuple, Sequence
+
+from concurrent.futures.process import BrokenProcessPool
+
+from core.derivatives import discard_broken_pool, derivative_pool, register_heif_opener
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Image ingest --------------------
+# Phones send whatever they have: multi-megabyte HEIC, rotated JPEGs with
+# GPS in the EXIF, 40 MP PNG screenshots. Before a photo is stored it is
+# decoded, turned upright, stripped of metadata, capped to
+# IMAGE_MAX_EDGE and re-encoded to fit IMAGE_MAX_BYTES. The work is
+# CPU-bound, so it runs in the derivative process pool; the upload
+# endpoint awaits it without blocking the event loop. HEIC/HEIF is decoded
+# through pillow-heif.
+
+IMAGE_MAX_EDGE = int(os.environ.get("IMAGE_MAX_EDGE", 4096))  # px, longest edge
+IMAGE_MAX_BYTES = int(os.environ.get("IMAGE_MAX_BYTES", 2 * 1024 * 1024))
+IMAGE_INGEST_FORMAT = os.environ.get("IMAGE_INGEST_FORMAT", "jpeg").lower()  # jpeg | webp
+IMAGE_INGEST_QUALITY = int(os.environ.get("IMAGE_INGEST_QUALITY", 85))
+IMAGE_INGEST_MIN_QUALITY = 60  # below this, shrink the image instead
+
+
+class UndecodableImage(ValueError):
+    pass
+
+
+class ImageWorkersUnavailable(RuntimeError):
+    # the pool broke twice in a row (workers keep dying); callers answer 503
+    pass
+
+
+class IngestedImage(NamedTuple):
+    path: Path           # the stored, normalized file
+    original_bytes: int  # as uploaded
+    stored_bytes: int    # after normalization
+    width: int
+    height: int
+
+
+def _encode(image, fmt: str, quality: int, icc_profile) -> bytes:
+    out = io.BytesIO()
+    if fmt == "webp":
+        image.save(out, format="WEBP", quality=quality, method=4, icc_profile=icc_profile)
+    else:
+        image.save(out, format="JPEG", quality=quality, optimize=True, progressive=True, icc_profile=icc_profile)
+    return out.getvalue()
+
+
+def normalize_image(source: str, dest: str, fmt: str, max_edge: int, max_bytes: int, quality: int) -> tuple:
+    """
+    Runs in a worker process: decode `source`, apply EXIF orientation, drop
+    metadata, fit within max_edge and re-encode to `dest` at the highest
+    quality (then the largest size) that fits max_bytes. Returns
+    (original_bytes, stored_bytes, width, height).
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    register_heif_opener()
+    original_bytes = os.path.getsize(source)
+    try:
+        with Image.open(source) as opened:
+            # JPEGs decode straight at a reduced scale when they are far too large
+            opened.draft("RGB", (max_edge, max_edge))
+            # colour profile is kept (phones shoot Display P3); EXIF, XMP and GPS are not
+            icc_profile = opened.info.get("icc_profile")
+            image = ImageOps.exif_transpose(opened)
+            has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+            if has_alpha and fmt == "webp":
+                image = image.convert("RGBA")
+            elif has_alpha:
+                # JPEG has no alpha: flatten onto white
+                rgba = image.convert("RGBA")
+                image = Image.new("RGB", rgba.size, (255, 255, 255))
+                image.paste(rgba, mask=rgba.getchannel("A"))
+            else:
+                image = image.convert("RGB")
+    except UnidentifiedImageError:
+        raise UndecodableImage("unrecognized image format") from None
+    except Image.DecompressionBombError:
+        raise UndecodableImage("image dimensions too large") from None
+    except (OSError, SyntaxError, ValueError):
+        raise UndecodableImage("corrupt or truncated image") from None
+
+    image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    while True:
+        for q in range(quality, IMAGE_INGEST_MIN_QUALITY - 1, -10):
+            data = _encode(image, fmt, q, icc_profile)
+            if len(data) <= max_bytes:
+                break
+        if len(data) <= max_bytes or max(image.size) <= 512:
+            break
+        image = image.resize((int(image.width * 0.75), int(image.height * 0.75)), Image.Resampling.LANCZOS)
+
+    partial = os.path.join(os.path.dirname(dest), f".{os.path.basename(dest)}.{uuid.uuid4().hex}.part")
+    try:
+        with open(partial, "wb") as out:
+            out.write(data)
+        os.replace(partial, dest)
+    except BaseException:
+        if os.path.exists(partial):
+            os.unlink(partial)
+        raise
+    return original_bytes, len(data), image.width, image.height
+
+
+def ingested_path(raw: Path) -> Path:
+    return raw.with_suffix(".jpg" if IMAGE_INGEST_FORMAT == "jpeg" else f".{IMAGE_INGEST_FORMAT}")
+
+
+async def _normalize_in_pool(raw: Path, dest: Path) -> tuple:
+    # A dead worker (OOM, codec crash) breaks the whole pool: replace it and
+    # retry once, then give up with ImageWorkersUnavailable
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = derivative_pool()
+        try:
+            return await loop.run_in_executor(
+                pool, normalize_image, str(raw), str(dest),
+                IMAGE_INGEST_FORMAT, IMAGE_MAX_EDGE, IMAGE_MAX_BYTES, IMAGE_INGEST_QUALITY,
+            )
+        except BrokenProcessPool:
+            discard_broken_pool(pool)
+            logger.warning("image worker pool broke while ingesting %s (attempt %d)", raw.name, attempt + 1)
+    raise ImageWorkersUnavailable("image workers unavailable")
+
+
+async def ingest_image(raw: Path) -> IngestedImage:
+    """
+    Normalize an uploaded file in the process pool. The raw upload is
+    replaced by the normalized file (whose suffix may differ); it is removed
+    either way. Raises UndecodableImage for anything Pillow cannot read and
+    ImageWorkersUnavailable when the worker pool keeps breaking.
+    """
+    dest = ingested_path(raw)
+    try:
+        original_bytes, stored_bytes, width, height = await _normalize_in_pool(raw, dest)
+    except BaseException:
+        raw.unlink(missing_ok=True)
+        raise
+    if raw != dest:
+        raw.unlink(missing_ok=True)
+    logger.info("ingested %s: %d -> %d bytes (%dx%d)", dest.name, original_bytes, stored_bytes, width, height)
+    return IngestedImage(dest, original_bytes, stored_bytes, width, height)
+
+
+async def ingest_images(raws: Sequence[Path]) -> List[IngestedImage]:
+    """
+    Normalize several uploads concurrently (the pool bounds the
+    parallelism). All or nothing: if any file fails, every file of the
+    batch is removed and the first error is raised.
+    """
+    results = await asyncio.gather(*(ingest_image(raw) for raw in raws), return_exceptions=True)
+    failures = [r for r in results if isinstance(r, BaseException)]
+    if failures:
+        for r in results:
+            if isinstance(r, IngestedImage):
+                r.path.unlink(missing_ok=True)
+        raise failures[0]
+    return list(results)
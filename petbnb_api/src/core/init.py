@@ -5,7 +5,11 @@ from certificate.models import Certification
 from imageGallery.models import ImageGallery
 from reviewsAndRating.models import ReviewsAndRating
 from petProfile.models import PetProfile, PetPhotos
-from booking.models import Booking, BookingService, BookingPetProfile
+from booking.models import Booking, BookingService, BookingPetProfile, BookingIdempotencyKey
+from availability.models import HostDayOccupancy
+from core.scheduler import SchedulerLease
+from core.outbox import OutboxEvent
+from earnings.models import HostEarningsEntry
 
 __all__ = [
     "PetHost",
@@ -19,4 +23,9 @@ __all__ = [
     "BookingService",
     "BookingPetProfile",
     "PetPhotos",
+    "BookingIdempotencyKey",
+    "HostDayOccupancy",
+    "SchedulerLease",
+    "OutboxEvent",
+    "HostEarningsEntry",
 ]
\ No newline at end of file
@@ -0,0 +1,357 @@
+import json
+import logging
+import os
+import random
+import urllib.request
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, bindparam, delete, event, func, insert, select
+from sqlalchemy.orm import Session, aliased
+
+from core.database import Base, SessionLocal, utcnow
+from core.scheduler import register_job, wake_job
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Transactional outbox --------------------
+# Side effects of a domain change (notifications, webhooks, index and cache
+# updates) are written as outbox rows in the same transaction as the change,
+# so they exist exactly when the change commits and the request never waits
+# on them. The outbox_dispatch job drains pending rows in batches and hands
+# each event to every registered sink; a failed event is retried with
+# exponential backoff. Delivery is at least once: sinks get the event id to
+# drop repeats.
+
+OUTBOX_POLL_SECONDS = float(os.environ.get("OUTBOX_POLL_SECONDS", 2))
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", 100))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 10))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.environ.get("OUTBOX_BACKOFF_BASE_SECONDS", 2))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.environ.get("OUTBOX_BACKOFF_MAX_SECONDS", 600))
+OUTBOX_RETENTION = timedelta(days=int(os.environ.get("OUTBOX_RETENTION_DAYS", 7)))
+OUTBOX_WEBHOOK_URL = os.environ.get("OUTBOX_WEBHOOK_URL")
+
+PENDING = "pending"
+DELIVERED = "delivered"
+DEAD = "dead"  # gave up after OUTBOX_MAX_ATTEMPTS
+
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # dispatcher scan: due pending rows in id order
+        Index("ix_outbox_events_status_due", "status", "next_attempt_at", "id"),
+        # per-aggregate ordering check and retention purge
+        Index("ix_outbox_events_aggregate", "aggregate_type", "aggregate_id", "status", "id"),
+        # ids are never reused after a purge; SSE Last-Event-IDs and tail cursors rely on it
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, nullable=False)      # e.g. booking.created
+    aggregate_type = Column(String, nullable=False)  # e.g. booking
+    aggregate_id = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)           # JSON
+    status = Column(String, nullable=False, default=PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    last_error = Column(Text, nullable=True)
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=utcnow)
+
+
+class Event(NamedTuple):
+    id: int
+    event_type: str
+    aggregate_type: str
+    aggregate_id: str
+    payload: Dict[str, Any]
+    created_at: Optional[datetime]
+
+
+class NewEvent(NamedTuple):
+    event_type: str
+    aggregate_type: str
+    aggregate_id: Any
+    payload: Dict[str, Any]
+
+
+def enqueue_events(db: Session, events: Iterable[NewEvent]) -> None:
+    """Write events into the caller's transaction (one executemany); the caller commits."""
+    now = utcnow()
+    rows = [
+        {
+            "event_type": e.event_type,
+            "aggregate_type": e.aggregate_type,
+            "aggregate_id": str(e.aggregate_id),
+            "payload": json.dumps(e.payload, separators=(",", ":"), default=str),
+            "status": PENDING,
+            "attempts": 0,
+            "next_attempt_at": now,
+        }
+        for e in events
+    ]
+    if rows:
+        db.execute(insert(OutboxEvent), rows)
+        db.info[_ENQUEUED_KEY] = True
+
+
+_ENQUEUED_KEY = "outbox_enqueued"
+# jobs that read new outbox rows; woken by commits that enqueued events
+_readers: List[str] = ["outbox_dispatch"]
+
+
+def wake_on_enqueue(job_name: str) -> None:
+    _readers.append(job_name)
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_dispatcher(session: Session) -> None:
+    # new events are dispatched right after the commit, not at the next poll
+    if session.info.pop(_ENQUEUED_KEY, False):
+        for name in _readers:
+            wake_job(name)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_enqueued(session: Session) -> None:
+    session.info.pop(_ENQUEUED_KEY, None)
+
+
+# -------------------- Sinks --------------------
+
+Sink = Callable[[Event], None]  # raise to have the event retried
+
+
+class _RegisteredSink(NamedTuple):
+    name: str
+    deliver: Sink
+    event_types: Optional[frozenset]
+
+
+_sinks: List[_RegisteredSink] = []
+_event_hooks: Dict[str, List[Callable[[Event], None]]] = {}
+
+
+def register_sink(name: str, deliver: Sink, event_types: Optional[Iterable[str]] = None) -> None:
+    _sinks.append(_RegisteredSink(name, deliver, frozenset(event_types) if event_types else None))
+
+
+def on_outbox_event(*event_types: str):
+    """
+    Register an in-process hook (cache invalidation, live updates, ...) for
+    the given event types, or for every event when none are given. Hooks
+    run in the dispatcher after the change committed.
+    """
+    def decorator(hook: Callable[[Event], None]):
+        for event_type in event_types or ("*",):
+            _event_hooks.setdefault(event_type, []).append(hook)
+        return hook
+    return decorator
+
+
+def log_sink(event: Event) -> None:
+    logger.info("outbox %s #%s %s:%s %s", event.event_type, event.id, event.aggregate_type, event.aggregate_id, event.payload)
+
+
+def hooks_sink(event: Event) -> None:
+    for hook in (*_event_hooks.get(event.event_type, ()), *_event_hooks.get("*", ())):
+        hook(event)
+
+
+class WebhookSink:
+    """
+    POSTs each event as JSON to `url`. Without a URL it stands in for the
+    receiver and keeps the last `keep` deliveries in memory (GET
+    /outbox/stats shows them), so the pipeline runs end to end locally.
+    """
+
+    def __init__(self, url: Optional[str] = None, timeout: float = 5.0, keep: int = 100):
+        self.url = url
+        self.timeout = timeout
+        self.received: Deque[Dict[str, Any]] = deque(maxlen=keep)
+
+    def body(self, event: Event) -> Dict[str, Any]:
+        return {
+            "id": event.id,
+            "type": event.event_type,
+            "aggregate": {"type": event.aggregate_type, "id": event.aggregate_id},
+            "data": event.payload,
+            "created_at": event.created_at.isoformat() if event.created_at else None,
+        }
+
+    def __call__(self, event: Event) -> None:
+        body = self.body(event)
+        if not self.url:
+            self.received.append(body)
+            return
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(body, default=str).encode(),
+            headers={"Content-Type": "application/json", "Idempotency-Key": f"outbox-{event.id}"},
+            method="POST",
+        )
+        # non-2xx raises HTTPError -> retried with backoff
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+webhook_sink = WebhookSink(OUTBOX_WEBHOOK_URL)
+
+register_sink("log", log_sink)
+register_sink("webhook", webhook_sink)
+register_sink("hooks", hooks_sink)
+
+
+# -------------------- Dispatcher --------------------
+
+def backoff_delay(attempts: int) -> timedelta:
+    # exponential, capped, jittered over the upper half so retries spread out
+    ceiling = min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)))
+    return timedelta(seconds=random.uniform(ceiling / 2, ceiling))
+
+
+def deliver(event: Event) -> None:
+    for sink in _sinks:
+        if sink.event_types is None or event.event_type in sink.event_types:
+            try:
+                sink.deliver(event)
+            except Exception as exc:
+                raise RuntimeError(f"{sink.name}: {exc.__class__.__name__}: {exc}") from exc
+
+
+def _due_events(db: Session, now: datetime, limit: int) -> List[OutboxEvent]:
+    # Oldest due events whose aggregate has no earlier undelivered event,
+    # so each booking's events reach sinks in the order they happened
+    earlier = aliased(OutboxEvent)
+    blocked = (
+        select(earlier.id)
+        .where(
+            earlier.aggregate_type == OutboxEvent.aggregate_type,
+            earlier.aggregate_id == OutboxEvent.aggregate_id,
+            earlier.status == PENDING,
+            earlier.id < OutboxEvent.id,
+        )
+        .exists()
+    )
+    return (
+        db.query(OutboxEvent)
+        .filter(OutboxEvent.status == PENDING, OutboxEvent.next_attempt_at <= now, ~blocked)
+        .order_by(OutboxEvent.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def dispatch_batch(db: Session, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """
+    Deliver one batch and record the outcomes with two executemany UPDATEs.
+    Returns how many events were delivered.
+    """
+    now = utcnow()
+    rows = _due_events(db, now, batch_size)
+    if not rows:
+        db.rollback()
+        return 0
+    events = [
+        Event(r.id, r.event_type, r.aggregate_type, r.aggregate_id, json.loads(r.payload), r.created_at)
+        for r in rows
+    ]
+    attempts = {r.id: r.attempts for r in rows}
+    db.rollback()  # no read transaction held while sinks run
+
+    delivered, failed = [], []
+    stalled = set()  # aggregates with a failure in this batch keep their later events queued
+    for event in events:
+        aggregate = (event.aggregate_type, event.aggregate_id)
+        if aggregate in stalled:
+            continue
+        try:
+            deliver(event)
+        except Exception as exc:
+            stalled.add(aggregate)
+            n = attempts[event.id] + 1
+            failed.append({
+                "event_id": event.id,
+                "n": n,
+                "new_status": DEAD if n >= OUTBOX_MAX_ATTEMPTS else PENDING,
+                "due": utcnow() + backoff_delay(n),
+                "error": str(exc)[:2000],
+            })
+            logger.warning("outbox event %s failed (attempt %s): %s", event.id, n, exc)
+        else:
+            delivered.append({"event_id": event.id, "n": attempts[event.id] + 1})
+
+    table = OutboxEvent.__table__
+    done_at = utcnow()
+    if delivered:
+        db.connection().execute(
+            table.update()
+            .where(table.c.id == bindparam("event_id"))
+            .values(status=DELIVERED, attempts=bindparam("n"), delivered_at=done_at, last_error=None, updated_at=done_at),
+            delivered,
+        )
+    if failed:
+        db.connection().execute(
+            table.update()
+            .where(table.c.id == bindparam("event_id"))
+            .values(
+                status=bindparam("new_status"),
+                attempts=bindparam("n"),
+                next_attempt_at=bindparam("due"),
+                last_error=bindparam("error"),
+                updated_at=done_at,
+            ),
+            failed,
+        )
+    db.commit()
+    return len(delivered)
+
+
+def dispatch_outbox(batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    # One scheduler tick: keep draining while events get delivered (each
+    # delivery can unblock the next event of the same aggregate)
+    total = 0
+    with SessionLocal() as db:
+        while True:
+            n = dispatch_batch(db, batch_size)
+            total += n
+            if n == 0:
+                return total
+
+
+def purge_outbox(older_than: timedelta = OUTBOX_RETENTION) -> int:
+    with SessionLocal() as db:
+        # the newest row is kept: tables created before AUTOINCREMENT would
+        # otherwise hand out its id again once they are empty
+        newest = db.query(func.max(OutboxEvent.id)).scalar_subquery()
+        result = db.execute(
+            delete(OutboxEvent)
+            .where(
+                OutboxEvent.status == DELIVERED,
+                OutboxEvent.delivered_at < utcnow() - older_than,
+                OutboxEvent.id < newest,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount
+
+
+def outbox_stats(db: Session) -> Dict[str, Any]:
+    counts = dict(db.query(OutboxEvent.status, func.count()).group_by(OutboxEvent.status))
+    oldest = db.query(func.min(OutboxEvent.created_at)).filter(OutboxEvent.status == PENDING).scalar()
+    return {
+        "counts": {s: counts.get(s, 0) for s in (PENDING, DELIVERED, DEAD)},
+        "oldest_pending_at": oldest,
+        "sinks": [s.name for s in _sinks],
+        "webhook_url": webhook_sink.url,
+        "webhook_stand_in": list(webhook_sink.received)[-20:] if not webhook_sink.url else [],
+    }
+
+
+register_job("outbox_dispatch", OUTBOX_POLL_SECONDS, dispatch_outbox)
+register_job("outbox_purge", 3600, purge_outbox)
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import Column, DateTime, String
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from core.database import Base, SessionLocal, utcnow
+
+logger = logging.getLogger(__name__)
+
+# -------------------- In-process periodic jobs --------------------
+# Jobs are registered at import time and run by one asyncio task per job,
+# started from the main.py lifespan. Every uvicorn worker runs the tasks,
+# but a job only executes in the worker currently holding its lease row,
+# so a tick never runs twice at once. Jobs registered with leased=False run
+# in every worker (per-process work such as feeding local streams).
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+SCHEDULER_ENABLED = os.environ.get("SCHEDULER_ENABLED", "1") != "0"
+
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class PeriodicJob(NamedTuple):
+    name: str
+    interval_seconds: float
+    func: Callable[[], object]  # blocking; runs in a worker thread
+    leased: bool = True
+
+
+_jobs: List[PeriodicJob] = []
+_tasks: Dict[str, asyncio.Task] = {}
+_wakeups: Dict[str, asyncio.Event] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def register_job(name: str, interval_seconds: float, func: Callable[[], object], leased: bool = True) -> None:
+    _jobs.append(PeriodicJob(name, interval_seconds, func, leased))
+
+
+def acquire_lease(name: str, ttl_seconds: float, owner: str = WORKER_ID) -> bool:
+    """Take or renew the lease `name`; True if this worker now holds it."""
+    now = utcnow()
+    stmt = sqlite_insert(SchedulerLease).values(name=name, owner=owner, expires_at=now + timedelta(seconds=ttl_seconds))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SchedulerLease.name],
+        set_={"owner": stmt.excluded.owner, "expires_at": stmt.excluded.expires_at},
+        where=(SchedulerLease.owner == owner) | (SchedulerLease.expires_at < now),
+    )
+    with SessionLocal() as db:
+        result = db.execute(stmt)
+        db.commit()
+        return result.rowcount == 1
+
+
+def run_job_once(job: PeriodicJob) -> Optional[object]:
+    # lease outlives a few missed ticks, so a crashed worker is replaced quickly
+    if job.leased and not acquire_lease(job.name, ttl_seconds=max(job.interval_seconds * 3, 30)):
+        return None
+    return job.func()
+
+
+async def _run_forever(job: PeriodicJob) -> None:
+    wakeup = _wakeups[job.name]
+    while True:
+        wakeup.clear()
+        try:
+            await asyncio.to_thread(run_job_once, job)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("scheduled job %s failed", job.name)
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=job.interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+
+
+def wake_job(name: str) -> None:
+    """
+    Run job `name` now instead of at its next tick (safe from any thread).
+    Only a hint: in a worker that does not hold the lease the early run is
+    skipped and the lease holder picks the work up on its own schedule.
+    """
+    wakeup = _wakeups.get(name)
+    if wakeup is None or _loop is None or _loop.is_closed():
+        return
+    _loop.call_soon_threadsafe(wakeup.set)
+
+
+def start_scheduler() -> None:
+    global _loop
+    if not SCHEDULER_ENABLED:
+        return
+    _loop = asyncio.get_running_loop()
+    for job in _jobs:
+        if job.name not in _tasks:
+            _wakeups[job.name] = asyncio.Event()
+            _tasks[job.name] = asyncio.create_task(_run_forever(job), name=f"job:{job.name}")
+
+
+async def stop_scheduler() -> None:
+    tasks = list(_tasks.values())
+    _tasks.clear()
+    _wakeups.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
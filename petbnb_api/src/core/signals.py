@@ -0,0 +1,72 @@
+import logging
+from typing import Callable, List, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Host change notifications --------------------
+# In-process caches and indexes derived from host data (facets, ranking,
+# profile cache, ...) subscribe here. Every ORM flush records which host
+# aggregates it touched; subscribers are told after the commit succeeds,
+# never for rolled-back work.
+
+HostChangeCallback = Callable[[Set[int]], None]
+
+_host_change_callbacks: List[HostChangeCallback] = []
+_PENDING_KEY = "changed_host_ids"
+
+
+def on_hosts_changed(callback: HostChangeCallback) -> HostChangeCallback:
+    _host_change_callbacks.append(callback)
+    return callback
+
+
+def notify_hosts_changed(host_ids: Set[int]) -> None:
+    if not host_ids:
+        return
+    for callback in list(_host_change_callbacks):
+        try:
+            callback(set(host_ids))
+        except Exception:
+            # a broken subscriber must not fail the request that already committed
+            logger.exception("host change subscriber %r failed", callback)
+
+
+def mark_hosts_changed(session: Session, host_ids) -> None:
+    # For Core UPDATEs that bypass the flush: notify with the session's commit
+    session.info.setdefault(_PENDING_KEY, set()).update(host_ids)
+
+
+def _host_ids_for(obj) -> Set[int]:
+    ids: Set[int] = set()
+    if obj.__class__.__name__ == "PetHost":
+        if obj.id is not None:
+            ids.add(obj.id)
+        return ids
+    if hasattr(obj, "pet_host_id"):
+        if obj.pet_host_id is not None:
+            ids.add(obj.pet_host_id)
+        # a row moved between hosts changes both aggregates
+        for old in inspect(obj).attrs.pet_host_id.history.deleted or ():
+            if old is not None:
+                ids.add(old)
+    return ids
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_hosts(session: Session, flush_context) -> None:
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        pending |= _host_ids_for(obj)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_changed_hosts(session: Session) -> None:
+    notify_hosts_changed(session.info.pop(_PENDING_KEY, set()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_hosts(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi import UploadFile
+
+# -------------------- Upload storage --------------------
+# Multipart bodies are already spooled by Starlette when an endpoint runs;
+# copying them to MEDIA_ROOT is blocking disk I/O. It runs on its own small
+# thread pool, chunk by chunk, so a large upload never stalls the event loop
+# and never takes threads from the pool that serves ordinary sync endpoints.
+# Files of one request are written in parallel, at most
+# UPLOAD_PARALLEL_FILES at a time.
+
+UPLOAD_IO_THREADS = int(os.environ.get("UPLOAD_IO_THREADS", 8))
+UPLOAD_PARALLEL_FILES = int(os.environ.get("UPLOAD_PARALLEL_FILES", 4))
+UPLOAD_CHUNK_BYTES = int(os.environ.get("UPLOAD_CHUNK_BYTES", 1024 * 1024))
+
+upload_io = ThreadPoolExecutor(max_workers=UPLOAD_IO_THREADS, thread_name_prefix="upload-io")
+
+
+def upload_suffix(file: UploadFile, default: str = "") -> str:
+    # extension from the client's filename, else from the content type
+    if file.filename and "." in file.filename:
+        return "." + file.filename.rsplit(".", 1)[-1].lower()
+    if file.content_type and "/" in file.content_type:
+        ext = (file.content_type.split("/")[-1] or "").lower()
+        if ext:
+            return f".{ext}"
+    return default
+
+
+def safe_upload_name(desired: Optional[str], suffix: str) -> str:
+    base = desired or uuid.uuid4().hex
+    safe = "".join(c for c in base if c.isalnum() or c in ("-", "_")).rstrip("_")
+    return f"{safe or uuid.uuid4().hex}{suffix}"
+
+
+def copy_upload(file: UploadFile, path: Path) -> Path:
+    """
+    Blocking: stream the spooled upload into `path` in UPLOAD_CHUNK_BYTES
+    chunks through a temporary name, so readers never see a half-written
+    file and a failed copy leaves nothing behind.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f".{path.name}.{uuid.uuid4().hex}.part")
+    try:
+        file.file.seek(0)
+        with partial.open("wb") as out:
+            shutil.copyfileobj(file.file, out, UPLOAD_CHUNK_BYTES)
+        os.replace(partial, path)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    return path
+
+
+async def save_upload(file: UploadFile, path: Path) -> Path:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(upload_io, copy_upload, file, path)
+
+
+async def save_uploads(items: Sequence[Tuple[UploadFile, Path]], parallel: int = UPLOAD_PARALLEL_FILES) -> List[Path]:
+    """
+    Write several uploads concurrently (at most `parallel` at once), in the
+    order given. If any write fails, the files already written are removed
+    and the error is raised.
+    """
+    gate = asyncio.Semaphore(max(parallel, 1))
+
+    async def save(file: UploadFile, path: Path) -> Path:
+        async with gate:
+            return await save_upload(file, path)
+
+    results = await asyncio.gather(*(save(f, p) for f, p in items), return_exceptions=True)
+    failures = [r for r in results if isinstance(r, BaseException)]
+    if failures:
+        await remove_files([r for r in results if isinstance(r, Path)])
+        raise failures[0]
+    return list(results)
+
+
+async def remove_files(paths: Sequence[Path]) -> None:
+    def unlink_all() -> None:
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+    if paths:
+        await asyncio.get_running_loop().run_in_executor(upload_io, unlink_all)
@@ -0,0 +1,162 @@
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from booking.lifecycle import BookingTransition, on_booking_transition, pets_per_booking
+from booking.models import Booking, BookingService, BookingStatusEnum
+from core.database import SessionLocal, utcnow
+from core.scheduler import register_job
+from core.signals import mark_hosts_changed
+from petHost.models import PetHost
+from quote.controllers import billable_units
+from .models import HostEarningsEntry
+
+RECONCILE_INTERVAL_SECONDS = float(os.environ.get("HOST_STATS_RECONCILE_INTERVAL_SECONDS", 3600))
+COMPLETED_ENTRY = "booking_completed"
+
+
+# -------------------- Pricing --------------------
+
+def booking_amount(services: Iterable[BookingService], checkin: datetime, checkout: datetime) -> float:
+    return round(sum(s.service_amt * billable_units(s.amt_basis, checkin, checkout) for s in services), 2)
+
+
+# -------------------- Ledger --------------------
+
+def ledger_rows(db: Session, transitions: List[BookingTransition]) -> List[dict]:
+    # Entry values for completed bookings: two IN queries (services, pets)
+    booking_ids = [t.booking_id for t in transitions]
+    services: Dict[int, List[BookingService]] = defaultdict(list)
+    for service in db.query(BookingService).filter(BookingService.booking_id.in_(booking_ids)):
+        services[service.booking_id].append(service)
+    pets = pets_per_booking(db, booking_ids)
+    return [
+        {
+            "pet_host_id": t.host_id,
+            "booking_id": t.booking_id,
+            "entry_type": COMPLETED_ENTRY,
+            "amount": booking_amount(services[t.booking_id], t.checkin, t.checkout),
+            "pets": pets[t.booking_id],
+            "stay_hours": round((t.checkout - t.checkin).total_seconds() / 3600, 2),
+        }
+        for t in transitions
+    ]
+
+
+def record_completed_stays(db: Session, transitions: List[BookingTransition]) -> int:
+    """
+    Append a ledger entry per completed booking and bump the host counters
+    by the same amounts, inside the caller's transaction. Bookings already
+    in the ledger are skipped (the insert ignores the unique conflict and
+    only the rows it actually wrote are counted). Returns entries written.
+    """
+    if not transitions:
+        return 0
+    written = db.execute(
+        sqlite_insert(HostEarningsEntry)
+        .values(ledger_rows(db, transitions))
+        .on_conflict_do_nothing()
+        .returning(HostEarningsEntry.pet_host_id, HostEarningsEntry.amount, HostEarningsEntry.pets)
+    ).all()
+    if not written:
+        return 0
+
+    per_host: Dict[int, List[float]] = defaultdict(lambda: [0.0, 0])
+    for host_id, amount, n in written:
+        per_host[host_id][0] += amount
+        per_host[host_id][1] += n
+    table = PetHost.__table__
+    db.connection().execute(
+        table.update()
+        .where(table.c.id == bindparam("host_id"))
+        .values(
+            total_earnings=func.coalesce(table.c.total_earnings, 0) + bindparam("amount"),
+            number_of_pet_hosted=func.coalesce(table.c.number_of_pet_hosted, 0) + bindparam("pets"),
+            updated_at=utcnow(),
+        ),
+        [{"host_id": h, "amount": round(a, 2), "pets": n} for h, (a, n) in per_host.items()],
+    )
+    mark_hosts_changed(db, per_host)
+    return len(written)
+
+
+@on_booking_transition
+def _credit_completed_bookings(db: Session, transitions: List[BookingTransition]) -> None:
+    record_completed_stays(db, [t for t in transitions if t.to_status == BookingStatusEnum.completed.value])
+
+
+# -------------------- Reconciliation --------------------
+
+def reconcile_host_stats(db: Session, host_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Rebuild the counters from scratch (all hosts, or just `host_ids`): first
+    append ledger entries for completed bookings that are missing one (e.g.
+    created as completed, or completed before the ledger existed), then set
+    total_earnings / number_of_pet_hosted to the ledger sums in one UPDATE (review
+    counters are rebuilt by reviewsAndRating). Returns the number of hosts
+    whose counters changed.
+    """
+    missing = (
+        db.query(Booking.id, Booking.booked_pet_host_id, Booking.checkin_datetime, Booking.checkout_datetime)
+        .filter(Booking.booking_status == BookingStatusEnum.completed.value)
+        .filter(~select(HostEarningsEntry.id).where(
+            HostEarningsEntry.booking_id == Booking.id,
+            HostEarningsEntry.entry_type == COMPLETED_ENTRY,
+        ).exists())
+    )
+    if host_ids is not None:
+        host_ids = list(host_ids)
+        missing = missing.filter(Booking.booked_pet_host_id.in_(host_ids))
+
+    missing = missing.all()
+    for start in range(0, len(missing), 500):
+        # plain inserts here; the counters are recomputed below
+        db.execute(
+            sqlite_insert(HostEarningsEntry)
+            .values(ledger_rows(db, [
+                BookingTransition(r.id, r.booked_pet_host_id, BookingStatusEnum.completed.value,
+                                  BookingStatusEnum.completed.value, r.checkin_datetime, r.checkout_datetime)
+                for r in missing[start:start + 500]
+            ]))
+            .on_conflict_do_nothing()
+        )
+
+    # One correlated UPDATE: the sums are read inside the write statement, so a
+    # completion credited concurrently can't land between the read and the write
+    table = PetHost.__table__
+    ledger = HostEarningsEntry.__table__
+    earned = func.round(func.coalesce(
+        select(func.sum(ledger.c.amount)).where(ledger.c.pet_host_id == table.c.id).scalar_subquery(), 0,
+    ), 2)
+    hosted = func.coalesce(
+        select(func.sum(ledger.c.pets)).where(ledger.c.pet_host_id == table.c.id).scalar_subquery(), 0,
+    )
+    stmt = (
+        table.update()
+        .where(
+            (func.round(func.coalesce(table.c.total_earnings, 0), 2) != earned)
+            | (func.coalesce(table.c.number_of_pet_hosted, 0) != hosted)
+        )
+        .values(total_earnings=earned, number_of_pet_hosted=hosted, updated_at=utcnow())
+        .returning(table.c.id)
+    )
+    if host_ids is not None:
+        stmt = stmt.where(table.c.id.in_(host_ids))
+    changed = [host_id for (host_id,) in db.connection().execute(stmt)]
+    if changed:
+        mark_hosts_changed(db, set(changed))
+    db.commit()
+    return len(changed)
+
+
+def run_host_stats_reconciliation() -> int:
+    with SessionLocal() as db:
+        return reconcile_host_stats(db)
+
+
+register_job("host_stats_reconcile", RECONCILE_INTERVAL_SECONDS, run_host_stats_reconciliation)
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index, UniqueConstraint, func
+from core.database import Base, utcnow
+
+
+class HostEarningsEntry(Base):
+    """
+    Append-only earnings ledger: one row per completed booking, written in
+    the transaction that completes it. PetHost.total_earnings and
+    number_of_pet_hosted are running sums of these rows.
+    """
+    __tablename__ = "host_earnings_ledger"
+    __table_args__ = (
+        # a booking is credited once, however often completion is replayed
+        UniqueConstraint("booking_id", "entry_type", name="uq_host_earnings_booking_entry"),
+        # per-host statements, newest first
+        Index("ix_host_earnings_host_id", "pet_host_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    pet_host_id = Column(Integer, ForeignKey("pet_hosts.id"), nullable=False)
+    booking_id = Column(Integer, ForeignKey("bookings.id"), nullable=False)
+    entry_type = Column(String, nullable=False, default="booking_completed")
+    amount = Column(Float, nullable=False)
+    pets = Column(Integer, nullable=False)
+    stay_hours = Column(Float, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=utcnow)
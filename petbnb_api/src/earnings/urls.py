@@ -0,0 +1,70 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.orm import Session
+
+from core.database import get_db
+from core.http import conditional_get, resource_version
+from core.init import HostEarningsEntry, PetHost
+from .controllers import reconcile_host_stats
+
+router = APIRouter(prefix="/earnings", tags=["Earnings"])
+
+
+@router.get("/host/{host_id}", summary="Host dashboard counters (earnings, pets hosted, reviews)")
+def host_earnings_summary(host_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    version = resource_version(db, "host-earnings", (PetHost, PetHost.id == host_id))
+    if not version.exists:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="PetHost not found")
+    conditional_get(request, response, version)
+    # maintained counters: one primary-key read, no aggregation over bookings
+    host_id, total_earnings, hosted, total_review = (
+        db.query(PetHost.id, PetHost.total_earnings, PetHost.number_of_pet_hosted, PetHost.total_review)
+        .filter(PetHost.id == host_id)
+        .one()
+    )
+    return {
+        "host_id": host_id,
+        "total_earnings": total_earnings or 0.0,
+        "number_of_pet_hosted": hosted or 0,
+        "total_review": total_review or 0,
+    }
+
+
+@router.get("/host/{host_id}/ledger", summary="Earnings ledger entries for a host, newest first")
+def host_earnings_ledger(
+    host_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    before_id: Optional[int] = Query(None, description="Cursor: next_before_id of the previous page"),
+    db: Session = Depends(get_db),
+):
+    q = db.query(HostEarningsEntry).filter(HostEarningsEntry.pet_host_id == host_id)
+    if before_id is not None:
+        q = q.filter(HostEarningsEntry.id < before_id)
+    entries = q.order_by(HostEarningsEntry.id.desc()).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    return {
+        "host_id": host_id,
+        "entries": [
+            {
+                "id": e.id,
+                "booking_id": e.booking_id,
+                "entry_type": e.entry_type,
+                "amount": e.amount,
+                "pets": e.pets,
+                "stay_hours": e.stay_hours,
+                "created_at": e.created_at,
+            }
+            for e in entries
+        ],
+        "next_before_id": entries[-1].id if has_more else None,
+    }
+
+
+@router.post("/host/{host_id}/reconcile", summary="Rebuild a host's counters from the ledger")
+def reconcile_host(host_id: int, db: Session = Depends(get_db)):
+    if not db.query(PetHost.id).filter(PetHost.id == host_id).first():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="PetHost not found")
+    changed = reconcile_host_stats(db, [host_id])
+    return {"error": False, "message": "Host stats reconciled", "host_id": host_id, "changed": bool(changed)}
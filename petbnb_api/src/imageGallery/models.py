@@ -1,20 +1,31 @@
 # database.py
 from sqlalchemy import (
     Column, Integer, String,
-    DateTime, func, ForeignKey
+    DateTime, func, ForeignKey, Index
 )
 from sqlalchemy.orm import relationship
-from core.database import Base
+from core.database import Base, utcnow
 
 class ImageGallery(Base):
     __tablename__ = "image_galleries"
+    __table_args__ = (
+        Index("ix_image_galleries_host_id", "pet_host_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     pet_host_id = Column(Integer, ForeignKey("pet_hosts.id"), nullable=False)
     image_url = Column(String)
     image_name = Column(String)
+    # resized copies, see core.derivatives; NULL until rendered
+    thumb_url = Column(String, nullable=True)
+    card_url = Column(String, nullable=True)
+    full_url = Column(String, nullable=True)
+    variants_status = Column(String, nullable=True)  # pending / ready / failed
+    # normalized on ingest, see core.ingest
+    original_bytes = Column(Integer, nullable=True)
+    stored_bytes = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=utcnow)
 
     pet_host = relationship("PetHost", back_populates="image_gallery")
 
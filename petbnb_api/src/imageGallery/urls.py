@@ -1,15 +1,20 @@
-from typing import List, Optional
-import os, uuid, shutil
+from typing import List, Literal, Optional
+import os
 from pathlib import Path
 from urllib.parse import urlparse
 
 from fastapi import (
     APIRouter, Depends, HTTPException, Query, status,
-    UploadFile, File, Form, Request
+    UploadFile, File, Form, Request, Response
 )
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from core.database import get_db
+from core.derivatives import PENDING, pick_variant, register_variant_source, request_variants, variant_paths
+from core.http import conditional_get, resource_version
+from core.ingest import IngestedImage, ImageWorkersUnavailable, UndecodableImage, ingest_image, ingest_images
+from core.uploads import remove_files, safe_upload_name, save_upload, save_uploads, upload_suffix
 from core.init import ImageGallery, PetHost  # adjust import paths
 from pydantic import BaseModel
 
@@ -24,6 +29,13 @@ class ImageGalleryBase(BaseModel):
 
 class ImageGalleryOut(ImageGalleryBase):
     id: int
+    url: Optional[str] = None  # the requested size, else the original
+    thumb_url: Optional[str] = None
+    card_url: Optional[str] = None
+    full_url: Optional[str] = None
+    variants_status: Optional[str] = None
+    original_bytes: Optional[int] = None
+    stored_bytes: Optional[int] = None
     class Config:
         from_attributes = True
 
@@ -63,25 +75,44 @@ def _dest_dir_for_host(media_root: Path, host_id: int) -> Path:
     # /media/pethost/gallery-images/<host_id>/
     return media_root / PARENT_DIR / HOST_SUBDIR / str(host_id)
 
-def _save_upload(file: UploadFile, dest_dir: Path, desired_name: Optional[str] = None) -> Path:
-    dest_dir.mkdir(parents=True, exist_ok=True)
-    # choose extension
-    suffix = ""
-    if file.filename and "." in file.filename:
-        suffix = "." + file.filename.split(".")[-1].lower()
-    elif file.content_type and "/" in file.content_type:
-        ext = (file.content_type.split("/")[-1] or "").lower()
-        if ext:
-            suffix = f".{ext}"
-
-    base = desired_name or uuid.uuid4().hex
-    safe = "".join(c for c in base if c.isalnum() or c in ("-", "_")).rstrip("_")
-    name = f"{safe}{suffix}"
-    path = dest_dir / name
-
-    with path.open("wb") as out:
-        shutil.copyfileobj(file.file, out)
-    return path
+def _upload_path(file: UploadFile, dest_dir: Path, desired_name: Optional[str] = None) -> Path:
+    return dest_dir / safe_upload_name(desired_name, upload_suffix(file))
+
+def _check_image(file: UploadFile, message: str) -> None:
+    if not (file.content_type or "").startswith(ALLOWED_IMAGE_MIME_PREFIX):
+        raise HTTPException(status_code=415, detail={"error": True, "message": message})
+
+def _ingest_error(exc: Exception) -> HTTPException:
+    if isinstance(exc, ImageWorkersUnavailable):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error": True, "message": "Image processing is unavailable, try again"},
+        )
+    return HTTPException(status_code=415, detail={"error": True, "message": f"Could not decode image: {exc}"})
+
+def _insert_rows(db: Session, rows: List[ImageGallery], saved: List[IngestedImage]) -> List[ImageGalleryOut]:
+    # Blocking DB work; the async upload endpoints run it in the threadpool
+    for row, image in zip(rows, saved):
+        row.variants_status = PENDING
+        row.original_bytes, row.stored_bytes = image.original_bytes, image.stored_bytes
+    db.add_all(rows)
+    db.commit()
+    for row, image in zip(rows, saved):
+        db.refresh(row)
+        # resized variants are rendered in the background and recorded on the row
+        request_variants(ImageGallery, row.id, row.image_url, image.path)
+    return [_out(row, "original") for row in rows]
+
+def _out(row: ImageGallery, size: str) -> ImageGalleryOut:
+    return ImageGalleryOut.model_validate(row).model_copy(update={"url": pick_variant(row, size)})
+
+def _remove_image_files(fs_path: Path) -> None:
+    # the original and its resized variants
+    for path in [fs_path, *variant_paths(fs_path)]:
+        path.unlink(missing_ok=True)
+    derived = variant_paths(fs_path)[0].parent
+    if derived.exists() and not any(derived.iterdir()):
+        derived.rmdir()
 
 def _public_url_for(request: Request, media_root: Path, saved_path: Path) -> str:
     # Build public URL: http(s)://host:port/media/<relative-path-from-media-root>
@@ -108,6 +139,11 @@ def _file_path_from_public_url(media_root: Path, image_url: str) -> Optional[Pat
     except Exception:
         return None
 
+register_variant_source(
+    ImageGallery, "image_url",
+    lambda url: _file_path_from_public_url(_media_root_from_app(None), url),
+)
+
 
 # ===================== CRUD Endpoints =====================
 
@@ -125,20 +161,26 @@ async def upload_one(
     pet_host_id: int = Form(...),
     image_name: Optional[str] = Form(None),
 ):
-    _ensure_host_exists(db, pet_host_id)
-
-    if not (file.content_type or "").startswith(ALLOWED_IMAGE_MIME_PREFIX):
-        raise HTTPException(status_code=415, detail={"error": True, "message": "Unsupported file type"})
+    # File copy on the upload I/O pool, DB work in the threadpool: the event loop only awaits
+    await run_in_threadpool(_ensure_host_exists, db, pet_host_id)
+    _check_image(file, "Unsupported file type")
 
     media_root = _media_root_from_app(request)
     dest_dir = _dest_dir_for_host(media_root, pet_host_id)
-    saved = _save_upload(file, dest_dir, desired_name=image_name)
-    public = _public_url_for(request, media_root, saved)
+    raw = await save_upload(file, _upload_path(file, dest_dir, image_name))
+    # decoded, capped and re-encoded in the process pool; the raw upload is replaced
+    try:
+        saved = await ingest_image(raw)
+    except (UndecodableImage, ImageWorkersUnavailable) as exc:
+        raise _ingest_error(exc)
+    public = _public_url_for(request, media_root, saved.path)
 
     row = ImageGallery(pet_host_id=pet_host_id, image_url=public, image_name=image_name or file.filename)
-    db.add(row)
-    db.commit()
-    db.refresh(row)
+    try:
+        [row] = await run_in_threadpool(_insert_rows, db, [row], [saved])
+    except Exception:
+        await remove_files([saved.path])
+        raise
     return row
 
 # Create (multiple files)
@@ -155,31 +197,33 @@ async def upload_multi(
     pet_host_id: int = Form(...),
     image_names: Optional[List[str]] = Form(None),  # pair by index if provided
 ):
-    _ensure_host_exists(db, pet_host_id)
+    await run_in_threadpool(_ensure_host_exists, db, pet_host_id)
+    # every file is checked before any is written
+    for f in files:
+        _check_image(f, f"Unsupported: {f.filename}")
     media_root = _media_root_from_app(request)
     dest_dir = _dest_dir_for_host(media_root, pet_host_id)
 
-    out_rows: List[ImageGallery] = []
-    for idx, f in enumerate(files):
-        if not (f.content_type or "").startswith(ALLOWED_IMAGE_MIME_PREFIX):
-            raise HTTPException(status_code=415, detail={"error": True, "message": f"Unsupported: {f.filename}"})
-
-        desired = image_names[idx] if image_names and idx < len(image_names) else None
-        saved = _save_upload(f, dest_dir, desired_name=desired)
-        public = _public_url_for(request, media_root, saved)
-
-        row = ImageGallery(
+    desired = [image_names[idx] if image_names and idx < len(image_names) else None for idx in range(len(files))]
+    # written in parallel (capped); all-or-nothing together with the rows below
+    raws = await save_uploads([(f, _upload_path(f, dest_dir, name)) for f, name in zip(files, desired)])
+    try:
+        saved = await ingest_images(raws)
+    except (UndecodableImage, ImageWorkersUnavailable) as exc:
+        raise _ingest_error(exc)
+    rows = [
+        ImageGallery(
             pet_host_id=pet_host_id,
-            image_url=public,
-            image_name=desired or f.filename
+            image_url=_public_url_for(request, media_root, image.path),
+            image_name=name or f.filename,
         )
-        db.add(row)
-        out_rows.append(row)
-
-    db.commit()
-    for r in out_rows:
-        db.refresh(r)
-    return out_rows
+        for f, name, image in zip(files, desired, saved)
+    ]
+    try:
+        return await run_in_threadpool(_insert_rows, db, rows, saved)
+    except Exception:
+        await remove_files([image.path for image in saved])
+        raise
 
 # Read (list by host)
 @router.get(
@@ -189,10 +233,19 @@ async def upload_multi(
 )
 def list_by_host(
     pet_host_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     limit: int = Query(1000, ge=1, le=5000),
     offset: int = Query(0, ge=0),
+    size: Literal["thumb", "card", "full", "original"] = Query("thumb", description="Image size returned as `url`"),
 ):
+    version = resource_version(
+        db, "image-galleries",
+        (ImageGallery, ImageGallery.pet_host_id == pet_host_id),
+        vary=(limit, offset, size),
+    )
+    conditional_get(request, response, version)
     _ensure_host_exists(db, pet_host_id)
     q = (
         db.query(ImageGallery)
@@ -201,12 +254,20 @@ def list_by_host(
         .offset(offset)
         .limit(limit)
     )
-    return q.all()
+    return [_out(row, size) for row in q.all()]
 
 # Read (one)
 @router.get("/{gallery_id}", response_model=ImageGalleryOut, summary="Get an image row")
-def get_one(gallery_id: int, db: Session = Depends(get_db)):
-    return _get_or_404(db, gallery_id)
+def get_one(
+    gallery_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    size: Literal["thumb", "card", "full", "original"] = Query("full", description="Image size returned as `url`"),
+):
+    version = resource_version(db, "image-gallery", (ImageGallery, ImageGallery.id == gallery_id), vary=(size,))
+    conditional_get(request, response, version)
+    return _out(_get_or_404(db, gallery_id), size)
 
 # Update (rename etc.)
 @router.patch("/{gallery_id}", response_model=ImageGalleryOut, summary="Update image row")
@@ -216,7 +277,7 @@ def update_one(gallery_id: int, payload: ImageGalleryUpdate, db: Session = Depen
         row.image_name = payload.image_name
     db.commit()
     db.refresh(row)
-    return row
+    return _out(row, "original")
 
 # Delete (one)
 @router.delete("/{gallery_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Delete an image")
@@ -233,7 +294,7 @@ def delete_one(
         fs_path = _file_path_from_public_url(media_root, row.image_url)
         try:
             if fs_path and fs_path.exists():
-                fs_path.unlink(missing_ok=True)
+                _remove_image_files(fs_path)
                 # attempt to clean empty host dir
                 host_dir = _dest_dir_for_host(media_root, row.pet_host_id)
                 if host_dir.exists() and not any(host_dir.iterdir()):
@@ -271,7 +332,7 @@ def delete_all_for_host(
                 if r.image_url:
                     fs_path = _file_path_from_public_url(media_root, r.image_url)
                     if fs_path and fs_path.exists():
-                        fs_path.unlink(missing_ok=True)
+                        _remove_image_files(fs_path)
             except Exception:
                 pass
         # try to remove the (now empty) dir
@@ -1,12 +1,24 @@
 # main.py
 import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from sqlalchemy.orm import Session
 from starlette.staticfiles import StaticFiles
 
-from core.database import Base, engine
+from core.cache import cache_stats
+from core.database import SessionLocal, engine, get_db, sync_schema
+from core.derivatives import shutdown_derivative_pool
+from core.outbox import outbox_stats
+from core.scheduler import start_scheduler, stop_scheduler
+from availability.controllers import backfill_occupancy
+from petHost.controllers import backfill_host_locations
+from petHost.search import ensure_search_index
+from petHost.facets import host_facets
+from petHost.ranking import host_ranking
+from quote.controllers import service_prices
+from reviewsAndRating.controllers import rebuild_rating_aggregates
 from routers import (
     petHostRouter,
     bookingRouter,
@@ -14,6 +26,10 @@ from routers import (
     petServiceRouter,
     petHostImageGalleryRouter,
     petProfileRouter,
+    availabilityRouter,
+    earningsRouter,
+    quoteRouter,
+    reviewsRouter,
 )
 
 # -----------------------------
@@ -46,10 +62,25 @@ CORS_ORIGINS = [
 # -----------------------------
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create DB tables on startup (basic dev flow; in prod use Alembic)
-    Base.metadata.create_all(bind=engine)
+    # Create DB tables + any missing indexes on startup (basic dev flow; in prod use Alembic)
+    sync_schema()
+    ensure_search_index(engine)
+    # Fill coordinates for hosts created before geocoding existed
+    with SessionLocal() as db:
+        backfill_host_locations(db)
+        # Per-host daily occupancy for databases that predate it
+        backfill_occupancy(db)
+        # Running rating aggregates for databases that predate them
+        rebuild_rating_aggregates(db)
+        # In-memory facet bitmaps + ranking columns; kept current by core.signals afterwards
+        host_facets.build(db)
+        host_ranking.build(db)
+        service_prices.build(db)
+    # Periodic jobs (booking lifecycle, ...); lease rows keep workers from doubling up
+    start_scheduler()
     yield
-    # teardown if needed
+    await stop_scheduler()
+    shutdown_derivative_pool()
 
 # -----------------------------
 # 🚀 App
@@ -84,6 +115,10 @@ app.include_router(petPreferenceRouter)
 app.include_router(petServiceRouter)
 app.include_router(petHostImageGalleryRouter)  # Image Gallery CRUD & uploads
 app.include_router(petProfileRouter)
+app.include_router(availabilityRouter)
+app.include_router(earningsRouter)
+app.include_router(quoteRouter)
+app.include_router(reviewsRouter)
 
 # -----------------------------
 # 🌐 Utility endpoints
@@ -103,3 +138,13 @@ def config():
         "media_root": MEDIA_ROOT,
         "cors_origins": CORS_ORIGINS,
     }
+
+@app.get("/cache/stats", tags=["meta"])
+def cache_statistics():
+    # Hit/miss/eviction counters for every in-process response cache
+    return cache_stats()
+
+@app.get("/outbox/stats", tags=["meta"])
+def outbox_statistics(db: Session = Depends(get_db)):
+    # Pending / delivered / dead event counts and the local webhook stand-in
+    return outbox_stats(db)
@@ -0,0 +1,393 @@
+import math
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, exists, func, or_, select
+from sqlalchemy.orm import Query, Session
+
+from availability.controllers import StayWindow, has_capacity
+from certificate.models import Certification
+from core.http import ResourceVersion, resource_version
+from core.pagination import decode_cursor, encode_cursor
+from imageGallery.models import ImageGallery
+from petPreference.models import PetPreferences
+from quote.controllers import QuoteRequest, service_prices
+from reviewsAndRating.models import ReviewsAndRating
+from service.models import ServiceOffer, service_key
+from .models import PetHost
+from .geo import covering_cells, geocode, haversine_km, KM_PER_DEG_LAT
+from .ranking import RANKING_PROFILES, host_ranking
+
+
+# A host that accepts "Both" / "All" matches any specific pet type / size / age
+PET_TYPE_WILDCARD = "Both"
+PREFERENCE_WILDCARD = "All"
+
+
+def build_host_filter_query(
+    db: Session,
+    pet_type: Optional[str] = None,
+    pet_size: Optional[str] = None,
+    age_range: Optional[str] = None,
+    service_name: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    availability_status: Optional[str] = None,
+    is_verified: Optional[bool] = None,
+    is_superhost: Optional[bool] = None,
+    min_rating: Optional[float] = None,
+    window: Optional[StayWindow] = None,
+) -> Query:
+    q = db.query(PetHost)
+
+    # ---- host flags (served by ix_pet_hosts_availability_rating_id) ----
+    if availability_status is not None:
+        q = q.filter(PetHost.availability_status == availability_status)
+    if is_verified is not None:
+        q = q.filter(PetHost.is_verified == is_verified)
+    if is_superhost is not None:
+        q = q.filter(PetHost.is_superhost == is_superhost)
+    if min_rating is not None:
+        q = q.filter(PetHost.rating >= min_rating)
+
+    # ---- pet preferences (semi-join, ix_pet_preferences_search) ----
+    pref_conditions = []
+    if pet_type:
+        pref_conditions.append(PetPreferences.pet_type.in_([pet_type, PET_TYPE_WILDCARD]))
+    if pet_size:
+        pref_conditions.append(PetPreferences.pet_size_accepted.in_([pet_size, PREFERENCE_WILDCARD]))
+    if age_range:
+        pref_conditions.append(PetPreferences.age_range.in_([age_range, PREFERENCE_WILDCARD]))
+    if pref_conditions:
+        q = q.filter(
+            exists().where(PetPreferences.pet_host_id == PetHost.id, *pref_conditions)
+        )
+
+    # ---- services / price (semi-join, ix_service_offer_lname_price_host) ----
+    service_conditions = []
+    if service_name:
+        service_conditions.append(func.lower(ServiceOffer.service_name) == service_key(service_name))
+    if min_price is not None:
+        service_conditions.append(ServiceOffer.service_price >= min_price)
+    if max_price is not None:
+        service_conditions.append(ServiceOffer.service_price <= max_price)
+    if service_conditions:
+        q = q.filter(
+            exists().where(ServiceOffer.pet_host_id == PetHost.id, *service_conditions)
+        )
+
+    # ---- free capacity for a stay (anti-join on host_day_occupancy) ----
+    if window is not None:
+        q = q.filter(has_capacity(window))
+
+    return q
+
+
+def paginate_hosts(q: Query, limit: int, cursor: Optional[str] = None) -> tuple[List[Any], Optional[str]]:
+    """
+    Keyset pagination on (rating DESC, id DESC): each page is an index range
+    scan that starts right after the last row of the previous page.
+    """
+    after = decode_cursor(cursor, 2)
+    if after is not None:
+        last_rating, last_id = after
+        q = q.filter(
+            or_(
+                PetHost.rating < last_rating,
+                and_(PetHost.rating == last_rating, PetHost.id < last_id),
+            )
+        )
+
+    rows = q.order_by(PetHost.rating.desc(), PetHost.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last.rating, last.id])
+    return rows, next_cursor
+
+
+# -------------------- Card projection --------------------
+
+CARD_FIELDS = ("id", "name", "rating", "price_from", "image", "city")
+# Extra scalar columns that may be requested through sparse `fields=`
+SPARSE_EXTRA_FIELDS = ("is_verified", "is_superhost", "total_review", "availability_status")
+
+
+def _price_from_column():
+    # MIN over ix_service_offer_host_price, never materialises ServiceOffer rows
+    return (
+        select(func.min(ServiceOffer.service_price))
+        .where(ServiceOffer.pet_host_id == PetHost.id)
+        .correlate(PetHost)
+        .scalar_subquery()
+        .label("price_from")
+    )
+
+
+def _cover_image_column():
+    # First uploaded gallery image, via ix_image_galleries_host_id
+    return (
+        select(ImageGallery.image_url)
+        .where(ImageGallery.pet_host_id == PetHost.id)
+        .order_by(ImageGallery.id)
+        .limit(1)
+        .correlate(PetHost)
+        .scalar_subquery()
+        .label("image")
+    )
+
+
+# field -> columns it needs in the SELECT list
+_FIELD_COLUMNS = {
+    "id": lambda: [PetHost.id],
+    "name": lambda: [PetHost.first_name, PetHost.last_name],
+    "rating": lambda: [PetHost.rating],
+    "price_from": lambda: [_price_from_column()],
+    "image": lambda: [_cover_image_column()],
+    "city": lambda: [PetHost.address],
+    **{f: (lambda f=f: [getattr(PetHost, f)]) for f in SPARSE_EXTRA_FIELDS},
+}
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return list(CARD_FIELDS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in _FIELD_COLUMNS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "error": True,
+                "message": f"Unknown fields: {', '.join(unknown)}",
+                "allowed": list(_FIELD_COLUMNS),
+            },
+        )
+    # keep request order, drop duplicates
+    return list(dict.fromkeys(requested))
+
+
+def project_cards(q: Query, fields: List[str]) -> Query:
+    """
+    Swap the PetHost entity for a column-only SELECT so no relationship
+    (joined or selectin) is loaded. id and rating are always selected because
+    keyset pagination needs them.
+    """
+    columns = {}
+    for field in ("id", "rating", *fields):
+        for col in _FIELD_COLUMNS[field]():
+            columns.setdefault(col.key, col)
+    return q.with_entities(*columns.values())
+
+
+def _city_from_address(address: Optional[str]) -> Optional[str]:
+    # Addresses are stored as "Locality, City"
+    if not address:
+        return None
+    return address.rsplit(",", 1)[-1].strip() or None
+
+
+def card_from_row(row, fields: List[str]) -> Dict[str, Any]:
+    card: Dict[str, Any] = {}
+    for field in fields:
+        if field == "name":
+            card["name"] = " ".join(p for p in (row.first_name, row.last_name) if p) or None
+        elif field == "city":
+            card["city"] = _city_from_address(row.address)
+        else:
+            card[field] = getattr(row, field)
+    return card
+
+
+# -------------------- Nearby search --------------------
+
+def find_nearby_hosts(
+    db: Session,
+    lat: float,
+    lng: float,
+    radius_km: float,
+    fields: List[str],
+    limit: int,
+    window: Optional[StayWindow] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Hosts within radius_km of (lat, lng), nearest first. The candidate set
+    comes from index range scans over at most 9 geohash prefixes plus a
+    bounding box, so only hosts in the surrounding cells are measured.
+    """
+    cells = covering_cells(lat, lng, radius_km)
+    prefix_ranges = [
+        and_(PetHost.geohash >= cell, PetHost.geohash < cell + "~") for cell in cells
+    ]
+    dlat = radius_km / KM_PER_DEG_LAT
+    dlng = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+
+    q = (
+        db.query(PetHost)
+        .filter(PetHost.geohash.isnot(None))
+        .filter(or_(*prefix_ranges))
+        .filter(PetHost.latitude.between(lat - dlat, lat + dlat))
+    )
+    if dlng < 180:
+        q = q.filter(PetHost.longitude.between(lng - dlng, lng + dlng))
+    if window is not None:
+        q = q.filter(has_capacity(window))
+    rows = project_cards(q, fields).add_columns(PetHost.latitude, PetHost.longitude).all()
+
+    scored = []
+    for row in rows:
+        distance = haversine_km(lat, lng, row.latitude, row.longitude)
+        if distance <= radius_km:
+            scored.append((distance, row.id, row))
+    scored.sort(key=lambda item: (item[0], item[1]))
+
+    results = []
+    for distance, _, row in scored[:limit]:
+        card = card_from_row(row, fields)
+        card["distance_km"] = round(distance, 3)
+        results.append(card)
+    return results
+
+
+def backfill_host_locations(db: Session, batch_size: int = 500) -> int:
+    # Geocode hosts that have an address but no coordinates yet
+    updated = 0
+    last_id = 0
+    while True:
+        hosts = (
+            db.query(PetHost)
+            .filter(PetHost.id > last_id)
+            .filter(PetHost.latitude.is_(None), PetHost.address.isnot(None))
+            .order_by(PetHost.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not hosts:
+            return updated
+        for host in hosts:
+            point = geocode(host.address)
+            if point:
+                host.latitude, host.longitude = point
+                updated += 1
+        last_id = hosts[-1].id
+        db.commit()
+
+
+# -------------------- Relevance ranking --------------------
+
+def rank_hosts(
+    q: Query,
+    profile: str = "default",
+    origin: Optional[tuple[float, float]] = None,
+    top: Optional[int] = None,
+) -> tuple[List[int], List[float], int]:
+    """
+    Rank every host matched by q and return (ids, scores, total candidates).
+    Only the ids are read from the database; features come from the
+    in-memory ranking store and are scored in one vectorised pass.
+    """
+    if profile not in RANKING_PROFILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": True, "message": f"Unknown ranking profile: {profile}", "allowed": list(RANKING_PROFILES)},
+        )
+    if not host_ranking.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error": True, "message": "Ranking index is still loading"},
+        )
+    candidate_ids = [host_id for (host_id,) in q.with_entities(PetHost.id)]
+    ids, scores = host_ranking.score(candidate_ids, profile=profile, origin=origin, top=top)
+    return ids.tolist(), scores.tolist(), len(candidate_ids)
+
+
+def _page_offset(cursor: Optional[str]) -> int:
+    # Ranked results page by position; the cursor carries the next offset
+    after = decode_cursor(cursor, 1)
+    offset = after[0] if after else 0
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": True, "message": "Invalid cursor"},
+        )
+    return offset
+
+
+def rank_hosts_page(
+    q: Query,
+    limit: int,
+    cursor: Optional[str] = None,
+    profile: str = "default",
+    origin: Optional[tuple[float, float]] = None,
+) -> tuple[List[int], List[float], Optional[str]]:
+    offset = _page_offset(cursor)
+    end = offset + limit
+    ids, scores, total = rank_hosts(q, profile=profile, origin=origin, top=end)
+    next_cursor = encode_cursor([end]) if end < total else None
+    return ids[offset:end], scores[offset:end], next_cursor
+
+
+def quote_hosts_page(
+    q: Query,
+    quote: QuoteRequest,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> tuple[List[int], List[float], Optional[str]]:
+    """
+    "Total for your dates" order: every host matched by q is quoted in one
+    vectorised pass over the price store, cheapest first. Only the ids are
+    read from the database.
+    """
+    if not service_prices.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error": True, "message": "Price index is still loading"},
+        )
+    offset = _page_offset(cursor)
+    end = offset + limit
+    candidate_ids = [host_id for (host_id,) in q.with_entities(PetHost.id)]
+    ids, totals, _, _ = service_prices.quote(quote, candidate_ids)
+    next_cursor = encode_cursor([end]) if end < len(ids) else None
+    return ids[offset:end].tolist(), totals[offset:end].tolist(), next_cursor
+
+
+def load_hosts_in_order(
+    db: Session,
+    ids: List[int],
+    scores: List[float],
+    fields: Optional[List[str]] = None,
+    value_key: str = "score",
+) -> List[Any]:
+    # Full ORM hosts (fields=None) or cards with their score / total, in the given order
+    if not ids:
+        return []
+    q = db.query(PetHost).filter(PetHost.id.in_(ids))
+    if fields is None:
+        by_id = {h.id: h for h in q.all()}
+        return [by_id[i] for i in ids if i in by_id]
+
+    by_id = {r.id: r for r in project_cards(q, fields).all()}
+    cards = []
+    for host_id, score in zip(ids, scores):
+        row = by_id.get(host_id)
+        if row is not None:
+            cards.append({**card_from_row(row, fields), value_key: round(score, 4)})
+    return cards
+
+
+# -------------------- Conditional GET --------------------
+
+def host_profile_version(db: Session, host_id: int) -> ResourceVersion:
+    # Every table serialized into GET /pet-host/{hostId}; the host row comes first
+    return resource_version(
+        db,
+        "pet-host",
+        (PetHost, PetHost.id == host_id),
+        (PetPreferences, PetPreferences.pet_host_id == host_id),
+        (Certification, Certification.pet_host_id == host_id),
+        (ServiceOffer, ServiceOffer.pet_host_id == host_id),
+        (ImageGallery, ImageGallery.pet_host_id == host_id),
+        (ReviewsAndRating, ReviewsAndRating.pet_host_id == host_id),
+    )
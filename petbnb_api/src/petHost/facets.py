@@ -0,0 +1,214 @@
+import threading
+from collections import defaultdict
+from typing import AbstractSet, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from core.database import SessionLocal
+from core.signals import on_hosts_changed
+from petPreference.models import PetPreferences
+from service.models import ServiceOffer, service_key
+from .models import PetHost
+
+# facet name -> host values that also satisfy a filter on any specific value
+FACET_WILDCARDS = {
+    "pet_type": "Both",
+    "pet_size_accepted": "All",
+    "age_range": "All",
+}
+FACETS = (
+    "pet_type",
+    "pet_size_accepted",
+    "age_range",
+    "special_needs_pet_accepted",
+    "medical_needs_pet_accepted",
+    "is_verified",
+    "is_superhost",
+    "availability_status",
+    "service",
+)
+
+FacetValues = Dict[str, AbstractSet[str]]
+
+
+def _as_value(value) -> Optional[str]:
+    # Facet values are compared as strings; booleans become "true"/"false"
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value).strip()
+
+
+class HostBitmapIndex:
+    """
+    Process-local bitmap index over low-cardinality host attributes.
+
+    Every host gets a fixed ordinal (bit position); each (facet, value) pair
+    is a Python int with that host's bit set. Filtering is AND across facets
+    and OR within a facet, counting is int.bit_count(), and neither touches
+    the database. Ordinals of deleted hosts are cleared, not reused.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._ordinal_of: Dict[int, int] = {}
+        self._host_at: List[int] = []
+        self._alive = 0
+        self._bitmaps: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._values_of: Dict[int, FacetValues] = {}
+        self.ready = False
+
+    # ---------- loading ----------
+    @staticmethod
+    def _load(db: Session, host_ids: Optional[Iterable[int]] = None) -> Dict[int, FacetValues]:
+        scalar_facets = FACETS[:-1]
+        columns = [
+            getattr(PetHost, f) if hasattr(PetHost, f) else getattr(PetPreferences, f)
+            for f in scalar_facets
+        ]
+        hosts = db.query(PetHost.id, *columns).outerjoin(PetPreferences, PetPreferences.pet_host_id == PetHost.id)
+        services = db.query(ServiceOffer.pet_host_id, ServiceOffer.service_name)
+        if host_ids is not None:
+            host_ids = list(host_ids)
+            hosts = hosts.filter(PetHost.id.in_(host_ids))
+            services = services.filter(ServiceOffer.pet_host_id.in_(host_ids))
+
+        # Scalar facets share one frozenset per distinct raw value
+        value_sets: Dict[object, frozenset] = {}
+
+        def as_set(raw) -> frozenset:
+            found = value_sets.get(raw)
+            if found is None:
+                v = _as_value(raw)
+                found = value_sets[raw] = frozenset((v,)) if v is not None else frozenset()
+            return found
+
+        values: Dict[int, FacetValues] = {}
+        for host_id, *raw in hosts.all():
+            facet_values: FacetValues = dict(zip(scalar_facets, map(as_set, raw)))
+            facet_values["service"] = set()
+            values[host_id] = facet_values
+        for host_id, name in services:
+            key = service_key(name)
+            if key and host_id in values:
+                values[host_id]["service"].add(key)
+        return values
+
+    def build(self, db: Session) -> None:
+        values = self._load(db)
+        # Set bits in bytearrays first: OR-ing into a growing int per host
+        # would copy the whole bitmap every time.
+        nbytes = (len(values) + 7) // 8
+        buffers: Dict[Tuple[str, str], bytearray] = defaultdict(lambda: bytearray(nbytes))
+        host_at = list(values)
+        for ordinal, host_id in enumerate(host_at):
+            byte, bit = ordinal >> 3, 1 << (ordinal & 7)
+            for facet, vals in values[host_id].items():
+                for v in vals:
+                    buffers[(facet, v)][byte] |= bit
+
+        with self._lock:
+            self._reset()
+            self._host_at = host_at
+            self._ordinal_of = {host_id: i for i, host_id in enumerate(host_at)}
+            self._alive = (1 << len(host_at)) - 1
+            self._values_of = values
+            for key, buf in buffers.items():
+                self._bitmaps[key] = int.from_bytes(buf, "little")
+            self.ready = True
+
+    def refresh(self, host_ids: Set[int]) -> None:
+        if not self.ready or not host_ids:
+            return
+        with SessionLocal() as db:
+            values = self._load(db, host_ids)
+        with self._lock:
+            for host_id in host_ids:
+                self._clear(host_id)
+                if host_id in values:
+                    self._set(host_id, values[host_id])
+
+    # ---------- bit twiddling (caller holds the lock) ----------
+    def _set(self, host_id: int, facet_values: FacetValues) -> None:
+        ordinal = self._ordinal_of.get(host_id)
+        if ordinal is None:
+            ordinal = len(self._host_at)
+            self._ordinal_of[host_id] = ordinal
+            self._host_at.append(host_id)
+        bit = 1 << ordinal
+        self._alive |= bit
+        for facet, vals in facet_values.items():
+            for v in vals:
+                self._bitmaps[(facet, v)] |= bit
+        self._values_of[host_id] = facet_values
+
+    def _clear(self, host_id: int) -> None:
+        ordinal = self._ordinal_of.get(host_id)
+        if ordinal is None:
+            return
+        mask = ~(1 << ordinal)
+        self._alive &= mask
+        for facet, vals in self._values_of.pop(host_id, {}).items():
+            for v in vals:
+                key = (facet, v)
+                self._bitmaps[key] &= mask
+                if not self._bitmaps[key]:
+                    del self._bitmaps[key]
+
+    # ---------- queries ----------
+    def _facet_bitmap(self, facet: str, values: Iterable[str]) -> int:
+        wanted = {service_key(v) if facet == "service" else _as_value(v) for v in values}
+        wildcard = FACET_WILDCARDS.get(facet)
+        if wildcard:
+            wanted.add(wildcard)
+        bitmap = 0
+        for v in wanted:
+            bitmap |= self._bitmaps.get((facet, v), 0)
+        return bitmap
+
+    def select(self, filters: Dict[str, List[str]]) -> int:
+        with self._lock:
+            bitmap = self._alive
+            for facet, values in filters.items():
+                if values:
+                    bitmap &= self._facet_bitmap(facet, values)
+            return bitmap
+
+    def bitmap_of(self, host_ids: Iterable[int]) -> int:
+        bitmap = 0
+        with self._lock:
+            for host_id in host_ids:
+                ordinal = self._ordinal_of.get(host_id)
+                if ordinal is not None:
+                    bitmap |= 1 << ordinal
+        return bitmap
+
+    def facet_counts(self, bitmap: int) -> Dict[str, Dict[str, int]]:
+        counts: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+        with self._lock:
+            for (facet, value), facet_bitmap in self._bitmaps.items():
+                n = (bitmap & facet_bitmap).bit_count()
+                if n:
+                    counts[facet][value] = n
+        return counts
+
+    def host_ids(self, bitmap: int, limit: Optional[int] = None) -> List[int]:
+        ids: List[int] = []
+        with self._lock:
+            while bitmap and (limit is None or len(ids) < limit):
+                low = bitmap & -bitmap
+                ids.append(self._host_at[low.bit_length() - 1])
+                bitmap ^= low
+        return ids
+
+
+host_facets = HostBitmapIndex()
+
+
+@on_hosts_changed
+def _refresh_host_facets(host_ids: Set[int]) -> None:
+    host_facets.refresh(host_ids)
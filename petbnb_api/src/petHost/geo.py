@@ -0,0 +1,127 @@
+import csv
+import math
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# ---------- Config ----------
+GAZETTEER_PATH = Path(
+    os.environ.get("GAZETTEER_PATH", Path(__file__).with_name("gazetteer.csv"))
+).absolute()
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = 111.32
+GEOHASH_MAX_PRECISION = 9
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+# -------------------- Geocoding stand-in --------------------
+
+def _normalize(place: str) -> str:
+    return " ".join(place.lower().replace(",", " ").split())
+
+
+@lru_cache(maxsize=1)
+def _load_gazetteer() -> Dict[str, Tuple[float, float]]:
+    """
+    Local gazetteer CSV (locality,city,latitude,longitude). Each row is
+    indexed as "locality city" and the city on its own (first row wins), so
+    "Baner, Pune" resolves to Baner and "Wakad, Pune" falls back to Pune.
+    """
+    places: Dict[str, Tuple[float, float]] = {}
+    if not GAZETTEER_PATH.exists():
+        return places
+    with GAZETTEER_PATH.open(newline="", encoding="utf-8") as fh:
+        for row in csv.DictReader(fh):
+            point = (float(row["latitude"]), float(row["longitude"]))
+            locality, city = row["locality"].strip(), row["city"].strip()
+            if locality:
+                places.setdefault(_normalize(f"{locality} {city}"), point)
+            places.setdefault(_normalize(city), point)
+    return places
+
+
+def geocode(address: Optional[str]) -> Optional[Tuple[float, float]]:
+    if not address:
+        return None
+    places = _load_gazetteer()
+    hit = places.get(_normalize(address))
+    if hit is None and "," in address:
+        hit = places.get(_normalize(address.rsplit(",", 1)[-1]))
+    return hit
+
+
+# -------------------- Geohash --------------------
+
+def geohash_encode(lat: float, lng: float, precision: int = GEOHASH_MAX_PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                ch = (ch << 1) | 1
+                lng_lo = mid
+            else:
+                ch <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def _cell_size_deg(precision: int) -> Tuple[float, float]:
+    # (height in degrees latitude, width in degrees longitude)
+    total = 5 * precision
+    lng_bits = (total + 1) // 2
+    lat_bits = total // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def covering_cells(lat: float, lng: float, radius_km: float) -> List[str]:
+    """
+    Geohash prefixes whose union covers the circle: the cell containing the
+    point plus its 8 neighbours, at the finest precision where one cell is at
+    least radius_km tall and wide.
+    """
+    dlat = radius_km / KM_PER_DEG_LAT
+    dlng = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+
+    precision = 0
+    for p in range(1, GEOHASH_MAX_PRECISION + 1):
+        h, w = _cell_size_deg(p)
+        if h < dlat or w < dlng:
+            break
+        precision = p
+    if precision == 0:
+        return [""]  # radius spans the globe: one empty prefix matches everything
+
+    h, w = _cell_size_deg(precision)
+    cells = set()
+    for dy in (-h, 0.0, h):
+        for dx in (-w, 0.0, w):
+            y = min(max(lat + dy, -90.0), 90.0 - 1e-9)
+            x = (lng + dx + 180.0) % 360.0 - 180.0
+            cells.add(geohash_encode(y, x, precision))
+    return sorted(cells)
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
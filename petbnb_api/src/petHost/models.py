@@ -1,13 +1,21 @@
 # database.py
 from sqlalchemy import (
     Column, Integer, Float, Boolean, String,
-    DateTime, func, ForeignKey
+    DateTime, func, ForeignKey, Index, event, inspect
 )
 from sqlalchemy.orm import relationship
-from core.database import Base
+from core.database import Base, utcnow
+from .geo import geocode, geohash_encode
 
 class PetHost(Base):
     __tablename__ = "pet_hosts"
+    __table_args__ = (
+        # keyset pagination for /filter walks (rating DESC, id DESC)
+        Index("ix_pet_hosts_rating_id", "rating", "id"),
+        Index("ix_pet_hosts_availability_rating_id", "availability_status", "rating", "id"),
+        # /pet-host/nearby range-scans geohash prefixes
+        Index("ix_pet_hosts_geohash", "geohash"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String)
@@ -19,7 +27,9 @@ class PetHost(Base):
     experience = Column(String)
     address = Column(String)
     account_status = Column(String, default="under_review")
-    rating = Column(Integer, default=0)
+    # average star rating, maintained by reviewsAndRating; never NULL, so the
+    # (rating, id) keyset cursor can compare against it
+    rating = Column(Float, nullable=False, default=0, server_default="0")
     profile_image = Column(String)
     is_verified = Column(Boolean, default=False)
     number_of_pet_hosted = Column(Integer, default=0)
@@ -28,9 +38,19 @@ class PetHost(Base):
     availability_status = Column(String, default="available")
     is_superhost = Column(Boolean, default=False)
     total_review = Column(Integer, default=0)
+    # running review aggregates: rating = rating_sum / total_review
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_1 = Column(Integer, nullable=False, default=0, server_default="0")  # star histogram
+    rating_2 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_3 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_4 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_5 = Column(Integer, nullable=False, default=0, server_default="0")
     total_earnings = Column(Float, default=0.0)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geohash = Column(String, nullable=True)  # derived from latitude/longitude
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=utcnow)
 
     # -------- Relationships (attached collections/objects) --------
     bookings = relationship("Booking", back_populates="booked_pet_host", cascade="all, delete")
@@ -63,6 +83,25 @@ class PetHost(Base):
         "ReviewsAndRating",
         back_populates="pet_host",
         cascade="all, delete-orphan",
-        lazy="selectin"
+        lazy="select"             # unbounded: read through /reviews/by-host, profiles embed review_summary
+    )
+
+
+# -------- Location upkeep --------
+@event.listens_for(PetHost, "before_insert")
+@event.listens_for(PetHost, "before_update")
+def _sync_host_location(mapper, connection, target: PetHost):
+    state = inspect(target)
+    coords_changed = (
+        state.attrs.latitude.history.has_changes()
+        or state.attrs.longitude.history.has_changes()
     )
+    # New address without explicit coordinates -> geocode from the gazetteer
+    if state.attrs.address.history.has_changes() and not coords_changed:
+        point = geocode(target.address)
+        target.latitude, target.longitude = point if point else (None, None)
 
+    if target.latitude is None or target.longitude is None:
+        target.geohash = None
+    else:
+        target.geohash = geohash_encode(target.latitude, target.longitude)
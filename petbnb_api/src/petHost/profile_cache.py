@@ -0,0 +1,62 @@
+import json
+import os
+from typing import Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from core.cache import ByteLRUCache, register_cache
+from core.signals import on_hosts_changed
+from reviewsAndRating.controllers import review_summary
+from .models import PetHost
+
+# Serialized GET /pet-host/{hostId} bodies, keyed by host id and tagged with
+# the ETag they were built for. Writes to the host or to any of its child
+# rows evict through core.signals in the writing worker; other workers see
+# the new ETag and reload.
+HOST_PROFILE_CACHE_MAX_BYTES = int(os.environ.get("HOST_PROFILE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+HOST_PROFILE_CACHE_MAX_ENTRIES = int(os.environ.get("HOST_PROFILE_CACHE_MAX_ENTRIES", 10_000))
+HOST_PROFILE_CACHE_TTL_SECONDS = float(os.environ.get("HOST_PROFILE_CACHE_TTL_SECONDS", 300))
+
+host_profile_cache = register_cache(
+    ByteLRUCache(
+        "host_profile",
+        max_bytes=HOST_PROFILE_CACHE_MAX_BYTES,
+        max_entries=HOST_PROFILE_CACHE_MAX_ENTRIES,
+        ttl_seconds=HOST_PROFILE_CACHE_TTL_SECONDS,
+    )
+)
+
+
+def serialize_host_profile(host: PetHost, summary: Optional[dict] = None) -> bytes:
+    # Same encoding FastAPI's JSONResponse applies to a returned ORM object;
+    # reviews are embedded as their summary, never as the full collection
+    body = jsonable_encoder(host)
+    if summary is not None:
+        body["review_summary"] = jsonable_encoder(summary)
+    return json.dumps(
+        body,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def get_host_profile(db: Session, host_id: int, etag: Optional[str] = None) -> Optional[bytes]:
+    """
+    Serialized host profile (with its eager-loaded children), or None if
+    missing. With `etag` (host_profile_version), a cached body is only
+    served if it was built for that version.
+    """
+
+    def load() -> Optional[bytes]:
+        host = db.query(PetHost).filter(PetHost.id == host_id).first()
+        return serialize_host_profile(host, review_summary(db, host_id)) if host else None
+
+    return host_profile_cache.get_or_load(host_id, load, tag=etag)
+
+
+@on_hosts_changed
+def _invalidate_host_profiles(host_ids: Set[int]) -> None:
+    host_profile_cache.invalidate(host_ids)
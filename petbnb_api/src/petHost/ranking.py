@@ -0,0 +1,301 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core.database import SessionLocal
+from core.signals import on_hosts_changed
+from service.models import ServiceOffer
+from .geo import KM_PER_DEG_LAT
+from .models import PetHost
+
+# -------------------- Weight profiles --------------------
+# Every feature is scaled to [0, 1] before weighting, so weights read as the
+# relative importance of each signal.
+
+RANKING_FEATURES = (
+    "rating",
+    "total_review",
+    "is_superhost",
+    "is_verified",
+    "number_of_pet_hosted",
+    "price",
+    "distance",
+)
+
+RANKING_PROFILES: Dict[str, Dict[str, float]] = {
+    "default": {
+        "rating": 0.35,
+        "total_review": 0.15,
+        "is_superhost": 0.10,
+        "is_verified": 0.10,
+        "number_of_pet_hosted": 0.05,
+        "price": 0.10,
+        "distance": 0.15,
+    },
+    "budget": {
+        "rating": 0.20,
+        "total_review": 0.05,
+        "is_verified": 0.05,
+        "price": 0.55,
+        "distance": 0.15,
+    },
+    "nearby": {
+        "rating": 0.20,
+        "total_review": 0.05,
+        "is_verified": 0.05,
+        "price": 0.05,
+        "distance": 0.65,
+    },
+    "trusted": {
+        "rating": 0.30,
+        "total_review": 0.20,
+        "is_superhost": 0.20,
+        "is_verified": 0.20,
+        "number_of_pet_hosted": 0.10,
+    },
+}
+
+# distance at which the distance feature drops to 0.5
+DISTANCE_HALF_SCORE_KM = 5.0
+
+
+def register_profile(name: str, weights: Dict[str, float]) -> None:
+    unknown = set(weights) - set(RANKING_FEATURES)
+    if unknown:
+        raise ValueError(f"Unknown ranking features: {', '.join(sorted(unknown))}")
+    RANKING_PROFILES[name] = dict(weights)
+
+
+# -------------------- Column store --------------------
+
+# Features are stored pre-transformed so scoring is only gathers and
+# multiply-adds: NULL counters become 0, counts are log-scaled, flags are 0/1.
+# price_from / latitude / longitude stay NaN when unknown.
+_FEATURE_COLUMNS = (
+    "rating_unit",
+    "log_reviews",
+    "is_superhost",
+    "is_verified",
+    "log_hosted",
+    "price_from",
+    "latitude",
+    "longitude",
+)
+_COLUMNS = {"host_id": np.int64, **{name: np.float32 for name in _FEATURE_COLUMNS}}
+
+
+def _nz(value) -> float:
+    return 0.0 if value is None else float(value)
+
+
+def _nan(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+class HostRankingStore:
+    """
+    Ranking features for every host held as parallel NumPy columns, one row
+    per host. Scoring a candidate set is a gather plus a handful of
+    vectorised array ops, with no per-row Python.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._columns: Dict[str, np.ndarray] = {
+            name: np.empty(0, dtype=dtype) for name, dtype in _COLUMNS.items()
+        }
+        # dense host_id -> row lookup (-1 = unknown), so candidate gathers are vectorised too
+        self._row_by_id = np.full(0, -1, dtype=np.int64)
+        self._size = 0
+        self.ready = False
+
+    # ---------- loading ----------
+    @staticmethod
+    def _load(db: Session, host_ids: Optional[Iterable[int]] = None) -> List[Tuple]:
+        price_from = (
+            db.query(ServiceOffer.pet_host_id, func.min(ServiceOffer.service_price).label("price_from"))
+            .group_by(ServiceOffer.pet_host_id)
+        )
+        if host_ids is not None:
+            price_from = price_from.filter(ServiceOffer.pet_host_id.in_(list(host_ids)))
+        price_from = price_from.subquery()
+        q = db.query(
+            PetHost.id,
+            PetHost.rating,
+            PetHost.total_review,
+            PetHost.is_superhost,
+            PetHost.is_verified,
+            PetHost.number_of_pet_hosted,
+            price_from.c.price_from,
+            PetHost.latitude,
+            PetHost.longitude,
+        ).outerjoin(price_from, price_from.c.pet_host_id == PetHost.id)
+        if host_ids is not None:
+            q = q.filter(PetHost.id.in_(list(host_ids)))
+        return q.all()
+
+    @staticmethod
+    def _to_columns(rows: Sequence[Tuple]) -> Dict[str, np.ndarray]:
+        n = len(rows)
+
+        def column(i: int, convert) -> np.ndarray:
+            return np.fromiter((convert(r[i]) for r in rows), dtype=np.float64, count=n)
+
+        return {
+            "host_id": np.fromiter((r[0] for r in rows), dtype=np.int64, count=n),
+            "rating_unit": column(1, _nz) / 5.0,
+            "log_reviews": np.log1p(column(2, _nz)),
+            "is_superhost": column(3, _nz),
+            "is_verified": column(4, _nz),
+            "log_hosted": np.log1p(column(5, _nz)),
+            "price_from": column(6, _nan),
+            "latitude": column(7, _nan),
+            "longitude": column(8, _nan),
+        }
+
+    def load_columns(self, columns: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._columns = {name: np.ascontiguousarray(columns[name], dtype=dtype) for name, dtype in _COLUMNS.items()}
+            self._size = len(self._columns["host_id"])
+            host_ids = self._columns["host_id"]
+            self._row_by_id = np.full(int(host_ids.max()) + 1 if self._size else 0, -1, dtype=np.int64)
+            self._row_by_id[host_ids] = np.arange(self._size, dtype=np.int64)
+            self.ready = True
+
+    def build(self, db: Session) -> None:
+        self.load_columns(self._to_columns(self._load(db)))
+
+    def refresh(self, host_ids: Set[int]) -> None:
+        if not self.ready or not host_ids:
+            return
+        with SessionLocal() as db:
+            rows = self._load(db, host_ids)
+        fresh = self._to_columns(rows)
+        with self._lock:
+            seen = set()
+            for i, host_id in enumerate(fresh["host_id"].tolist()):
+                seen.add(host_id)
+                row = self._row_of(host_id)
+                if row < 0:
+                    row = self._append_row()
+                    self._map_row(host_id, row)
+                for name in _COLUMNS:
+                    self._columns[name][row] = fresh[name][i]
+            # deleted hosts keep their row but are never looked up again
+            for host_id in host_ids - seen:
+                if self._row_of(host_id) >= 0:
+                    self._row_by_id[host_id] = -1
+
+    def _row_of(self, host_id: int) -> int:
+        return int(self._row_by_id[host_id]) if 0 <= host_id < len(self._row_by_id) else -1
+
+    def _map_row(self, host_id: int, row: int) -> None:
+        if host_id >= len(self._row_by_id):
+            grown = np.full(max(host_id + 1, len(self._row_by_id) * 2), -1, dtype=np.int64)
+            grown[: len(self._row_by_id)] = self._row_by_id
+            self._row_by_id = grown
+        self._row_by_id[host_id] = row
+
+    def _append_row(self) -> int:
+        capacity = len(self._columns["host_id"])
+        if self._size == capacity:
+            new_capacity = max(16, capacity * 2)
+            for name, col in self._columns.items():
+                grown = np.empty(new_capacity, dtype=col.dtype)
+                grown[:capacity] = col
+                self._columns[name] = grown
+        self._size += 1
+        return self._size - 1
+
+    # ---------- scoring ----------
+    def rows_for(self, host_ids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        # (host ids that are known to the store, their row numbers)
+        ids = np.asarray(host_ids, dtype=np.int64)
+        with self._lock:
+            lookup = self._row_by_id
+            known = (ids >= 0) & (ids < len(lookup))
+            rows = np.full(len(ids), -1, dtype=np.int64)
+            rows[known] = lookup[ids[known]]
+        keep = rows >= 0
+        return ids[keep], rows[keep]
+
+    def score(
+        self,
+        host_ids: Sequence[int],
+        profile: str = "default",
+        origin: Optional[Tuple[float, float]] = None,
+        top: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score candidates with a weight profile and return (host_ids, scores)
+        best first; with top=k only the k best are selected and sorted.
+        Review and pets-hosted counts are min-max scaled over the candidate
+        set. Unknown prices score 0 on the price feature, and distance only
+        counts when an origin (lat, lng) is given.
+        """
+        weights = RANKING_PROFILES[profile]
+        ids, rows = self.rows_for(host_ids)
+        if len(rows) == 0:
+            return ids, np.empty(0, dtype=np.float32)
+
+        with self._lock:
+            columns = self._columns
+            scores = np.zeros(len(rows), dtype=np.float32)
+            for feature, column in (
+                ("rating", "rating_unit"),
+                ("is_superhost", "is_superhost"),
+                ("is_verified", "is_verified"),
+            ):
+                if weights.get(feature):
+                    scores += np.float32(weights[feature]) * columns[column][rows]
+            for feature, column in (
+                ("total_review", "log_reviews"),
+                ("number_of_pet_hosted", "log_hosted"),
+            ):
+                if weights.get(feature):
+                    values = columns[column][rows]
+                    lo, hi = values.min(), values.max()
+                    if hi > lo:
+                        scores += np.float32(weights[feature] / (hi - lo)) * (values - lo)
+            if weights.get("price"):
+                # cheapest candidate -> 1.0, most expensive -> 0.0; fmax maps NaN to 0
+                price = columns["price_from"][rows]
+                if not np.isnan(price).all():
+                    lo, hi = np.nanmin(price), np.nanmax(price)
+                    if hi > lo:
+                        term = np.fmax((hi - price) * np.float32(1.0 / (hi - lo)), np.float32(0.0))
+                    else:
+                        term = (~np.isnan(price)).astype(np.float32)
+                    scores += np.float32(weights["price"]) * term
+            if weights.get("distance") and origin is not None:
+                km = _approx_distance_km(origin[0], origin[1], columns["latitude"][rows], columns["longitude"][rows])
+                half = np.float32(DISTANCE_HALF_SCORE_KM)
+                scores += np.float32(weights["distance"]) * np.fmax(half / (half + km), np.float32(0.0))
+
+        if top is not None and top < len(scores):
+            best = np.argpartition(-scores, top - 1)[:top]
+            order = best[np.argsort(-scores[best], kind="stable")]
+        else:
+            order = np.argsort(-scores, kind="stable")
+        return ids[order], scores[order]
+
+
+def _approx_distance_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    # Equirectangular approximation: well within ranking precision at city
+    # scale and several times cheaper than haversine over large arrays.
+    kx = np.float32(KM_PER_DEG_LAT * np.cos(np.radians(lat)))
+    ky = np.float32(KM_PER_DEG_LAT)
+    dx = (lngs - np.float32(lng)) * kx
+    dy = (lats - np.float32(lat)) * ky
+    return np.sqrt(dx * dx + dy * dy)
+
+
+host_ranking = HostRankingStore()
+
+
+@on_hosts_changed
+def _refresh_host_ranking(host_ids: Set[int]) -> None:
+    host_ranking.refresh(host_ids)
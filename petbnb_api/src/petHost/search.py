@@ -0,0 +1,166 @@
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# -------------------- FTS5 shadow index --------------------
+# One row per host (rowid = pet_hosts.id) holding the host's searchable text
+# plus its service names/descriptions. SQLite triggers keep it in sync, so
+# every write path (ORM, bulk, raw SQL, seed script) is covered.
+
+FTS_TABLE = "pet_host_fts"
+FTS_COLUMNS = ("name", "bio", "experience", "address", "language", "services")
+# bm25() weight per column, same order as FTS_COLUMNS
+FTS_WEIGHTS = (4.0, 1.0, 1.0, 3.0, 2.0, 3.0)
+
+_HOST_ROW_SELECT = """
+    SELECT h.id,
+           trim(coalesce(h.first_name, '') || ' ' || coalesce(h.last_name, '')),
+           coalesce(h.bio, ''),
+           coalesce(h.experience, ''),
+           coalesce(h.address, ''),
+           coalesce(h.language, ''),
+           coalesce((
+               SELECT group_concat(coalesce(s.service_name, '') || ' ' || coalesce(s.service_description, ''), ' | ')
+               FROM service_offer s WHERE s.pet_host_id = h.id
+           ), '')
+    FROM pet_hosts h
+"""
+
+_INSERT_HOST = f"INSERT INTO {FTS_TABLE}(rowid, {', '.join(FTS_COLUMNS)}) {_HOST_ROW_SELECT}"
+
+_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {', '.join(FTS_COLUMNS)},
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS pet_hosts_fts_ai AFTER INSERT ON pet_hosts BEGIN
+        {_INSERT_HOST} WHERE h.id = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS pet_hosts_fts_au AFTER UPDATE OF
+        first_name, last_name, bio, experience, address, language ON pet_hosts BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        {_INSERT_HOST} WHERE h.id = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS pet_hosts_fts_ad AFTER DELETE ON pet_hosts BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS service_offer_fts_ai AFTER INSERT ON service_offer BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = new.pet_host_id;
+        {_INSERT_HOST} WHERE h.id = new.pet_host_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS service_offer_fts_au AFTER UPDATE OF
+        pet_host_id, service_name, service_description ON service_offer BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid IN (old.pet_host_id, new.pet_host_id);
+        {_INSERT_HOST} WHERE h.id IN (old.pet_host_id, new.pet_host_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS service_offer_fts_ad AFTER DELETE ON service_offer BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.pet_host_id;
+        {_INSERT_HOST} WHERE h.id = old.pet_host_id;
+    END
+    """,
+]
+
+
+def ensure_search_index(engine: Engine) -> None:
+    with engine.begin() as conn:
+        existed = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+        ).first()
+        for ddl in _DDL:
+            conn.exec_driver_sql(ddl)
+        if not existed:
+            conn.exec_driver_sql(_INSERT_HOST)
+
+
+def rebuild_search_index(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DELETE FROM {FTS_TABLE}")
+        conn.exec_driver_sql(_INSERT_HOST)
+
+
+# -------------------- Querying --------------------
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def to_match_expression(q: str, operator: str = "AND") -> str:
+    """
+    Turn free text ("dog walking HSR Layout Kannada") into a safe FTS5 query:
+    every token is quoted (no operator injection) and the last one is a
+    prefix match so results show up while the user is still typing.
+    """
+    tokens = _TOKEN_RE.findall(q.lower())
+    if not tokens:
+        return ""
+    terms = [f'"{t}"' for t in tokens]
+    terms[-1] += "*"
+    return f" {operator} ".join(terms)
+
+
+def search_hosts(
+    db: Session,
+    q: str,
+    limit: int,
+    offset: int = 0,
+    exclude_ids: Optional[Iterable[int]] = None,
+) -> Tuple[List[Tuple[int, float, str]], str]:
+    """
+    Return (host_id, score, snippet) ordered by BM25 relevance (higher score
+    is better), plus the operator used. All terms must match; if no host
+    matches them all, fall back to any term. The choice is made the same way
+    for every page, so the OR results page like the AND ones. Hosts in
+    exclude_ids are dropped before LIMIT/OFFSET are applied.
+    """
+    weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+    exclude = json.dumps(sorted(exclude_ids)) if exclude_ids else None
+    exclusion = "AND rowid NOT IN (SELECT value FROM json_each(:exclude))" if exclude else ""
+    any_match = text(f"SELECT 1 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match {exclusion} LIMIT 1")
+    sql = text(f"""
+        SELECT rowid AS host_id,
+               -bm25({FTS_TABLE}, {weights}) AS score,
+               snippet({FTS_TABLE}, -1, '<b>', '</b>', '…', 12) AS snippet
+        FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH :match {exclusion}
+        ORDER BY bm25({FTS_TABLE}, {weights})
+        LIMIT :limit OFFSET :offset
+    """)
+    match = to_match_expression(q, "AND")
+    if not match:
+        return [], "AND"
+    params = {"match": match}
+    if exclude:
+        params["exclude"] = exclude
+    operator = "AND"
+    if db.execute(any_match, params).first() is None:
+        operator = "OR"
+        params["match"] = to_match_expression(q, "OR")
+    rows = db.execute(sql, {**params, "limit": limit, "offset": offset}).all()
+    return [(r.host_id, r.score, r.snippet) for r in rows], operator
+
+
+def merge_search_results(hits: List[Tuple[int, float, str]], cards: Dict[int, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    results = []
+    for host_id, score, snippet in hits:
+        card = cards.get(host_id)
+        if card is None:
+            continue
+        results.append({**card, "score": round(score, 4), "snippet": snippet})
+    return results
@@ -1,20 +1,105 @@
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from pydantic import Field
 from sqlalchemy.orm import Session
 from core.database import get_db
+from core.http import conditional_get, raise_if_not_modified, resource_version, validator_headers
 from core.init import *
 from schemas.petHost import *
+from petPreference.schemas import PetTypeEnum as PreferencePetTypeEnum, PetSizeEnum, AgeRangeEnum as PreferenceAgeRangeEnum
 from .schemas import CreateHostAccountInputSchema
 from .models import PetHost
+from .controllers import (
+    build_host_filter_query, paginate_hosts,
+    parse_fields, project_cards, card_from_row, find_nearby_hosts,
+    rank_hosts, rank_hosts_page, quote_hosts_page, load_hosts_in_order, host_profile_version,
+)
+from .search import search_hosts, merge_search_results
+from .facets import host_facets
+from .profile_cache import get_host_profile
+from availability.controllers import stay_window, unavailable_host_ids
+from quote.controllers import quote_request, service_prices
 
 router = APIRouter(prefix="")
 
 @router.get("/filter")
-def filterHost(db: Session = Depends(get_db)):
-    hosts = db.query(PetHost).all()
-    db.close()
-    return hosts
+def filterHost(
+    db: Session = Depends(get_db),
+    pet_type: Optional[PreferencePetTypeEnum] = Query(None, description="Dog or Cat; hosts accepting Both always match"),
+    pet_size: Optional[PetSizeEnum] = Query(None, description="Small, Medium or Large; hosts accepting All always match"),
+    age_range: Optional[PreferenceAgeRangeEnum] = Query(None, description="Puppy, Adult or Senior; hosts accepting All always match"),
+    service_name: Optional[str] = Query(None, description="e.g. Boarding, Daycare, Dog Walking"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    availability_status: Optional[str] = Query(None, description="e.g. available | busy | away"),
+    is_verified: Optional[bool] = Query(None),
+    is_superhost: Optional[bool] = Query(None),
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    available_from: Optional[datetime] = Query(None, description="Check-in; only hosts with free capacity for the whole stay"),
+    available_to: Optional[datetime] = Query(None, description="Check-out; required with available_from"),
+    pets: Optional[int] = Query(None, ge=1, le=20, description="Pets to board (default 1 when dates are given)"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    view: Literal["full", "card"] = Query("full", description="full host objects or compact cards"),
+    fields: Optional[str] = Query(None, description="Comma-separated card fields; implies view=card"),
+    sort: Literal["rating", "relevance", "total"] = Query(
+        "rating", description="total: cheapest stay first; needs service_name, available_from and available_to",
+    ),
+    profile: str = Query("default", description="Ranking weight profile for sort=relevance"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Searcher location for distance ranking"),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+):
+    # service + dates -> every result carries the total for the stay
+    quote = (
+        quote_request(service_name, available_from, available_to, pets)
+        if service_name and available_from and available_to else None
+    )
+    if sort == "total" and quote is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": True, "message": "sort=total needs service_name, available_from and available_to"},
+        )
+    q = build_host_filter_query(
+        db,
+        pet_type=pet_type.value if pet_type else None,
+        pet_size=pet_size.value if pet_size else None,
+        age_range=age_range.value if age_range else None,
+        service_name=service_name,
+        min_price=min_price,
+        max_price=max_price,
+        availability_status=availability_status,
+        is_verified=is_verified,
+        is_superhost=is_superhost,
+        min_rating=min_rating,
+        window=stay_window(available_from, available_to, pets),
+    )
+    if sort == "relevance":
+        origin = (lat, lng) if lat is not None and lng is not None else None
+        ids, scores, next_cursor = rank_hosts_page(q, limit=limit, cursor=cursor, profile=profile, origin=origin)
+        selected = parse_fields(fields) if view == "card" or fields else None
+        hosts = load_hosts_in_order(db, ids, scores, fields=selected)
+    elif sort == "total":
+        ids, totals, next_cursor = quote_hosts_page(q, quote, limit=limit, cursor=cursor)
+        selected = parse_fields(fields) if view == "card" or fields else None
+        hosts = load_hosts_in_order(db, ids, totals, fields=selected, value_key="total_price")
+    elif view == "card" or fields:
+        selected = parse_fields(fields)
+        rows, next_cursor = paginate_hosts(project_cards(q, selected), limit=limit, cursor=cursor)
+        ids = [r.id for r in rows]
+        hosts = [card_from_row(r, selected) for r in rows]
+    else:
+        hosts, next_cursor = paginate_hosts(q, limit=limit, cursor=cursor)
+        ids = [h.id for h in hosts]
+    page = {
+        "data": hosts,
+        "next_cursor": next_cursor,
+        "limit": limit,
+    }
+    if quote is not None:
+        # host id -> total for the stay, for whichever hosts are on this page
+        page["quotes"] = service_prices.totals_for(quote, ids) if service_prices.ready else {}
+    return page
 
 @router.get("/")
 def home():
@@ -23,7 +108,26 @@ def home():
     }
 
 @router.get("/pet-host")
-def petHost(db: Session = Depends(get_db)):
+def petHost(
+    db: Session = Depends(get_db),
+    view: Literal["full", "card"] = Query("full", description="full host objects or compact cards"),
+    fields: Optional[str] = Query(None, description="Comma-separated card fields; implies view=card"),
+    sort: Literal["id", "relevance"] = Query("id"),
+    profile: str = Query("default", description="Ranking weight profile for sort=relevance"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Searcher location for distance ranking"),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+):
+    if sort == "relevance":
+        origin = (lat, lng) if lat is not None and lng is not None else None
+        ids, scores, _ = rank_hosts(db.query(PetHost), profile=profile, origin=origin)
+        selected = parse_fields(fields) if view == "card" or fields else None
+        return load_hosts_in_order(db, ids, scores, fields=selected)
+
+    if view == "card" or fields:
+        selected = parse_fields(fields)
+        rows = project_cards(db.query(PetHost), selected).order_by(PetHost.id).all()
+        return [card_from_row(r, selected) for r in rows]
+
     hosts = db.query(PetHost).all()
     db.close()
     return hosts
@@ -67,7 +171,9 @@ def createPetHost(hostData:CreateHostAccountInputSchema,  db: Session = Depends(
 
 @router.get("/pet-host/pet-preference/{petHostId}")
 def getPetPreferenceForPetHost(
-    petHostId: int, db: Session = Depends(get_db)):
+    petHostId: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    version = resource_version(db, "pet-host-preference", (PetPreferences, PetPreferences.pet_host_id == petHostId))
+    conditional_get(request, response, version)
     host = db.query(PetPreferences).filter(PetPreferences.pet_host_id == petHostId).first()
     return host
 
@@ -81,7 +187,9 @@ def setServiceOfferForPetHost(petHostId:int, service:ServiceOfferSchema):
     return service
 
 @router.get("/pet-host/service/{petHostId}")
-def getServiceOfferForPetHost(petHostId:int, db: Session = Depends(get_db)):
+def getServiceOfferForPetHost(petHostId:int, request: Request, response: Response, db: Session = Depends(get_db)):
+    version = resource_version(db, "pet-host-service", (ServiceOffer, ServiceOffer.pet_host_id == petHostId))
+    conditional_get(request, response, version)
     service = db.query(ServiceOffer).filter(ServiceOffer.pet_host_id==petHostId).first()
     return service
 
@@ -94,12 +202,107 @@ def setImageGalleryForPetHost():
 def setCertificationForPetHost():
     pass
 
+@router.get("/pet-host/nearby")
+def nearby_hosts(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10, gt=0, le=500),
+    limit: int = Query(50, ge=1, le=200),
+    fields: Optional[str] = Query(None, description="Comma-separated card fields"),
+    available_from: Optional[datetime] = Query(None),
+    available_to: Optional[datetime] = Query(None),
+    pets: Optional[int] = Query(None, ge=1, le=20),
+    db: Session = Depends(get_db),
+):
+    selected = parse_fields(fields)
+    window = stay_window(available_from, available_to, pets)
+    hosts = find_nearby_hosts(db, lat, lng, radius_km, fields=selected, limit=limit, window=window)
+    return {
+        "data": hosts,
+        "count": len(hosts),
+    }
+
+@router.get("/pet-host/search")
+def search_pet_hosts(
+    q: str = Query(..., min_length=1, max_length=200, description='Free text, e.g. "dog walking HSR Layout Kannada"'),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    fields: Optional[str] = Query(None, description="Comma-separated card fields"),
+    available_from: Optional[datetime] = Query(None),
+    available_to: Optional[datetime] = Query(None),
+    pets: Optional[int] = Query(None, ge=1, le=20),
+    db: Session = Depends(get_db),
+):
+    selected = parse_fields(fields)
+    window = stay_window(available_from, available_to, pets)
+    exclude = unavailable_host_ids(db, window) if window else None
+    hits, operator = search_hosts(db, q, limit=limit, offset=offset, exclude_ids=exclude)
+    ids = [host_id for host_id, _, _ in hits]
+    rows = project_cards(db.query(PetHost).filter(PetHost.id.in_(ids)), selected).all() if ids else []
+    cards = {r.id: card_from_row(r, selected) for r in rows}
+    return {
+        "data": merge_search_results(hits, cards),
+        "limit": limit,
+        "offset": offset,
+        # "all": every term matched; "any": nothing matched them all, so any term counts
+        "match": "all" if operator == "AND" else "any",
+    }
+
+@router.get("/pet-host/facets")
+def host_facet_counts(
+    pet_type: Optional[PreferencePetTypeEnum] = Query(None),
+    pet_size: Optional[PetSizeEnum] = Query(None),
+    age_range: Optional[PreferenceAgeRangeEnum] = Query(None),
+    special_needs_pet_accepted: Optional[bool] = Query(None),
+    medical_needs_pet_accepted: Optional[bool] = Query(None),
+    is_verified: Optional[bool] = Query(None),
+    is_superhost: Optional[bool] = Query(None),
+    availability_status: Optional[List[str]] = Query(None),
+    service: Optional[List[str]] = Query(None, description="Repeat to match any of several services"),
+    available_from: Optional[datetime] = Query(None),
+    available_to: Optional[datetime] = Query(None),
+    pets: Optional[int] = Query(None, ge=1, le=20),
+    limit: int = Query(100, ge=0, le=5000, description="Max host ids to return"),
+    db: Session = Depends(get_db),
+):
+    if not host_facets.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error": True, "message": "Facet index is still loading"},
+        )
+
+    filters = {
+        "pet_type": [pet_type.value] if pet_type else None,
+        "pet_size_accepted": [pet_size.value] if pet_size else None,
+        "age_range": [age_range.value] if age_range else None,
+        "special_needs_pet_accepted": [special_needs_pet_accepted] if special_needs_pet_accepted is not None else None,
+        "medical_needs_pet_accepted": [medical_needs_pet_accepted] if medical_needs_pet_accepted is not None else None,
+        "is_verified": [is_verified] if is_verified is not None else None,
+        "is_superhost": [is_superhost] if is_superhost is not None else None,
+        "availability_status": availability_status,
+        "service": service,
+    }
+    bitmap = host_facets.select(filters)
+    window = stay_window(available_from, available_to, pets)
+    if window is not None:
+        bitmap &= ~host_facets.bitmap_of(unavailable_host_ids(db, window))
+    return {
+        "total": bitmap.bit_count(),
+        "host_ids": host_facets.host_ids(bitmap, limit=limit),
+        "facets": host_facets.facet_counts(bitmap),
+    }
+
 @router.get("/pet-host/{hostId}")
-def get_pet_host(hostId: int, db: Session = Depends(get_db)):
-    host = db.query(PetHost).filter(PetHost.id == hostId).first()
-    if not host:
+def get_pet_host(hostId: int, request: Request, db: Session = Depends(get_db)):
+    # Validators come from one aggregate query, so a 304 never builds the profile
+    version = host_profile_version(db, hostId)
+    raise_if_not_modified(request, version)
+    # Read-through cache of the serialized profile; a body cached by this
+    # worker is only served if it was built for the current version
+    body = get_host_profile(db, hostId, version.etag)
+    if body is None:
         raise HTTPException(status_code=404, detail="PetHost not found")
-    return host
+    return Response(content=body, media_type="application/json", headers=validator_headers(version))
 
 
 
@@ -115,7 +318,6 @@ class PetHostUpdate(BaseModel):
     experience: Optional[str] = None
     address: Optional[str] = None
     account_status: Optional[str] = Field(default=None, description="e.g., under_review | active | suspended")
-    rating: Optional[float] = None
     profile_image: Optional[str] = None
     is_verified: Optional[bool] = None
     number_of_pet_hosted: Optional[int] = None
@@ -123,8 +325,9 @@ class PetHostUpdate(BaseModel):
     language: Optional[str] = None
     availability_status: Optional[str] = Field(default=None, description="e.g., available | busy | away")
     is_superhost: Optional[bool] = None
-    total_review: Optional[int] = None
     total_earnings: Optional[float] = None
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
 
     class Config:
         extra = "forbid"  # reject unexpected fields
@@ -151,6 +354,8 @@ class PetHostOut(BaseModel):
     is_superhost: bool
     total_review: int
     total_earnings: float
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
     class Config:
         from_attributes = True  # Pydantic v2; for v1 use orm_mode = True
@@ -175,12 +380,6 @@ def update_pet_host(
     # Apply only provided fields
     update_data = payload.model_dump(exclude_unset=True)
 
-    # Optionally: lightweight guardrails/normalization
-    if "rating" in update_data and update_data["rating"] is not None:
-        r = update_data["rating"]
-        if r < 0 or r > 5:
-            raise HTTPException(status_code=422, detail="rating must be between 0 and 5")
-
     for field, value in update_data.items():
         if field in IMMUTABLE_FIELDS:
             continue
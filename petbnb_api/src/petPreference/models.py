@@ -1,13 +1,16 @@
 # database.py
 from sqlalchemy import (
     Column, Integer, Float, Boolean, String,
-    DateTime, func, ForeignKey
+    DateTime, func, ForeignKey, Index
 )
 from sqlalchemy.orm import relationship
-from core.database import Base
+from core.database import Base, utcnow
 
 class PetPreferences(Base):
     __tablename__ = "pet_preferences"
+    __table_args__ = (
+        Index("ix_pet_preferences_search", "pet_type", "pet_size_accepted", "age_range", "pet_host_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     pet_host_id = Column(Integer, ForeignKey("pet_hosts.id"), unique=True, nullable=False)
@@ -17,7 +20,7 @@ class PetPreferences(Base):
     special_needs_pet_accepted = Column(Boolean, default=True)
     medical_needs_pet_accepted = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=utcnow)
 
     pet_host = relationship("PetHost", back_populates="pet_preferences")
 
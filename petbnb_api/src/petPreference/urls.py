@@ -1,10 +1,11 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, true
 
 from core.database import get_db  # your SessionLocal dependency
+from core.http import conditional_get, resource_version
 # Import your models; adjust path if needed.
 # If you already centralize models in core.init, keep using that.
 from core.init import PetPreferences, PetHost
@@ -82,11 +83,17 @@ def create_pet_preferences(payload: PetPreferencesCreate, db: Session = Depends(
     summary="List pet preferences"
 )
 def list_pet_preferences(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
     host_id: Optional[int] = Query(None, description="Filter by pet_host_id"),
 ):
+    criterion = PetPreferences.pet_host_id == host_id if host_id is not None else true()
+    version = resource_version(db, "pet-preferences", (PetPreferences, criterion), vary=(skip, limit, host_id))
+    conditional_get(request, response, version)
+
     q = db.query(PetPreferences)
     if host_id is not None:
         q = q.filter(PetPreferences.pet_host_id == host_id)
@@ -98,7 +105,8 @@ def list_pet_preferences(
     response_model=PetPreferencesOut,
     summary="Get pet preferences by ID"
 )
-def get_pet_preferences(pref_id: int, db: Session = Depends(get_db)):
+def get_pet_preferences(pref_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    conditional_get(request, response, resource_version(db, "pet-preference", (PetPreferences, PetPreferences.id == pref_id)))
     return _get_by_id_or_404(db, pref_id)
 
 
@@ -107,7 +115,9 @@ def get_pet_preferences(pref_id: int, db: Session = Depends(get_db)):
     response_model=PetPreferencesOut,
     summary="Get pet preferences by Host ID"
 )
-def get_pet_preferences_by_host(host_id: int, db: Session = Depends(get_db)):
+def get_pet_preferences_by_host(host_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    version = resource_version(db, "pet-preference", (PetPreferences, PetPreferences.pet_host_id == host_id))
+    conditional_get(request, response, version)
     pref = (
         db.query(PetPreferences)
         .filter(PetPreferences.pet_host_id == host_id)
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
-from core.database import Base
+from core.database import Base, utcnow
 
 
 class PetProfile(Base):
@@ -32,14 +32,32 @@ class PetProfile(Base):
     # feeding_instructions = Column(Text, nullable=True)
     # walking_preferences = Column(Text, nullable=True)
 
+    # Python-side defaults: SQLite cannot ALTER TABLE ADD COLUMN with a
+    # CURRENT_TIMESTAMP default, and rows created before these columns stay NULL
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+
     # ---------- Relationship ----------
     photos = relationship("PetPhotos", back_populates="pet", cascade="all, delete")
 
 
 class PetPhotos(Base):
     __tablename__ = "pet_photos"
+    __table_args__ = (
+        Index("ix_pet_photos_pet_id", "pet_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     pet_id = Column(Integer, ForeignKey("pet_profiles.id"), nullable=False)
     image = Column(String, nullable=False)  # URL or local path
+    # resized copies, see core.derivatives; NULL until rendered
+    thumb_url = Column(String, nullable=True)
+    card_url = Column(String, nullable=True)
+    full_url = Column(String, nullable=True)
+    variants_status = Column(String, nullable=True)  # pending / ready / failed
+    # normalized on ingest, see core.ingest
+    original_bytes = Column(Integer, nullable=True)
+    stored_bytes = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
     pet = relationship("PetProfile", back_populates="photos")
@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, status, HTTPException, Query, UploadFile, File
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Request, Response, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import true
 from .schema import PetProfileCreateSchema
 from core.database import get_db
+from core.derivatives import PENDING, pick_variant, register_variant_source, request_variants, variant_paths
+from core.http import conditional_get, resource_version
+from core.ingest import IngestedImage, ImageWorkersUnavailable, UndecodableImage, ingest_images
+from core.uploads import remove_files, save_uploads
 from sqlalchemy.orm import Session, joinedload
 from core.init import PetProfile, PetPhotos
 from .schema import PetAgeRangeEnum, PetGenderEnum, PetTypeEnum, PetProfileUpdateSchema
-from typing import Optional, List
+from typing import Literal, Optional, List
 import os
 import uuid
 from pathlib import Path
@@ -20,23 +27,53 @@ def _get_pet_or_404(db: Session, pet_id: int) -> PetProfile:
         )
     return pet
 
-def _save_image(file: UploadFile) -> str:
+def _check_image(file: UploadFile) -> None:
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail={"error": True, "message": "Only image files are allowed"},
         )
 
+def _image_path(file: UploadFile) -> Path:
     ext = os.path.splitext(file.filename or "")[1] or ".jpg"
-    file_id = uuid.uuid4().hex
-    file_name = f"{file_id}{ext}"
-    dest_path = MEDIA_ROOT / file_name
-
-    with dest_path.open("wb") as f:
-        f.write(file.file.read())
+    return MEDIA_ROOT / f"{uuid.uuid4().hex}{ext}"
+
+def _image_url(path: Path) -> str:
+    # public URL (served via StaticFiles)
+    return f"{MEDIA_URL_BASE}/{path.name}"
+
+def _image_file(url: str) -> Optional[Path]:
+    if not url or not url.startswith(MEDIA_URL_BASE):
+        return None
+    return MEDIA_ROOT / url.replace(MEDIA_URL_BASE, "").lstrip("/")
+
+def _photo_out(photo: PetPhotos, size: str) -> dict:
+    return {**jsonable_encoder(photo), "url": pick_variant(photo, size)}
+
+def _insert_photos(db: Session, pet_id: int, saved: List[IngestedImage]) -> List[PetPhotos]:
+    added = [
+        PetPhotos(
+            pet_id=pet_id,
+            image=_image_url(image.path),
+            variants_status=PENDING,
+            original_bytes=image.original_bytes,
+            stored_bytes=image.stored_bytes,
+        )
+        for image in saved
+    ]
+    db.add_all(added)
+    db.commit()
+    # resized variants are rendered in the background and recorded on the row
+    for photo, image in zip(added, saved):
+        request_variants(PetPhotos, photo.id, photo.image, image.path)
 
-    # return public URL (served via StaticFiles)
-    return f"{MEDIA_URL_BASE}/{file_name}"
+    # refetch for clean output
+    return (
+        db.query(PetPhotos)
+        .filter(PetPhotos.pet_id == pet_id)
+        .order_by(PetPhotos.id.desc())
+        .all()
+    )
 
 
 
@@ -44,6 +81,7 @@ def _save_image(file: UploadFile) -> str:
 MEDIA_ROOT = Path(os.environ.get("PET_MEDIA_ROOT", "./pet_uploads")).absolute()
 MEDIA_URL_BASE = os.environ.get("PET_MEDIA_URL_BASE", "/static/pets")  # must match StaticFiles mount
 MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
+register_variant_source(PetPhotos, "image", _image_file)
 
 @router.post(
     "/",
@@ -114,9 +152,13 @@ def create_pet_profile(
     status_code=status.HTTP_200_OK,
 )
 def filter(
+    request: Request,
+    response: Response,
     owner:Optional[str] = Query(None, description="Filter by owner (Appwrite user id)"),
     db:Session = Depends(get_db) 
     ):
+    criterion = PetProfile.owner == owner if owner else true()
+    conditional_get(request, response, resource_version(db, "pet-profiles", (PetProfile, criterion), vary=(owner,)))
     query = db.query(PetProfile)
     if owner:
        query = query.filter(PetProfile.owner==owner)
@@ -207,12 +249,46 @@ def update_pet_profile(
     return profile
 
 
+# declared before /{pet_id}/{owner}, which would otherwise match "photos" as an owner
+@router.get(
+    "/{pet_id}/photos",
+    summary="List photos of a pet",
+    status_code=status.HTTP_200_OK,
+)
+def list_pet_photos(
+    pet_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    size: Literal["thumb", "card", "full", "original"] = Query("thumb", description="Image size returned as `url`"),
+):
+    version = resource_version(db, "pet-photos", (PetPhotos, PetPhotos.pet_id == pet_id), vary=(size,))
+    conditional_get(request, response, version)
+    _get_pet_or_404(db, pet_id)  # ensure pet exists
+
+    photos = (
+        db.query(PetPhotos)
+        .filter(PetPhotos.pet_id == pet_id)
+        .order_by(PetPhotos.id.desc())
+        .all()
+    )
+    return [_photo_out(photo, size) for photo in photos]
+
+
 @router.get("/{pet_id}/{owner}", summary="Get one pet profile by id + owner")
 def getOne(
     pet_id: int,
     owner: str,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
 ):
+    version = resource_version(
+        db, "pet-profile",
+        (PetProfile, (PetProfile.id == pet_id) & (PetProfile.owner == owner)),
+        (PetPhotos, PetPhotos.pet_id == pet_id),
+    )
+    conditional_get(request, response, version)
     profile = (
         db.query(PetProfile)
         .options(joinedload(PetProfile.photos))
@@ -246,49 +322,30 @@ async def upload_pet_photos(
     files: List[UploadFile] = File(...),
     db: Session = Depends(get_db),
 ):
-    pet = _get_pet_or_404(db, pet_id)
-
-    created: List[PetPhotos] = []
-
+    pet = await run_in_threadpool(_get_pet_or_404, db, pet_id)
     for file in files:
-        image_url = _save_image(file)
-        photo = PetPhotos(
-            pet_id=pet.id,
-            image=image_url,
-        )
-        db.add(photo)
-        created.append(photo)
-
-    db.commit()
+        _check_image(file)
 
-    # refetch for clean output
-    photos = (
-        db.query(PetPhotos)
-        .filter(PetPhotos.pet_id == pet.id)
-        .order_by(PetPhotos.id.desc())
-        .all()
-    )
-    return photos
-
-
-@router.get(
-    "/{pet_id}/photos",
-    summary="List photos of a pet",
-    status_code=status.HTTP_200_OK,
-)
-def list_pet_photos(
-    pet_id: int,
-    db: Session = Depends(get_db),
-):
-    _get_pet_or_404(db, pet_id)  # ensure pet exists
-
-    photos = (
-        db.query(PetPhotos)
-        .filter(PetPhotos.pet_id == pet_id)
-        .order_by(PetPhotos.id.desc())
-        .all()
-    )
-    return photos
+    # files are copied on the upload I/O pool (parallel, capped), rows written in the threadpool
+    raws = await save_uploads([(file, _image_path(file)) for file in files])
+    # decoded, capped and re-encoded in the process pool; the raw uploads are replaced
+    try:
+        saved = await ingest_images(raws)
+    except UndecodableImage as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": True, "message": f"Could not decode image: {exc}"},
+        )
+    except ImageWorkersUnavailable:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error": True, "message": "Image processing is unavailable, try again"},
+        )
+    try:
+        return await run_in_threadpool(_insert_photos, db, pet.id, saved)
+    except Exception:
+        await remove_files([image.path for image in saved])
+        raise
 
 
 @router.delete(
@@ -309,11 +366,11 @@ def delete_pet_photo(
 
     # Try deleting the underlying file too
     try:
-        if photo.image and photo.image.startswith(MEDIA_URL_BASE):
-            rel_path = photo.image.replace(MEDIA_URL_BASE, "").lstrip("/")
-            file_path = MEDIA_ROOT / rel_path
-            if file_path.exists():
-                file_path.unlink()
+        file_path = _image_file(photo.image)
+        if file_path:
+            # the original and its resized variants
+            for path in [file_path, *variant_paths(file_path)]:
+                path.unlink(missing_ok=True)
     except Exception:
         # Don't fail API if file deletion fails
         pass
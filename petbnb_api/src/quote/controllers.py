@@ -0,0 +1,179 @@
+import math
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from core.database import SessionLocal
+from core.signals import on_hosts_changed
+from service.models import ServiceOffer, service_key
+
+# -------------------- Billable units --------------------
+# A stay is billed in hours for "Per hour" prices, in started 24h periods for
+# "Per day" (or per-night) prices and once for "Per session" or unknown bases.
+
+BASIS_HOUR, BASIS_DAY, BASIS_SESSION = 0, 1, 2
+
+
+def basis_code(pricing_basis: Optional[str]) -> int:
+    basis = (pricing_basis or "").strip().lower()
+    if "hour" in basis:
+        return BASIS_HOUR
+    if "day" in basis or "night" in basis:
+        return BASIS_DAY
+    return BASIS_SESSION
+
+
+def stay_units(checkin: datetime, checkout: datetime) -> np.ndarray:
+    # Units for each basis code: [hours, days, sessions]
+    hours = max((checkout - checkin).total_seconds(), 0) / 3600
+    days = max(math.ceil(round(hours / 24, 6)), 1)
+    return np.array([round(hours, 2), days, 1], dtype=np.float64)
+
+
+def billable_units(pricing_basis: Optional[str], checkin: datetime, checkout: datetime) -> float:
+    return float(stay_units(checkin, checkout)[basis_code(pricing_basis)])
+
+
+class QuoteRequest(NamedTuple):
+    service_name: str
+    checkin: datetime
+    checkout: datetime
+    pets: int
+
+
+def quote_request(
+    service_name: Optional[str],
+    checkin: Optional[datetime],
+    checkout: Optional[datetime],
+    pets: Optional[int] = None,
+) -> Optional[QuoteRequest]:
+    # Query parameters -> a quote request, or None when no stay is given
+    if checkin is None and checkout is None:
+        return None
+    if checkin is None or checkout is None or checkout <= checkin:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": True, "message": "Quotes need a check-in before the check-out"},
+        )
+    if not service_name or not service_name.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": True, "message": "Quotes need a service_name"},
+        )
+    return QuoteRequest(service_name.strip(), checkin, checkout, pets or 1)
+
+
+# -------------------- Price store --------------------
+
+_COLUMNS = {"host_id": np.int64, "service": np.int32, "price": np.float64, "basis": np.int8}
+
+
+class ServicePriceStore:
+    """
+    Every priced service offer held as parallel NumPy columns (host, service
+    code, price, basis code), one row per offer. Quoting a candidate list is
+    a mask, a gather and a per-host minimum, with no per-host query.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._columns: Dict[str, np.ndarray] = {name: np.empty(0, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        self._service_codes: Dict[str, int] = {}
+        self.ready = False
+
+    # ---------- loading ----------
+    @staticmethod
+    def _load(db: Session, host_ids: Optional[Iterable[int]] = None) -> List[Tuple]:
+        q = db.query(
+            ServiceOffer.pet_host_id,
+            ServiceOffer.service_name,
+            ServiceOffer.service_price,
+            ServiceOffer.pricing_basis,
+        ).filter(ServiceOffer.service_price.isnot(None), ServiceOffer.service_name.isnot(None))
+        if host_ids is not None:
+            q = q.filter(ServiceOffer.pet_host_id.in_(list(host_ids)))
+        return q.all()
+
+    def _service_code(self, name: str) -> int:
+        return self._service_codes.setdefault(service_key(name), len(self._service_codes))
+
+    def _to_columns(self, rows: Sequence[Tuple]) -> Dict[str, np.ndarray]:
+        n = len(rows)
+        return {
+            "host_id": np.fromiter((r[0] for r in rows), dtype=np.int64, count=n),
+            "service": np.fromiter((self._service_code(r[1]) for r in rows), dtype=np.int32, count=n),
+            "price": np.fromiter((r[2] for r in rows), dtype=np.float64, count=n),
+            "basis": np.fromiter((basis_code(r[3]) for r in rows), dtype=np.int8, count=n),
+        }
+
+    def build(self, db: Session) -> None:
+        rows = self._load(db)
+        with self._lock:
+            self._service_codes = {}
+            self._columns = self._to_columns(rows)
+            self.ready = True
+
+    def refresh(self, host_ids: Set[int]) -> None:
+        # Replace every offer of the changed hosts
+        if not self.ready or not host_ids:
+            return
+        with SessionLocal() as db:
+            rows = self._load(db, host_ids)
+        with self._lock:
+            fresh = self._to_columns(rows)
+            keep = ~np.isin(self._columns["host_id"], np.fromiter(host_ids, dtype=np.int64))
+            self._columns = {
+                name: np.concatenate([column[keep], fresh[name]])
+                for name, column in self._columns.items()
+            }
+
+    # ---------- quoting ----------
+    def quote(
+        self,
+        request: QuoteRequest,
+        host_ids: Optional[Sequence[int]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Cheapest total for the stay per host offering the service: (host ids,
+        totals, unit prices, basis codes), cheapest first (ties by host id).
+        host_ids limits the quote to candidates; hosts without the service
+        are left out. Totals are unit price x billable units x pets.
+        """
+        units = stay_units(request.checkin, request.checkout)
+        with self._lock:
+            code = self._service_codes.get(service_key(request.service_name))
+            columns = self._columns
+            if code is None:
+                mask = np.zeros(len(columns["host_id"]), dtype=bool)
+            else:
+                mask = columns["service"] == code
+            if host_ids is not None:
+                mask &= np.isin(columns["host_id"], np.asarray(host_ids, dtype=np.int64))
+            ids = columns["host_id"][mask]
+            prices = columns["price"][mask]
+            bases = columns["basis"][mask]
+
+        totals = np.round(prices * units[bases] * request.pets, 2)
+        # cheapest offer per host: sort by (host, total), keep each host's first row
+        order = np.lexsort((totals, ids))
+        ids, totals, prices, bases = ids[order], totals[order], prices[order], bases[order]
+        _, first = np.unique(ids, return_index=True)
+        ids, totals, prices, bases = ids[first], totals[first], prices[first], bases[first]
+        order = np.lexsort((ids, totals))
+        return ids[order], totals[order], prices[order], bases[order]
+
+    def totals_for(self, request: QuoteRequest, host_ids: Sequence[int]) -> Dict[int, float]:
+        ids, totals, _, _ = self.quote(request, host_ids)
+        return dict(zip(ids.tolist(), totals.tolist()))
+
+
+service_prices = ServicePriceStore()
+
+
+@on_hosts_changed
+def _refresh_service_prices(host_ids: Set[int]) -> None:
+    service_prices.refresh(host_ids)
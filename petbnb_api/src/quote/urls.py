@@ -0,0 +1,55 @@
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, status
+
+from .controllers import BASIS_DAY, BASIS_HOUR, quote_request, service_prices, stay_units
+
+router = APIRouter(prefix="/quote", tags=["Quote"])
+
+MAX_QUOTE_HOSTS = 1000
+BASIS_LABELS = {BASIS_HOUR: "Per hour", BASIS_DAY: "Per day"}
+
+
+@router.get("", summary="Stay totals for one host, a candidate list, or every host offering a service")
+def quote_stay(
+    service_name: str = Query(..., min_length=1, max_length=80),
+    checkin: datetime = Query(...),
+    checkout: datetime = Query(...),
+    pets: int = Query(1, ge=1, le=20),
+    host_id: Optional[List[int]] = Query(None, description="Repeat for a candidate list; omit to quote every host"),
+    limit: int = Query(50, ge=1, le=MAX_QUOTE_HOSTS, description="Cheapest quotes to return"),
+):
+    if host_id is not None and len(host_id) > MAX_QUOTE_HOSTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": True, "message": f"At most {MAX_QUOTE_HOSTS} hosts per quote"},
+        )
+    if not service_prices.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error": True, "message": "Price index is still loading"},
+        )
+    request = quote_request(service_name, checkin, checkout, pets)
+    ids, totals, prices, bases = service_prices.quote(request, host_id)
+    units = stay_units(request.checkin, request.checkout)
+    quoted = set(ids.tolist())
+    return {
+        "service_name": request.service_name,
+        "checkin": request.checkin,
+        "checkout": request.checkout,
+        "pets": request.pets,
+        "total": len(ids),
+        "quotes": [
+            {
+                "host_id": h,
+                "total_price": t,
+                "unit_price": p,
+                "pricing_basis": BASIS_LABELS.get(b, "Per session"),
+                "units": float(units[b]),
+            }
+            for h, t, p, b in zip(ids[:limit].tolist(), totals[:limit].tolist(), prices[:limit].tolist(), bases[:limit].tolist())
+        ],
+        # requested hosts that do not offer the service
+        "unquoted_host_ids": [h for h in dict.fromkeys(host_id or []) if h not in quoted],
+    }
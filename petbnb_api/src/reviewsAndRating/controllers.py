@@ -0,0 +1,322 @@
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import Float, String, and_, bindparam, case, cast, delete, func, or_, type_coerce, update
+from sqlalchemy.orm import Session
+
+from core.cache import ByteLRUCache, register_cache
+from core.database import SessionLocal, utcnow
+from core.pagination import decode_cursor, encode_cursor
+from core.scheduler import register_job
+from core.signals import mark_hosts_changed, on_hosts_changed
+from petHost.models import PetHost
+from .models import ReviewsAndRating
+from .schemas import ReviewCreateSchema, ReviewUpdateSchema
+
+# -------------------- Rating aggregates --------------------
+# Each host carries running review aggregates: rating_sum, total_review
+# (the count) and a rating_1..rating_5 star histogram, with rating =
+# rating_sum / total_review. Review writes adjust them by the review's delta
+# in the same transaction, so reading a host's average never touches the
+# reviews table; the rating_rebuild job recomputes them from the reviews
+# with one GROUP BY in case anything drifted.
+
+REBUILD_INTERVAL_SECONDS = float(os.environ.get("RATING_REBUILD_INTERVAL_SECONDS", 3600))
+STARS = (1, 2, 3, 4, 5)
+# newest reviews embedded in a review summary (and so in the host profile)
+REVIEW_SUMMARY_LATEST = int(os.environ.get("REVIEW_SUMMARY_LATEST", 5))
+
+
+def _histogram_column(star: int):
+    return PetHost.__table__.c[f"rating_{star}"]
+
+
+def average_rating(rating_sum: int, count: int) -> float:
+    return round(rating_sum / count, 2) if count else 0.0
+
+
+def apply_rating_delta(db: Session, host_id: int, added: Optional[int] = None, removed: Optional[int] = None) -> None:
+    """
+    Add one rating of `added` stars and/or take one of `removed` stars off
+    the host's aggregates with a single UPDATE computed in SQL, so
+    concurrent review writes never overwrite each other's counts.
+    """
+    if added == removed:
+        return
+    d_sum = (added or 0) - (removed or 0)
+    d_count = (added is not None) - (removed is not None)
+    table = PetHost.__table__
+    new_sum = table.c.rating_sum + d_sum
+    new_count = func.coalesce(table.c.total_review, 0) + d_count
+    values = {
+        "rating_sum": new_sum,
+        "total_review": new_count,
+        "rating": func.coalesce(func.round(cast(new_sum, Float) / func.nullif(new_count, 0), 2), 0.0),
+        "updated_at": utcnow(),
+    }
+    if added in STARS:
+        values[f"rating_{added}"] = _histogram_column(added) + 1
+    if removed in STARS:
+        values[f"rating_{removed}"] = _histogram_column(removed) - 1
+    db.execute(table.update().where(table.c.id == host_id).values(**values))
+    mark_hosts_changed(db, {host_id})
+
+
+def host_rating_summary(db: Session, host_id: int) -> Optional[Dict[str, Any]]:
+    # one primary-key read of the maintained aggregates
+    row = (
+        db.query(PetHost.id, PetHost.rating, PetHost.total_review, PetHost.rating_sum,
+                 *[_histogram_column(star) for star in STARS])
+        .filter(PetHost.id == host_id)
+        .first()
+    )
+    if row is None:
+        return None
+    return {
+        "host_id": row.id,
+        "rating": row.rating or 0.0,
+        "total_review": row.total_review or 0,
+        "rating_sum": row.rating_sum,
+        "histogram": {str(star): row[4 + i] for i, star in enumerate(STARS)},
+    }
+
+
+# -------------------- Reads --------------------
+
+def review_body(review) -> Dict[str, Any]:
+    return {
+        "id": review.id,
+        "pet_host_id": review.pet_host_id,
+        "star_rating": review.star_rating,
+        "review_title": review.review_title,
+        "review_text": review.review_text,
+        "created_at": review.created_at,
+        "updated_at": review.updated_at,
+    }
+
+
+def _created_key():
+    # created_at exactly as stored: rows from server_default now() have no
+    # fractional seconds, so a re-encoded datetime would not compare equal
+    return type_coerce(ReviewsAndRating.created_at, String)
+
+
+def review_feed_page(
+    db: Session,
+    host_id: int,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    newest_first: bool = True,
+) -> Tuple[List[ReviewsAndRating], Optional[str]]:
+    """
+    One page of a host's reviews, keyset-paginated on (created_at, id): a
+    range scan of ix_reviews_and_rating_host_created_id that starts right
+    after the previous page, however many reviews the host has.
+    """
+    q = db.query(ReviewsAndRating, _created_key()).filter(ReviewsAndRating.pet_host_id == host_id)
+    after = decode_cursor(cursor, 2)
+    if after is not None:
+        try:
+            last_created, last_id = str(after[0]), int(after[1])
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"error": True, "message": "Invalid cursor"},
+            )
+        if newest_first:
+            q = q.filter(or_(
+                _created_key() < last_created,
+                and_(_created_key() == last_created, ReviewsAndRating.id < last_id),
+            ))
+        else:
+            q = q.filter(or_(
+                _created_key() > last_created,
+                and_(_created_key() == last_created, ReviewsAndRating.id > last_id),
+            ))
+    order = (
+        (ReviewsAndRating.created_at.desc(), ReviewsAndRating.id.desc()) if newest_first
+        else (ReviewsAndRating.created_at.asc(), ReviewsAndRating.id.asc())
+    )
+    rows = q.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        _, last_created = rows[-1]
+        next_cursor = encode_cursor([last_created, rows[-1][0].id])
+    return [review for review, _ in rows], next_cursor
+
+
+def review_summary(db: Session, host_id: int, latest: int = REVIEW_SUMMARY_LATEST) -> Optional[Dict[str, Any]]:
+    # The maintained aggregates plus the newest `latest` reviews: two indexed reads
+    summary = host_rating_summary(db, host_id)
+    if summary is None:
+        return None
+    reviews, _ = review_feed_page(db, host_id, limit=latest) if latest > 0 else ([], None)
+    summary["latest"] = [review_body(r) for r in reviews]
+    return summary
+
+
+# Serialized review summaries, keyed by host id and tagged with their ETag;
+# review writes evict through core.signals in the writing worker
+REVIEW_SUMMARY_CACHE_MAX_BYTES = int(os.environ.get("REVIEW_SUMMARY_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+REVIEW_SUMMARY_CACHE_MAX_ENTRIES = int(os.environ.get("REVIEW_SUMMARY_CACHE_MAX_ENTRIES", 10_000))
+REVIEW_SUMMARY_CACHE_TTL_SECONDS = float(os.environ.get("REVIEW_SUMMARY_CACHE_TTL_SECONDS", 300))
+
+review_summary_cache = register_cache(
+    ByteLRUCache(
+        "review_summary",
+        max_bytes=REVIEW_SUMMARY_CACHE_MAX_BYTES,
+        max_entries=REVIEW_SUMMARY_CACHE_MAX_ENTRIES,
+        ttl_seconds=REVIEW_SUMMARY_CACHE_TTL_SECONDS,
+    )
+)
+
+
+def get_review_summary(db: Session, host_id: int, etag: Optional[str] = None) -> Optional[bytes]:
+    # with `etag`, a cached summary is only served if it was built for that version
+    def load() -> Optional[bytes]:
+        summary = review_summary(db, host_id)
+        if summary is None:
+            return None
+        return json.dumps(jsonable_encoder(summary), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    return review_summary_cache.get_or_load(host_id, load, tag=etag)
+
+
+@on_hosts_changed
+def _invalidate_review_summaries(host_ids: Set[int]) -> None:
+    review_summary_cache.invalidate(host_ids)
+
+
+# -------------------- Writes --------------------
+
+def create_review(db: Session, payload: ReviewCreateSchema) -> ReviewsAndRating:
+    if not db.query(PetHost.id).filter(PetHost.id == payload.pet_host_id).first():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="PetHost not found")
+    review = ReviewsAndRating(**payload.model_dump())
+    db.add(review)
+    db.flush()
+    apply_rating_delta(db, review.pet_host_id, added=review.star_rating)
+    db.commit()
+    db.refresh(review)
+    return review
+
+
+def update_review(db: Session, review: ReviewsAndRating, payload: ReviewUpdateSchema) -> ReviewsAndRating:
+    """
+    Apply the changed fields. The UPDATE is guarded by the star rating it
+    was read with, so the host aggregates move by exactly the delta this
+    request saw even when two edits race.
+    """
+    values = payload.model_dump(exclude_unset=True)
+    if values.get("star_rating") is None:
+        values.pop("star_rating", None)
+    if not values:
+        return review
+    old = review.star_rating
+    result = db.execute(
+        update(ReviewsAndRating)
+        .where(ReviewsAndRating.id == review.id, ReviewsAndRating.star_rating == old)
+        .values(**values, updated_at=utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error": True, "message": "Review was changed by another request"},
+        )
+    if "star_rating" in values and values["star_rating"] != old:
+        apply_rating_delta(db, review.pet_host_id, added=values["star_rating"], removed=old or 0)
+    # title/text edits change the cached summary and host profile too
+    mark_hosts_changed(db, {review.pet_host_id})
+    db.commit()
+    db.refresh(review)
+    return review
+
+
+def delete_review(db: Session, review_id: int) -> Optional[int]:
+    # Returns the host id, or None when the review does not exist (any more)
+    row = db.execute(
+        delete(ReviewsAndRating)
+        .where(ReviewsAndRating.id == review_id)
+        .returning(ReviewsAndRating.pet_host_id, ReviewsAndRating.star_rating)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        db.rollback()
+        return None
+    apply_rating_delta(db, row.pet_host_id, removed=row.star_rating or 0)
+    db.commit()
+    return row.pet_host_id
+
+
+# -------------------- Rebuild --------------------
+
+def rebuild_rating_aggregates(db: Session, host_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute every host's aggregates (or just `host_ids`) from the reviews
+    with one GROUP BY and write the ones that differ with one executemany
+    UPDATE. Returns the number of hosts whose aggregates changed.
+    """
+    stars = func.coalesce(ReviewsAndRating.star_rating, 0)
+    counted = db.query(
+        ReviewsAndRating.pet_host_id,
+        func.count(ReviewsAndRating.id),
+        func.sum(stars),
+        *[func.sum(case((stars == star, 1), else_=0)) for star in STARS],
+    ).group_by(ReviewsAndRating.pet_host_id)
+    hosts = db.query(
+        PetHost.id, PetHost.rating, PetHost.total_review, PetHost.rating_sum,
+        *[_histogram_column(star) for star in STARS],
+    )
+    if host_ids is not None:
+        host_ids = list(host_ids)
+        counted = counted.filter(ReviewsAndRating.pet_host_id.in_(host_ids))
+        hosts = hosts.filter(PetHost.id.in_(host_ids))
+    totals = {row[0]: tuple(int(n or 0) for n in row[1:]) for row in counted}
+
+    empty = (0,) * (2 + len(STARS))
+    changed = []
+    for row in hosts.all():
+        count, rating_sum, *histogram = totals.get(row.id, empty)
+        current = (row.total_review or 0, row.rating_sum or 0, *[n or 0 for n in row[4:]])
+        rating = average_rating(rating_sum, count)
+        # a NULL rating (databases from before it was NOT NULL) is rewritten too
+        if current != (count, rating_sum, *histogram) or row.rating != rating:
+            changed.append({
+                "host_id": row.id,
+                "avg": rating,
+                "n": count,
+                "total": rating_sum,
+                **{f"h{star}": n for star, n in zip(STARS, histogram)},
+            })
+    if changed:
+        table = PetHost.__table__
+        db.connection().execute(
+            table.update()
+            .where(table.c.id == bindparam("host_id"))
+            .values(
+                rating=bindparam("avg"),
+                total_review=bindparam("n"),
+                rating_sum=bindparam("total"),
+                updated_at=utcnow(),
+                **{f"rating_{star}": bindparam(f"h{star}") for star in STARS},
+            ),
+            changed,
+        )
+        mark_hosts_changed(db, {row["host_id"] for row in changed})
+    db.commit()
+    return len(changed)
+
+
+def run_rating_rebuild() -> int:
+    with SessionLocal() as db:
+        return rebuild_rating_aggregates(db)
+
+
+register_job("rating_rebuild", REBUILD_INTERVAL_SECONDS, run_rating_rebuild)
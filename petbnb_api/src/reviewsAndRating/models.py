@@ -1,13 +1,18 @@
 # database.py
 from sqlalchemy import (
     Column, Integer, String,
-    DateTime, func, ForeignKey
+    DateTime, func, ForeignKey, Index
 )
 from sqlalchemy.orm import relationship
-from core.database import Base
+from core.database import Base, utcnow
 
 class ReviewsAndRating(Base):
     __tablename__ = "reviews_and_rating"
+    __table_args__ = (
+        Index("ix_reviews_and_rating_host_id", "pet_host_id", "updated_at"),
+        # review feed: keyset on (created_at, id) per host
+        Index("ix_reviews_and_rating_host_created_id", "pet_host_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     pet_host_id = Column(Integer, ForeignKey("pet_hosts.id"), nullable=False)
@@ -15,7 +20,7 @@ class ReviewsAndRating(Base):
     review_title = Column(String)
     review_text = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=utcnow)
 
     pet_host = relationship("PetHost", back_populates="reviews")
 
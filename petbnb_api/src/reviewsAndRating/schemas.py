@@ -0,0 +1,19 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+# ---------- SCHEMAS ----------
+class ReviewCreateSchema(BaseModel):
+    pet_host_id: int
+    star_rating: int = Field(..., ge=1, le=5)
+    review_title: Optional[str] = Field(None, max_length=200)
+    review_text: Optional[str] = Field(None, max_length=5000)
+
+
+class ReviewUpdateSchema(BaseModel):
+    star_rating: Optional[int] = Field(None, ge=1, le=5)
+    review_title: Optional[str] = Field(None, max_length=200)
+    review_text: Optional[str] = Field(None, max_length=5000)
+
+    class Config:
+        extra = "forbid"
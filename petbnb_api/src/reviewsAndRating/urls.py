@@ -0,0 +1,103 @@
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.orm import Session
+
+from core.database import get_db
+from core.http import raise_if_not_modified, resource_version, validator_headers
+from core.init import PetHost, ReviewsAndRating
+from .controllers import (
+    create_review, delete_review, get_review_summary, host_rating_summary,
+    rebuild_rating_aggregates, review_body, review_feed_page, update_review,
+)
+from .schemas import ReviewCreateSchema, ReviewUpdateSchema
+
+router = APIRouter(prefix="/reviews", tags=["Reviews"])
+
+
+def _get_review_or_404(db: Session, review_id: int) -> ReviewsAndRating:
+    review = db.query(ReviewsAndRating).filter(ReviewsAndRating.id == review_id).first()
+    if not review:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
+    return review
+
+
+@router.post("/", summary="Add a review; the host's rating aggregates move with it")
+def add_review(payload: ReviewCreateSchema, db: Session = Depends(get_db)):
+    review = create_review(db, payload)
+    return {
+        "error": False,
+        "message": "Review created successfully",
+        "review": review_body(review),
+        "host_rating": host_rating_summary(db, review.pet_host_id),
+    }
+
+
+@router.post("/rebuild", summary="Recompute host rating aggregates from the reviews")
+def rebuild_ratings(host_id: Optional[int] = Query(None, description="Only this host"), db: Session = Depends(get_db)):
+    if host_id is not None and not db.query(PetHost.id).filter(PetHost.id == host_id).first():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="PetHost not found")
+    changed = rebuild_rating_aggregates(db, [host_id] if host_id is not None else None)
+    return {"error": False, "message": "Rating aggregates rebuilt", "changed": changed}
+
+
+@router.get("/by-host/{host_id}", summary="A host's reviews, keyset-paginated on (created_at, id)")
+def reviews_by_host(
+    host_id: int,
+    order: Literal["newest", "oldest"] = Query("newest"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: Session = Depends(get_db),
+):
+    if not db.query(PetHost.id).filter(PetHost.id == host_id).first():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="PetHost not found")
+    reviews, next_cursor = review_feed_page(db, host_id, limit=limit, cursor=cursor, newest_first=order == "newest")
+    return {
+        "host_id": host_id,
+        "data": [review_body(r) for r in reviews],
+        "next_cursor": next_cursor,
+        "limit": limit,
+    }
+
+
+@router.get("/by-host/{host_id}/summary", summary="Average, count, star histogram and latest reviews (cached)")
+def review_summary_for_host(host_id: int, request: Request, db: Session = Depends(get_db)):
+    version = resource_version(
+        db, "review-summary",
+        (PetHost, PetHost.id == host_id),
+        (ReviewsAndRating, ReviewsAndRating.pet_host_id == host_id),
+    )
+    raise_if_not_modified(request, version)
+    body = get_review_summary(db, host_id, version.etag)
+    if body is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="PetHost not found")
+    return Response(content=body, media_type="application/json", headers=validator_headers(version))
+
+
+@router.get("/{review_id}")
+def get_review(review_id: int, db: Session = Depends(get_db)):
+    return review_body(_get_review_or_404(db, review_id))
+
+
+@router.patch("/{review_id}")
+def edit_review(review_id: int, payload: ReviewUpdateSchema, db: Session = Depends(get_db)):
+    review = update_review(db, _get_review_or_404(db, review_id), payload)
+    return {
+        "error": False,
+        "message": "Review updated",
+        "review": review_body(review),
+        "host_rating": host_rating_summary(db, review.pet_host_id),
+    }
+
+
+@router.delete("/{review_id}")
+def remove_review(review_id: int, db: Session = Depends(get_db)):
+    host_id = delete_review(db, review_id)
+    if host_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
+    return {
+        "error": False,
+        "message": "Review deleted",
+        "review_id": review_id,
+        "host_rating": host_rating_summary(db, host_id),
+    }
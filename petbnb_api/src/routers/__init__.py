@@ -4,6 +4,10 @@ from petPreference.urls import router as petPreferenceRouter
 from service.urls import router as petServiceRouter
 from imageGallery.urls import router as petHostImageGalleryRouter
 from petProfile.urls import router as petProfileRouter
+from availability.urls import router as availabilityRouter
+from earnings.urls import router as earningsRouter
+from quote.urls import router as quoteRouter
+from reviewsAndRating.urls import router as reviewsRouter
 from booking.urls import router as bookingRouter
 
 
@@ -14,5 +18,9 @@ __all__ = [
     "petServiceRouter",
     "petHostImageGalleryRouter",
     "petProfileRouter",
+    "availabilityRouter",
+    "earningsRouter",
+    "quoteRouter",
+    "reviewsRouter",
     "bookingRouter"
 ]
\ No newline at end of file
@@ -48,7 +48,7 @@ class PetHostSchema(BaseModel):
     bio: str
     experience: str
     account_status: AccountStatusEnum
-    rating: int
+    rating: float
     profile_image: str
     is_verified: bool
     number_of_pet_hosted: int
@@ -1,14 +1,24 @@
 # database.py
 from sqlalchemy import (
     Column, Integer, Float, String,
-    DateTime, func, ForeignKey
+    DateTime, func, ForeignKey, Index
 )
+from typing import Optional
 from sqlalchemy.orm import relationship
-from core.database import Base
+from core.database import Base, utcnow
+
+
+def service_key(name: Optional[str]) -> Optional[str]:
+    # Service names match case-insensitively everywhere (upserts, /filter,
+    # facets, quotes); the SQL side compares func.lower(service_name)
+    return name.strip().lower() if name else None
 
 
 class ServiceOffer(Base):
     __tablename__ = "service_offer"
+    __table_args__ = (
+        Index("ix_service_offer_host_price", "pet_host_id", "service_price"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     pet_host_id = Column(Integer, ForeignKey("pet_hosts.id"), nullable=False)
@@ -17,6 +27,13 @@ class ServiceOffer(Base):
     service_price = Column(Float)
     pricing_basis = Column(String)  # "Per hour" | "Per day" | "Per session"
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=utcnow)
 
     pet_host = relationship("PetHost", back_populates="service_offers")
+
+
+# /filter's service semi-join compares lower(service_name)
+Index(
+    "ix_service_offer_lname_price_host",
+    func.lower(ServiceOffer.service_name), ServiceOffer.service_price, ServiceOffer.pet_host_id,
+)
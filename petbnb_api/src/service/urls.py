@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List, Literal
 from pydantic import BaseModel, Field
 from core.init import PetHost, ServiceOffer
+from service.models import service_key
 from core.database import get_db
 
 router = APIRouter(prefix="/service", tags=["Service Offer"])
@@ -43,14 +44,14 @@ def setPetService(
         .filter(ServiceOffer.pet_host_id == existingHost.id)
         .all()
     )
-    existing_by_name = {s.service_name.lower().strip(): s for s in existingServices}
+    existing_by_name = {service_key(s.service_name): s for s in existingServices}
 
     created, updated = 0, 0
     upserted_records: list[ServiceOffer] = []
 
     # Step 3: Upsert each service
     for item in petServiceData.services:
-        key = item.service_name.lower().strip()
+        key = service_key(item.service_name)
         if key in existing_by_name:
             # Update existing record
             svc = existing_by_name[key]